@@ -0,0 +1,23 @@
+from importlib.metadata import PackageNotFoundError, version
+
+import pytest
+
+# Client-layer libraries whose upgrades can move the numbers on their own
+TRACKED_PACKAGES = ("requests", "urllib3", "httpx", "pytest", "pytest-xdist")
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_benchmark_update_machine_info(config, machine_info):
+    packages = {}
+    for name in TRACKED_PACKAGES:
+        try:
+            packages[name] = version(name)
+        except PackageNotFoundError:
+            packages[name] = None
+    machine_info["packages"] = packages
+
+
+@pytest.fixture(scope="session")
+def base_url(booking_server):
+    """Benchmarks always run against the in-process stand-in, never the live API."""
+    return booking_server.url
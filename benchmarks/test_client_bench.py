@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+from collections import Counter
+
+import pytest
+import requests
+from utils.api_client import ApiClient
+from utils.booking_factory import BookingFactory
+from utils.logger import SamplingFilter, TruncatingFormatter, body
+from utils.metrics import MetricsRecorder
+from utils.mutations import mutation_params, valid_booking
+from utils.payloads import BOOKING_TEMPLATES, with_namespace
+from utils.token_provider import TokenProvider
+
+BOOKING = BOOKING_TEMPLATES["jim_brown"]
+CREATE_RESPONSE = json.dumps({"bookingid": 1, "booking": BOOKING}).encode()
+
+# ---------------------- REQUEST BUILDING ----------------------
+
+
+def test_prepare_create_request(benchmark, api_client):
+    request = requests.Request("POST", api_client.url("/booking"), json=BOOKING,
+                               headers={"Content-Type": "application/json"})
+    benchmark(api_client.session.prepare_request, request)
+
+
+def test_namespace_payload(benchmark):
+    benchmark(with_namespace, BOOKING, "gw0abc123")
+
+
+def test_mutation_params_collection(benchmark):
+    benchmark(mutation_params, "create")
+
+# ---------------------- JSON ----------------------
+
+
+def test_encode_booking(benchmark):
+    benchmark(json.dumps, valid_booking())
+
+
+def test_decode_create_response(benchmark):
+    benchmark(json.loads, CREATE_RESPONSE)
+
+# ---------------------- FIXTURE SETUP ----------------------
+
+
+def test_client_and_token_setup(benchmark, base_url):
+    """What `api_client` + `auth_token` cost a fresh session."""
+    def setup():
+        client = ApiClient(base_url, recorder=MetricsRecorder())
+        try:
+            return TokenProvider(client).get()
+        finally:
+            client.close()
+
+    benchmark(setup)
+
+
+def test_booking_factory_prefetch(benchmark, api_client, auth_token):
+    """Prefetch and teardown of a 20-booking pool, as `booking_factory` does."""
+    def cycle():
+        factory = BookingFactory(api_client, "bench", workers=10)
+        factory.prefetch(Counter(jim_brown=10, eva_white=10))
+        factory.teardown({"Cookie": f"token={auth_token}"})
+
+    benchmark.pedantic(cycle, rounds=10, iterations=1)
+
+# ---------------------- LOGGING ----------------------
+
+
+@pytest.fixture
+def devnull_logger():
+    logger = logging.getLogger("bench")
+    logger.propagate = False
+    with open(os.devnull, "w") as sink:
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(TruncatingFormatter())
+        handler.addFilter(SamplingFilter(1.0))
+        logger.addHandler(handler)
+        yield logger
+        logger.removeHandler(handler)
+
+
+class _Response:
+    text = json.dumps([{"bookingid": i} for i in range(1000)])
+
+
+def test_log_body_filtered_out(benchmark, devnull_logger):
+    devnull_logger.setLevel(logging.INFO)
+    benchmark(devnull_logger.debug, "Response Body: %s", body(_Response()))
+
+
+def test_log_body_formatted(benchmark, devnull_logger):
+    devnull_logger.setLevel(logging.DEBUG)
+    benchmark(devnull_logger.debug, "Response Body: %s", body(_Response()))
@@ -0,0 +1,41 @@
+from utils.payloads import BOOKING_TEMPLATES, with_namespace
+
+BOOKING = with_namespace(BOOKING_TEMPLATES["jim_brown"], "bench")
+
+
+def test_create_round_trip(benchmark, api_client, auth_token):
+    headers = {"Cookie": f"token={auth_token}"}
+    ids = []
+
+    def create():
+        ids.append(api_client.create_booking(BOOKING).json()["bookingid"])
+
+    benchmark(create)
+    for booking_id in ids:
+        api_client.delete_booking(booking_id, headers=headers)
+
+
+def test_get_round_trip(benchmark, api_client, auth_token):
+    booking_id = api_client.create_booking(BOOKING).json()["bookingid"]
+    response = benchmark(api_client.get_booking, booking_id, headers={"Accept": "application/json"})
+    assert response.status_code == 200
+    api_client.delete_booking(booking_id, headers={"Cookie": f"token={auth_token}"})
+
+
+def test_crud_sequence(benchmark, api_client, auth_token):
+    """create -> get -> update -> patch -> delete, one booking per round."""
+    headers = {"Content-Type": "application/json", "Cookie": f"token={auth_token}"}
+
+    def sequence():
+        booking_id = api_client.create_booking(BOOKING).json()["bookingid"]
+        api_client.get_booking(booking_id)
+        api_client.update_booking(booking_id, {**BOOKING, "firstname": "James"}, headers=headers)
+        api_client.patch_booking(booking_id, {"lastname": "Green"}, headers=headers)
+        return api_client.delete_booking(booking_id, headers=headers).status_code
+
+    assert benchmark(sequence) == 201
+
+
+def test_list_with_filter(benchmark, api_client):
+    response = benchmark(api_client.get_bookings, {"firstname": BOOKING["firstname"]})
+    assert response.status_code == 200
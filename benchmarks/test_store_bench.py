@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+import pytest
+from utils.booking_dataset import write_dataset
+from utils.booking_server import BookingStore
+from utils.booking_snapshot import Snapshot, SnapshotStore, write_snapshot
+
+BOOKINGS = 1_000_000
+NAMES = [f"Guest{i}" for i in range(50000)]
+DAYS = [(date(2020, 1, 1) + timedelta(days=i)).isoformat() for i in range(3660)]
+
+
+def bookings():
+    """A million bookings; names and ten years of dates spread by fixed strides."""
+    for i in range(BOOKINGS):
+        yield {
+            "firstname": NAMES[i % len(NAMES)],
+            "lastname": NAMES[i * 7 % len(NAMES)],
+            "totalprice": 100,
+            "depositpaid": True,
+            "bookingdates": {"checkin": DAYS[i * 31 % 3650], "checkout": DAYS[i * 31 % 3650 + i % 10]},
+        }
+
+
+@pytest.fixture(scope="module")
+def store():
+    store = BookingStore()
+    store.load(bookings())
+    return store
+
+
+@pytest.fixture(scope="module")
+def snapshot_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("snapshot") / "bookings.snap")
+    write_snapshot(path, enumerate(bookings(), start=1))
+    return path
+
+
+def test_query_firstname(benchmark, store):
+    assert len(benchmark(store.query, firstname="Guest123")) == BOOKINGS // len(NAMES)
+
+
+def test_query_full_name(benchmark, store):
+    benchmark(store.query, firstname="Guest123", lastname="Guest861")
+
+
+def test_query_name_and_dates(benchmark, store):
+    benchmark(store.query, lastname="Guest861", checkin=date(2024, 1, 1), checkout=date(2026, 1, 1))
+
+
+def test_query_checkin_range(benchmark, store):
+    benchmark(store.query, checkin=date(2029, 12, 25))
+
+
+def test_write_cycle(benchmark, store):
+    """create -> patch -> delete keeps all four indexes current."""
+    booking = {"firstname": "Jim", "lastname": "Brown", "totalprice": 1, "depositpaid": True,
+               "bookingdates": {"checkin": "2024-05-01", "checkout": "2024-05-04"}}
+
+    def cycle():
+        booking_id = store.create(booking)
+        store.patch(booking_id, {"lastname": "Green"})
+        store.delete(booking_id)
+
+    benchmark(cycle)
+
+
+# ---------------------- SNAPSHOT ----------------------
+
+
+def test_snapshot_open(benchmark, snapshot_path):
+    snapshot = benchmark(Snapshot, snapshot_path)
+    assert len(snapshot) == BOOKINGS
+
+
+def test_snapshot_fork(benchmark, snapshot_path):
+    store = SnapshotStore.open(snapshot_path)
+    for i in range(1, 101):
+        store.patch(i, {"additionalneeds": "Breakfast"})
+    benchmark(store.fork)
+
+
+def test_snapshot_query_name_and_dates(benchmark, snapshot_path):
+    store = SnapshotStore.open(snapshot_path)
+    benchmark(store.query, lastname="Guest861", checkin=date(2024, 1, 1), checkout=date(2026, 1, 1))
+
+
+# ---------------------- GENERATED DATASET ----------------------
+
+
+@pytest.fixture(scope="module")
+def generated_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("generated") / "bookings.snap")
+    write_dataset(path, BOOKINGS, seed=7)
+    return path
+
+
+def test_generate_dataset(benchmark, tmp_path):
+    """A million bookings straight into a snapshot; one round, it takes seconds."""
+    path = str(tmp_path / "bookings.snap")
+    benchmark.pedantic(write_dataset, args=(path, BOOKINGS), kwargs={"seed": 7}, rounds=1)
+    assert len(Snapshot(path)) == BOOKINGS
+
+
+@pytest.fixture(scope="module")
+def generated_store(generated_path):
+    store = BookingStore()
+    store.load(booking for _, booking in Snapshot(generated_path).items())
+    return store
+
+
+SUMMER = {"checkin": date(2024, 6, 1), "checkout": date(2024, 9, 1)}
+
+
+def assert_median_under(benchmark, seconds):
+    """Fail a skewed-data query that drifts past its bound (skipped with --benchmark-disable)."""
+    if benchmark.stats is not None:
+        assert benchmark.stats.stats.median < seconds
+
+
+def test_generated_query_full_name(benchmark, generated_store):
+    """The commonest first and last names: two id sets of ~30k intersected."""
+    benchmark(generated_store.query, firstname="James", lastname="Smith")
+    assert_median_under(benchmark, 0.01)
+
+
+def test_generated_query_common_name(benchmark, generated_store):
+    """The commonest first name over a summer: ~33k candidates checked against their dates."""
+    benchmark(generated_store.query, firstname="James", **SUMMER)
+    assert_median_under(benchmark, 0.25)
+
+
+def test_generated_query_dates(benchmark, generated_store):
+    """A summer with no name: the check-in and check-out ranges intersected."""
+    benchmark(generated_store.query, **SUMMER)
+    assert_median_under(benchmark, 0.75)
+
+
+def test_generated_snapshot_query_common_name(benchmark, generated_path):
+    store = SnapshotStore.open(generated_path)
+    benchmark(store.query, firstname="James", **SUMMER)
+    assert_median_under(benchmark, 0.015)
+
+
+def test_generated_snapshot_query_dates(benchmark, generated_path):
+    store = SnapshotStore.open(generated_path)
+    benchmark(store.query, **SUMMER)
+    assert_median_under(benchmark, 0.15)
@@ -0,0 +1,38 @@
+import json
+
+from utils.payloads import BOOKING_TEMPLATES
+from utils.schemas import compile_schema, SCHEMAS, validator
+from utils.streaming import validate_stream
+
+LISTING = [{"bookingid": i} for i in range(10000)]
+LISTING_BYTES = json.dumps(LISTING).encode()
+CREATE_RESPONSE = {"bookingid": 1, "booking": BOOKING_TEMPLATES["jim_brown"]}
+
+
+class _StreamedResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+def test_compile_schema(benchmark):
+    benchmark(compile_schema, SCHEMAS["create_response"])
+
+
+def test_validate_create_response(benchmark):
+    benchmark(validator("create_response"), CREATE_RESPONSE)
+
+
+def test_validate_listing_10k(benchmark):
+    assert benchmark(validator("booking_list"), LISTING) is None
+
+
+def test_stream_validate_listing_10k(benchmark):
+    stats = benchmark(lambda: validate_stream(_StreamedResponse(LISTING_BYTES), "booking_id"))
+    assert stats.count == len(LISTING)
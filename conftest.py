@@ -1,28 +1,395 @@
+import os
+import secrets
+from collections import Counter
+from functools import partial
+
 import pytest
-import requests
-from utils.logger import get_logger  
+from utils.api_client import ApiClient, DEFAULT_POOL_SIZE
+from utils.async_client import DEFAULT_CONCURRENCY, run_matrix, run_single, sender_kwargs
+from utils.booking_factory import BookingFactory
+from utils.async_booking_server import SERVER_MODES, make_server
+from utils.booking_snapshot import SnapshotStore
+from utils.cassette import MODES as CASSETTE_MODES, Cassette
+from utils.differential import TARGETS as DIFF_TARGETS, Differ, DiffPlugin, Mirror
+from utils.exchange_log import open_sink
+from utils.impact import endpoints_for_diff, ImpactSelector
+from utils.logger import get_logger
+from utils.metrics import MetricsRecorder
+from utils.payloads import with_namespace
+from utils.resilience import (BreakerPlugin, CircuitBreaker, DEFAULT_BACKOFF, DEFAULT_COOLDOWN, DEFAULT_RETRIES,
+                              DEFAULT_THRESHOLD, DEFAULT_TIMEOUT, make_retry)
+from utils.scheduler import CostScheduler
+from utils.throttle import Throttle
+from utils.token_provider import DEFAULT_TTL, TokenProvider
+
+LIVE_BASE_URL = "https://restful-booker.herokuapp.com"
+# (requests per second, max in flight) per --target, shared by all workers; 0 = unlimited
+TARGET_LIMITS = {"live": (20.0, 8), "local": (0.0, 0)}
+METRICS_KEY = pytest.StashKey()
+EXCHANGE_LOG_KEY = pytest.StashKey()
+BREAKER_KEY = pytest.StashKey()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--schedule", choices=("file", "cost"), default="file",
+        help="file: collection order; cost: recent failures and new tests first, "
+             "then longest first, grouped by expensive fixtures"
+    )
+    parser.addoption(
+        "--changed-endpoints", default=None,
+        help="Comma-separated 'METHOD /path' patterns (fnmatch); run only the tests whose "
+             "recorded traffic touches them"
+    )
+    parser.addoption(
+        "--changed-since", default=None, metavar="REV",
+        help="Map `git diff REV` to endpoints and run only the tests that touch them"
+    )
+    parser.addoption(
+        "--pool-size", type=int, default=DEFAULT_POOL_SIZE,
+        help="Max keep-alive connections held by the shared API client"
+    )
+    parser.addoption(
+        "--target", choices=("live", "local"), default="live",
+        help="Run against the live API or the bundled in-memory stand-in"
+    )
+    parser.addoption(
+        "--dataset", default=None,
+        help="With --target local, start the stand-in on this booking snapshot; "
+             "each test module gets its own copy-on-write fork"
+    )
+    parser.addoption(
+        "--server-mode", choices=SERVER_MODES, default="threaded",
+        help="How the --target local stand-in serves: a thread per connection, one asyncio "
+             "event loop, or pre-forked processes sharing the socket with the store sharded by id"
+    )
+    parser.addoption(
+        "--server-workers", type=int, default=0,
+        help="Processes for --server-mode prefork (default: one per CPU)"
+    )
+    parser.addoption(
+        "--timings-file", default=None,
+        help="Write per-request timing records here (.json or .csv)"
+    )
+    parser.addoption(
+        "--exchange-log", default=None,
+        help="Structured log of every HTTP exchange (.jsonl, or .colz for a compressed columnar archive)"
+    )
+    parser.addoption(
+        "--cassette", choices=CASSETTE_MODES, default="off",
+        help="record: save every exchange to per-test cassettes; replay: answer from them, no network"
+    )
+    parser.addoption(
+        "--cassette-dir", default="cassettes",
+        help="Where cassettes are written to and replayed from"
+    )
+    parser.addoption(
+        "--token-cache", default=os.path.join(".pytest_cache", "booking_tokens.json"),
+        help="Share live-API auth tokens across sessions and xdist workers through this file "
+             "('' to mint one per session)"
+    )
+    parser.addoption(
+        "--token-ttl", type=float, default=DEFAULT_TTL,
+        help="Seconds a minted token is trusted before it is refreshed"
+    )
+    parser.addoption(
+        "--retries", type=int, default=DEFAULT_RETRIES,
+        help="Retries of an idempotent request on 429/502/503/504 or a dropped connection (0 to disable)"
+    )
+    parser.addoption(
+        "--retry-backoff", type=float, default=DEFAULT_BACKOFF,
+        help="Base of the exponential backoff between retries, in seconds (jittered)"
+    )
+    parser.addoption(
+        "--request-timeout", type=float, default=DEFAULT_TIMEOUT,
+        help="Seconds to wait for a connection or a response before giving up"
+    )
+    parser.addoption(
+        "--breaker-threshold", type=float, default=DEFAULT_THRESHOLD,
+        help="Failure rate over recent requests that opens the circuit breaker and skips "
+             "the remaining tests (0 to disable)"
+    )
+    parser.addoption(
+        "--breaker-cooldown", type=float, default=DEFAULT_COOLDOWN,
+        help="Seconds the breaker stays open before one request probes the upstream again"
+    )
+    parser.addoption(
+        "--rate-limit", type=float, default=None,
+        help="Max requests per second to the target across all workers "
+             f"(default: {TARGET_LIMITS['live'][0]:g} live, unlimited local; 0 = unlimited)"
+    )
+    parser.addoption(
+        "--max-in-flight", type=int, default=None,
+        help="Max requests outstanding at once across all workers "
+             f"(default: {TARGET_LIMITS['live'][1]} live, unlimited local; 0 = unlimited)"
+    )
+    parser.addoption(
+        "--async-matrix", action="store_true", default=False,
+        help="Dispatch every case of an async_matrix-marked test concurrently "
+             "(with xdist, combine with --dist loadgroup)"
+    )
+    parser.addoption(
+        "--matrix-concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help="Max in-flight requests per async matrix"
+    )
+    parser.addoption(
+        "--diff-targets", default=None,
+        help=f"Comma-separated targets ({', '.join(DIFF_TARGETS)}) to mirror every request to; their "
+             "answers are diffed with the run's own and divergences reported"
+    )
+    parser.addoption(
+        "--diff-report", default=None,
+        help="Write the divergences found with --diff-targets to this JSON file"
+    )
+
+def pytest_configure(config):
+    config.stash[METRICS_KEY] = MetricsRecorder()
+    if hasattr(config, "cache"):
+        # xdist workers only reorder; the controller sees every report and records
+        config.pluginmanager.register(CostScheduler(
+            config, reorder=config.getoption("--schedule") == "cost",
+            record=not hasattr(config, "workerinput"),
+        ), "cost_scheduler")
+        config.pluginmanager.register(ImpactSelector(
+            config, config.stash[METRICS_KEY], *changed_endpoints(config)
+        ), "impact_selector")
+    if config.getoption("--breaker-threshold") > 0:
+        breaker = CircuitBreaker(threshold=config.getoption("--breaker-threshold"),
+                                 cooldown=config.getoption("--breaker-cooldown"))
+        config.stash[BREAKER_KEY] = breaker
+        config.pluginmanager.register(BreakerPlugin(config, breaker, config.stash[METRICS_KEY]),
+                                      "circuit_breaker")
+    if diff_targets(config):
+        config.pluginmanager.register(DiffPlugin(config, diff_targets(config)), "differential")
+    # Only the controller writes the exchange log; xdist workers ship it their records
+    if config.getoption("--exchange-log") and not hasattr(config, "workerinput"):
+        sink = open_sink(config.getoption("--exchange-log"))
+        config.stash[EXCHANGE_LOG_KEY] = sink
+        config.stash[METRICS_KEY].add_listener(sink)
+    config.addinivalue_line(
+        "markers",
+        "async_matrix(sender=..., fixtures=()): parametrize cases whose request is made "
+        "by the async `sender`; the test receives it as `matrix_response`"
+    )
+    config.addinivalue_line(
+        "markers",
+        "booking_template(name): each case consumes one pre-created booking of "
+        "this template from the booking factory pool"
+    )
+
+def changed_endpoints(config):
+    """(endpoint patterns or None, changed test files) from the --changed-* options."""
+    patterns, test_files = None, set()
+    if config.getoption("--changed-endpoints"):
+        patterns = {p.strip() for p in config.getoption("--changed-endpoints").split(",") if p.strip()}
+    if config.getoption("--changed-since"):
+        diff_patterns, test_files = endpoints_for_diff(config.getoption("--changed-since"),
+                                                       cwd=str(config.rootpath))
+        patterns = (patterns or set()) | diff_patterns
+    return patterns, test_files
+
+# Before xdist's own hook turns xdist_group marks into the @group suffix of node ids
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    if not config.getoption("--async-matrix"):
+        return
+    # Keep each matrix on one xdist worker so it is dispatched exactly once
+    for item in items:
+        if item.get_closest_marker("async_matrix"):
+            item.add_marker(pytest.mark.xdist_group(f"{item.module.__name__}::{item.originalname}"))
+
+def own_target(config):
+    """What the run's own requests reach: live, local or replay."""
+    return "replay" if config.getoption("--cassette") == "replay" else config.getoption("--target")
+
+def diff_targets(config):
+    """The --diff-targets list, checked."""
+    targets = [t.strip() for t in (config.getoption("--diff-targets") or "").split(",") if t.strip()]
+    for target in targets:
+        if target not in DIFF_TARGETS:
+            raise pytest.UsageError(f"--diff-targets: unknown target {target!r}")
+        if target == own_target(config):
+            raise pytest.UsageError(f"--diff-targets: {target!r} is the run's own target")
+    return targets
+
+def current_worker():
+    """xdist worker id ("gw0", "gw1", ...) or "main" for a serial run."""
+    return os.environ.get("PYTEST_XDIST_WORKER", "main")
+
+def pytest_sessionfinish(session):
+    recorder = session.config.stash[METRICS_KEY]
+    if hasattr(session.config, "workerinput"):
+        # xdist worker: ship records to the controller, which writes the report
+        session.config.workeroutput["request_timings"] = [r._asdict() for r in recorder.records]
+    elif session.config.getoption("--timings-file"):
+        recorder.write(session.config.getoption("--timings-file"))
+
+def pytest_unconfigure(config):
+    sink = config.stash.get(EXCHANGE_LOG_KEY, None)
+    if sink is not None:
+        sink.close()
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    node.config.stash[METRICS_KEY].extend(getattr(node, "workeroutput", {}).get("request_timings", []))
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_html_results_summary(prefix, summary, postfix, session):
+    recorder = session.config.stash[METRICS_KEY]
+    if recorder.records:
+        prefix.append(recorder.html_summary())
+    for name, title in (("circuit_breaker", "Upstream resilience"), ("differential", "Differential")):
+        plugin = session.config.pluginmanager.get_plugin(name)
+        lines = plugin.summary_lines() if plugin is not None else []
+        if lines:
+            prefix.append(f"<h2>{title}</h2>" + "".join(f"<p>{line}</p>" for line in lines))
 
 @pytest.fixture(scope="session")
 def logger():
-    return get_logger("QA_Automation")  
+    return get_logger("QA_Automation")
 
 @pytest.fixture(scope="session")
-def base_url():
-    return "https://restful-booker.herokuapp.com"
+def booking_server(request, logger):
+    store = None
+    if request.config.getoption("--dataset"):
+        # Never persisted: test writes only ever reach forks of the snapshot
+        store = SnapshotStore.open(request.config.getoption("--dataset"))
+        logger.info("Loaded %s bookings from %s", len(store), request.config.getoption("--dataset"))
+    server = make_server(request.config.getoption("--server-mode"), request.config.getoption("--server-workers"),
+                         store=store).start()
+    logger.info("Stand-in booking server (%s) listening on %s", server.mode, server.url)
+    yield server
+    server.stop()
 
 @pytest.fixture(scope="session")
-def auth_token(base_url, logger):
-    logger.info("Requesting auth token...")
-    payload = {
-        "username": "admin",
-        "password": "password123"
-    }
-    response = requests.post(f"{base_url}/auth", json=payload)
-    logger.debug(f"Auth response: {response.status_code} | {response.text}")
-    assert response.status_code == 200
-    token = response.json()["token"]
+def nonexistent_booking_id(request):
+    """An id no booking has: past the end of a --dataset, else one the live API never reaches."""
+    if request.config.getoption("--dataset") and request.config.getoption("--target") == "local":
+        return request.getfixturevalue("booking_server").store.snapshot.next_id + 999999
+    return 999999
+
+@pytest.fixture(scope="module", autouse=True)
+def dataset_fork(request):
+    """Give each module a copy-on-write fork of the --dataset store."""
+    config = request.config
+    # Pre-forked workers each hold their own shard of the store; there is none to swap here
+    if (not config.getoption("--dataset") or config.getoption("--target") != "local"
+            or config.getoption("--cassette") == "replay" or config.getoption("--server-mode") == "prefork"):
+        yield
+        return
+    if any("booking_factory" in item.fixturenames for item in request.node.session.items
+           if item.module is request.module):
+        # Pooled bookings are created once for the session; fork after they exist
+        request.getfixturevalue("booking_factory")
+    server = request.getfixturevalue("booking_server")
+    session_store = server.store
+    server.store = session_store.fork()
+    yield
+    server.store = session_store
+
+@pytest.fixture(scope="session")
+def base_url(request):
+    # Replay never touches the network, so there is nothing to start
+    if request.config.getoption("--target") == "local" and request.config.getoption("--cassette") != "replay":
+        return request.getfixturevalue("booking_server").url
+    return LIVE_BASE_URL
+
+@pytest.fixture(scope="session")
+def cassette(request, booking_namespace):
+    """`Cassette` for --cassette record/replay, or None when off."""
+    mode = request.config.getoption("--cassette")
+    if mode == "off":
+        yield None
+        return
+    cassette = Cassette(request.config.getoption("--cassette-dir"), mode, namespace=booking_namespace)
+    yield cassette
+    cassette.save()
+
+def make_throttle(config, target):
+    """`Throttle` for `target` (live, local or replay); live is shared through the pytest cache dir."""
+    if target == "replay":
+        # Replay sends nothing
+        return Throttle()
+    rate, max_in_flight = TARGET_LIMITS[target]
+    if config.getoption("--rate-limit") is not None:
+        rate = config.getoption("--rate-limit")
+    if config.getoption("--max-in-flight") is not None:
+        max_in_flight = config.getoption("--max-in-flight")
+    # Each worker starts its own stand-in
+    if target == "local":
+        return Throttle(rate, max_in_flight=max_in_flight)
+    path = None
+    if hasattr(config, "cache"):
+        path = os.path.join(str(config.cache.mkdir("booking-qa-throttle")), target)
+    return Throttle(rate, max_in_flight=max_in_flight, path=path)
+
+@pytest.fixture(scope="session")
+def throttle(request, base_url):
+    """`Throttle` for the host the run's requests actually reach (benchmarks override `base_url`)."""
+    if request.config.getoption("--cassette") == "replay":
+        target = "replay"
+    else:
+        target = "live" if base_url == LIVE_BASE_URL else "local"
+    return make_throttle(request.config, target)
+
+def client_resilience(config, throttle):
+    """retry/breaker/timeout/throttle kwargs shared by the sync and async clients."""
+    # Replayed exchanges were already retried when recorded; never sleep on them
+    retry = make_retry(config.getoption("--retries"), config.getoption("--retry-backoff"),
+                       wait=config.getoption("--cassette") != "replay")
+    return {"retry": retry, "breaker": config.stash.get(BREAKER_KEY, None),
+            "timeout": config.getoption("--request-timeout"), "throttle": throttle}
+
+@pytest.fixture(scope="session")
+def differ(request, booking_namespace):
+    """`Differ` mirroring every request to the --diff-targets, or None."""
+    targets = diff_targets(request.config)
+    if not targets:
+        yield None
+        return
+    differ = Differ([Mirror(target, mirror_client(request, target, booking_namespace)) for target in targets])
+    request.config.pluginmanager.get_plugin("differential").differ = differ
+    yield differ
+    differ.close()
+
+def mirror_client(request, target, namespace):
+    """Client for one of the --diff-targets; it records no metrics and trips no breaker."""
+    config = request.config
+    options = {"pool_size": config.getoption("--pool-size"), "timeout": config.getoption("--request-timeout"),
+               "retry": make_retry(config.getoption("--retries"), config.getoption("--retry-backoff"),
+                                   wait=target != "replay")}
+    if target == "replay":
+        return ApiClient(LIVE_BASE_URL, cassette=Cassette(config.getoption("--cassette-dir"), "replay",
+                                                          namespace=namespace), **options)
+    if target == "local":
+        return ApiClient(request.getfixturevalue("booking_server").url, **options)
+    return ApiClient(LIVE_BASE_URL, throttle=make_throttle(config, "live"), **options)
+
+@pytest.fixture(scope="session")
+def api_client(base_url, request, cassette, differ, throttle):
+    client = ApiClient(base_url, pool_size=request.config.getoption("--pool-size"),
+                       recorder=request.config.stash[METRICS_KEY], cassette=cassette, differ=differ,
+                       **client_resilience(request.config, throttle))
+    yield client
+    client.close()
+
+@pytest.fixture(scope="session")
+def token_provider(request, api_client, logger):
+    """Admin tokens; against the live API they are cached on disk and shared by workers."""
+    # The stand-in forgets its tokens on exit, and cassettes and mirrors must see every /auth
+    shared = (request.config.getoption("--target") == "live"
+              and request.config.getoption("--cassette") == "off" and not request.config.getoption("--diff-targets"))
+    provider = TokenProvider(api_client, cache_path=request.config.getoption("--token-cache") if shared else None,
+                             ttl=request.config.getoption("--token-ttl"))
+    logger.info("Requesting auth token for worker %s...", current_worker())
+    provider.get()
     logger.info("Auth token acquired.")
-    return token
+    return provider
+
+@pytest.fixture(scope="function")
+def auth_token(token_provider):
+    """The provider's current token, re-minted shortly before it expires."""
+    return token_provider.get()
 
 @pytest.fixture(scope="function")
 def headers_with_token(auth_token):
@@ -30,3 +397,83 @@ def headers_with_token(auth_token):
         "Content-Type": "application/json",
         "Cookie": f"token={auth_token}"
     }
+
+@pytest.fixture(scope="session")
+def booking_namespace():
+    """Unique per worker process, so parallel workers never see each other's bookings."""
+    return f"{current_worker()}{secrets.token_hex(3)}"
+
+@pytest.fixture(scope="session")
+def namespaced(booking_namespace):
+    return partial(with_namespace, namespace=booking_namespace)
+
+@pytest.fixture(scope="session")
+def booking_factory(request, api_client, token_provider, booking_namespace, logger):
+    """Session pool of pre-created bookings, sized from `booking_template` marks."""
+    factory = BookingFactory(api_client, booking_namespace,
+                             workers=request.config.getoption("--pool-size"))
+    workers = getattr(request.config, "workerinput", {}).get("workercount", 1)
+    # A dispatched matrix tops up its own pool, and under xdist only one worker runs it
+    own_pool = workers > 1 and request.config.getoption("--async-matrix")
+    demand = Counter(
+        marker.args[0]
+        for item, marker in ((item, item.get_closest_marker("booking_template")) for item in request.session.items)
+        if marker and not (own_pool and item.get_closest_marker("async_matrix"))
+    )
+    if workers > 1:
+        # Every xdist worker collects the whole session but runs about its share of it;
+        # take() creates any shortfall
+        demand = Counter({template: -(-count // workers) for template, count in demand.items()})
+    factory.prefetch(demand)
+    logger.info("Prefetched %s bookings: %s", sum(demand.values()), dict(demand))
+    yield factory
+    failed = factory.teardown({"Cookie": f"token={token_provider.get()}"})
+    if failed:
+        logger.warning("Could not clean up bookings: %s", failed)
+
+@pytest.fixture(scope="function")
+def created_booking(request, booking_factory):
+    """A fresh booking (id, payload) of the test's `booking_template`."""
+    marker = request.node.get_closest_marker("booking_template")
+    assert marker, "created_booking needs a @pytest.mark.booking_template(name) mark"
+    return booking_factory.take(marker.args[0])
+
+@pytest.fixture(scope="session")
+def matrix_results():
+    return {}
+
+@pytest.fixture(scope="function")
+def matrix_response(request, api_client, base_url, matrix_results, cassette, differ, throttle):
+    """Response for the current case of an `async_matrix`-marked test.
+
+    With --async-matrix the first case to run sends the whole matrix at once and
+    the other cases pick up their cached result; otherwise each case is sent on
+    its own through the shared pooled client.
+    """
+    marker = request.node.get_closest_marker("async_matrix")
+    sender = marker.kwargs["sender"]
+    shared = {name: request.getfixturevalue(name) for name in marker.kwargs.get("fixtures", ())}
+
+    if not request.config.getoption("--async-matrix"):
+        return run_single(api_client, sender, sender_kwargs(sender, request.node.callspec.params, shared),
+                          test_id=request.node.nodeid)
+
+    if request.node.nodeid not in matrix_results:
+        siblings = [
+            item for item in request.session.items
+            if item.parent is request.node.parent and item.originalname == request.node.originalname
+        ]
+        cases = [sender_kwargs(sender, item.callspec.params, shared) for item in siblings]
+        template = request.node.get_closest_marker("booking_template")
+        if template and "booking_factory" in shared:
+            shared["booking_factory"].top_up(template.args[0], len(siblings))
+        responses = run_matrix(base_url, sender, cases, request.config.getoption("--matrix-concurrency"),
+                               recorder=request.config.stash[METRICS_KEY],
+                               test_ids=[item.nodeid for item in siblings], cassette=cassette, differ=differ,
+                               **client_resilience(request.config, throttle))
+        matrix_results.update(zip((item.nodeid for item in siblings), responses))
+
+    result = matrix_results.pop(request.node.nodeid)
+    if isinstance(result, BaseException):
+        raise result
+    return result
@@ -1,7 +1,7 @@
-import requests
 import pytest
+from utils.logger import body
+from utils.schemas import assert_schema
 
-AUTH_URL = "https://restful-booker.herokuapp.com/auth"
 HEADERS = {
     "Content-Type": "application/json"
 }
@@ -9,7 +9,7 @@ HEADERS = {
 # ---------------------- POSITIVE TESTS ----------------------
 
 
-def test_auth_token_success(logger):
+def test_auth_token_success(api_client, logger):
     """Happy path: Valid credentials return token"""
     payload = {
         "username": "admin",
@@ -17,18 +17,23 @@ def test_auth_token_success(logger):
     }
 
     logger.info("Sending POST request to /auth with valid credentials")
-    response = requests.post(AUTH_URL, json=payload, headers=HEADERS)
-    logger.debug(f"Auth response: {response.status_code} - {response.text}")
+    response = api_client.auth(payload, headers=HEADERS)
+    logger.debug("Auth response: %s - %s", response.status_code, body(response))
 
     assert response.status_code == 200
     data = response.json()
-    assert "token" in data
-    assert isinstance(data["token"], str) and len(data["token"]) > 0
+    assert_schema("auth", data)
+    assert len(data["token"]) > 0
     logger.info("Auth token successfully retrieved")
 
 # ---------------------- NEGATIVE TESTS ----------------------
 
 
+async def _send_auth(client, payload):
+    return await client.auth(payload, headers=HEADERS)
+
+
+@pytest.mark.async_matrix(sender=_send_auth)
 @pytest.mark.parametrize("description,payload,expected_status", [
     pytest.param(
         "invalid username", {"username": "wrong",
@@ -62,11 +67,11 @@ def test_auth_token_success(logger):
             reason="API accepts empty auth payload; still returns 200")
     ),
 ])
-def test_auth_invalid_credentials_or_missing_fields(description, payload, expected_status, logger):
+def test_auth_invalid_credentials_or_missing_fields(matrix_response, description, payload, expected_status, logger):
     """Non-happy paths: Invalid credentials or missing fields"""
-    logger.info(f"Testing auth with {description}: {payload}")
-    response = requests.post(AUTH_URL, json=payload, headers=HEADERS)
-    logger.debug(f"Response: {response.status_code} - {response.text}")
+    logger.info("Testing auth with %s: %s", description, payload)
+    response = matrix_response
+    logger.debug("Response: %s - %s", response.status_code, body(response))
 
     assert response.status_code == expected_status, (
         f"{description}: Expected {expected_status}, got {response.status_code}"
@@ -81,13 +86,12 @@ def test_auth_invalid_credentials_or_missing_fields(description, payload, expect
         # optional: customize this if the API returns specific error message for missing fields
         assert "reason" in data or "error" in data, f"{description}: Error message expected"
 
-def test_auth_non_json_payload(logger):
+def test_auth_non_json_payload(api_client, logger):
     """Non-happy path: Sending non-JSON payload"""
     logger.info("Testing auth with non-JSON payload")
-    response = requests.post(
-        AUTH_URL, data="username=admin&password=password123", headers=HEADERS)
-    logger.debug(
-        f"Non-JSON response: {response.status_code} - {response.text}")
+    response = api_client.auth(
+        data="username=admin&password=password123", headers=HEADERS)
+    logger.debug("Non-JSON response: %s - %s", response.status_code, body(response))
 
     assert response.status_code in [
         400, 500], "Expected 400/500 for malformed payload"
@@ -0,0 +1,156 @@
+from datetime import date
+
+import pytest
+from utils.booking_dataset import write_dataset
+from utils.booking_server import BookingStore
+from utils.booking_snapshot import Snapshot, SnapshotStore
+
+ROWS = 2000
+BOOKING = {
+    "firstname": "Sally",
+    "lastname": "Brown",
+    "totalprice": 111,
+    "depositpaid": True,
+    "bookingdates": {"checkin": "2024-07-01", "checkout": "2024-07-05"},
+    "additionalneeds": "Breakfast",
+}
+QUERIES = [
+    {},
+    {"firstname": "James"},
+    {"lastname": "Smith"},
+    {"firstname": "Sally"},
+    {"firstname": "James", "lastname": "Smith"},
+    {"firstname": "Nobody"},
+    {"checkin": date(2024, 6, 1)},
+    {"checkout": date(2019, 1, 1)},
+    {"checkin": date(2024, 6, 1), "checkout": date(2024, 9, 1)},
+    {"firstname": "Mary", "checkin": date(2020, 1, 1), "checkout": date(2025, 1, 1)},
+]
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """A small generated dataset: skewed names, so queries hit both common and rare values."""
+    path = str(tmp_path / "bookings.snap")
+    write_dataset(path, ROWS, seed=3)
+    return path
+
+
+def apply_writes(store):
+    """The same create/replace/patch/delete mix on any store; returns the created id."""
+    created = store.create(dict(BOOKING))
+    store.replace(1, dict(BOOKING, lastname="Green"))
+    store.patch(2, {"firstname": "James"})
+    store.patch(created, {"totalprice": 222})
+    store.delete(3)
+    return created
+
+
+# ---------------------- LOG ----------------------
+
+def test_writes_survive_reopen_through_the_log(snapshot_path):
+    store = SnapshotStore.open(snapshot_path, persist=True)
+    created = apply_writes(store)
+    expected = dict(store.items())
+    store.close()
+
+    reopened = SnapshotStore.open(snapshot_path, persist=True)
+
+    assert dict(reopened.items()) == expected
+    assert reopened.get(3) is None
+    assert reopened.get(1)["lastname"] == "Green"
+    assert reopened.get(created)["totalprice"] == 222
+    assert len(reopened) == ROWS
+    reopened.close()
+
+
+def test_torn_final_log_line_is_ignored(snapshot_path):
+    store = SnapshotStore.open(snapshot_path, persist=True)
+    store.delete(5)
+    store.close()
+    with open(f"{snapshot_path}.log", "a") as fh:
+        fh.write('["del", 6')
+
+    reopened = SnapshotStore.open(snapshot_path, persist=True)
+
+    assert reopened.get(5) is None
+    assert reopened.get(6) is not None
+    created = reopened.create(dict(BOOKING))
+    reopened.close()
+
+    # The write after the torn line must not be glued onto it and lost
+    again = SnapshotStore.open(snapshot_path, persist=True)
+    assert again.get(created) == BOOKING
+    assert again.get(6) is not None
+    again.close()
+
+
+# ---------------------- COMPACTION ----------------------
+
+def test_compaction_folds_the_log_into_the_snapshot(snapshot_path):
+    store = SnapshotStore.open(snapshot_path, persist=True)
+    created = apply_writes(store)
+    expected = dict(store.items())
+    store.compact()
+    store.close()
+
+    assert Snapshot(snapshot_path).next_id == created + 1
+    with open(f"{snapshot_path}.log") as fh:
+        assert fh.read() == ""
+
+    reopened = SnapshotStore.open(snapshot_path, persist=True)
+    assert dict(reopened.items()) == expected
+    assert reopened.create(dict(BOOKING)) == created + 1, "Ids must not be reused after compaction"
+    reopened.close()
+
+
+def test_compact_every_compacts_on_its_own(snapshot_path):
+    store = SnapshotStore.open(snapshot_path, persist=True, compact_every=3)
+    for booking_id in range(1, 4):
+        store.delete(booking_id)
+    store.close()
+
+    assert len(Snapshot(snapshot_path)) == ROWS - 3
+
+
+# ---------------------- FORKS ----------------------
+
+def test_fork_writes_stay_in_the_fork(snapshot_path):
+    parent = SnapshotStore.open(snapshot_path)
+    parent.patch(1, {"firstname": "Parent"})
+    child = parent.fork()
+
+    child.patch(1, {"firstname": "Child"})
+    child.delete(2)
+    created = child.create(dict(BOOKING))
+
+    assert parent.get(1)["firstname"] == "Parent"
+    assert parent.get(2) is not None
+    assert parent.get(created) is None
+    assert child.get(1)["firstname"] == "Child"
+    assert child.get(2) is None
+
+
+def test_parent_writes_after_fork_stay_in_the_parent(snapshot_path):
+    parent = SnapshotStore.open(snapshot_path)
+    child = parent.fork()
+
+    parent.delete(1)
+    parent.patch(2, {"lastname": "Parent"})
+
+    assert child.get(1) is not None
+    assert child.get(2)["lastname"] != "Parent"
+    assert child.query(lastname="Parent") == []
+
+
+# ---------------------- QUERIES ----------------------
+
+@pytest.mark.parametrize("filters", QUERIES, ids=repr)
+def test_queries_match_booking_store(snapshot_path, filters):
+    reference = BookingStore()
+    reference.load(booking for _, booking in Snapshot(snapshot_path).items())
+    store = SnapshotStore.open(snapshot_path)
+    apply_writes(reference)
+    apply_writes(store)
+
+    assert store.query(**filters) == reference.query(**filters)
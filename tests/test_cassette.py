@@ -0,0 +1,49 @@
+import pytest
+from utils.api_client import ApiClient
+from utils.booking_server import BookingServer
+from utils.cassette import Cassette, CassetteMissError
+
+BOOKING = {
+    "firstname": "Sally",
+    "lastname": "Brown",
+    "totalprice": 111,
+    "depositpaid": True,
+    "bookingdates": {"checkin": "2024-07-01", "checkout": "2024-07-05"},
+}
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    """Record a create and a read against the stand-in; returns the cassette dir and answers."""
+    directory = str(tmp_path / "cassettes")
+    cassette = Cassette(directory, "record")
+    with BookingServer() as server:
+        client = ApiClient(server.url, cassette=cassette)
+        created = client.create_booking(BOOKING).json()
+        fetched = client.get_booking(created["bookingid"]).json()
+    cassette.save()
+    return directory, created, fetched
+
+
+def test_replay_answers_without_the_network(recorded):
+    directory, created, fetched = recorded
+    # Nothing listens here: every answer must come from the cassette
+    client = ApiClient("http://127.0.0.1:9", cassette=Cassette(directory, "replay"))
+
+    assert client.create_booking(BOOKING).json() == created
+    assert client.get_booking(created["bookingid"]).json() == fetched
+
+
+def test_replay_miss_raises(recorded):
+    directory, _, _ = recorded
+    client = ApiClient("http://127.0.0.1:9", cassette=Cassette(directory, "replay"))
+
+    with pytest.raises(CassetteMissError, match="No recorded exchange"):
+        client.create_booking(dict(BOOKING, firstname="Unrecorded"))
+
+
+def test_replay_miss_on_empty_directory(tmp_path):
+    client = ApiClient("http://127.0.0.1:9", cassette=Cassette(str(tmp_path), "replay"))
+
+    with pytest.raises(CassetteMissError):
+        client.get("/booking")
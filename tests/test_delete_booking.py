@@ -1,39 +1,26 @@
-import requests
 import pytest
+from utils.logger import body
 
 # ---------------------- POSITIVE TESTS ----------------------
 
-def test_delete_booking_success(base_url, headers_with_token, logger):
-    # Step 1: Create a booking to delete
-    payload = {
-        "firstname": "Jim",
-        "lastname": "Brown",
-        "totalprice": 111,
-        "depositpaid": True,
-        "bookingdates": {
-            "checkin": "2018-01-01",
-            "checkout": "2019-01-01"
-        },
-        "additionalneeds": "Breakfast"
-    }
-
-    response = requests.post(f"{base_url}/booking", json=payload)
-    assert response.status_code == 200
-    booking_id = response.json()["bookingid"]
-    logger.info(f"Created booking for deletion: {booking_id}")
+@pytest.mark.booking_template("jim_brown")
+def test_delete_booking_success(api_client, created_booking, headers_with_token, logger):
+    # Step 1: Take a pre-created booking to delete
+    booking_id = created_booking.id
+    logger.info("Using booking for deletion: %s", booking_id)
 
     # Step 2: Delete
-    delete_response = requests.delete(
-        f"{base_url}/booking/{booking_id}",
+    delete_response = api_client.delete_booking(
+        booking_id,
         headers=headers_with_token
     )
-    logger.info(f"DELETE /booking/{booking_id} -> {delete_response.status_code}")
-    logger.debug(delete_response.text)
+    logger.info("DELETE /booking/%s -> %s", booking_id, delete_response.status_code)
+    logger.debug("%s", body(delete_response))
 
     assert delete_response.status_code in [200, 201], "Expected successful deletion"
 
     # Step 3: Confirm Deletion
-    confirm_response = requests.get(f"{base_url}/booking/{booking_id}")
+    confirm_response = api_client.get_booking(booking_id)
     assert confirm_response.status_code == 404, "Booking still exists after deletion"
 
 # ---------------------- NEGATIVE TESTS ----------------------
@@ -43,9 +30,9 @@ def test_delete_booking_success(base_url, headers_with_token, logger):
     ("Delete without token", 1, {}, 403),
     ("Delete with invalid token", 1, {"Cookie": "token=invalid"}, 403),
 ])
-def test_delete_booking_negative_cases(base_url, logger, description, booking_id, headers, expected_status):
-    url = f"{base_url}/booking/{booking_id}"
-    logger.info(f"{description} - Attempting DELETE {url}")
-    response = requests.delete(url, headers=headers)
-    logger.info(f"Response: {response.status_code} - {response.text}")
+def test_delete_booking_negative_cases(api_client, logger, description, booking_id, headers, expected_status):
+    url = api_client.url(f"/booking/{booking_id}")
+    logger.info("%s - Attempting DELETE %s", description, url)
+    response = api_client.delete_booking(booking_id, headers=headers)
+    logger.info("Response: %s - %s", response.status_code, body(response))
     assert response.status_code == expected_status, f"{description} failed (got {response.status_code})"
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+from utils.exchange_log import ColumnarSink, JsonLinesSink, load
+from utils.metrics import RequestRecord
+
+
+def record(i):
+    return RequestRecord(test=f"tests/test_x.py::test_{i % 2}", phase="call", method="GET",
+                         endpoint="/booking/{id}", params="", status=200 if i % 3 else 404,
+                         bytes=100 + i, body_hash=f"h{i}", dns=0.0, connect=0.0, tls=0.0,
+                         ttfb=i / 1000, total=i / 100, retries=0)
+
+
+def rows(exchanges):
+    return [exchanges.row(i) for i in range(len(exchanges))]
+
+
+@pytest.fixture
+def expected(tmp_path):
+    """The same seven exchanges through the JSON lines sink, as the reference."""
+    sink = JsonLinesSink(str(tmp_path / "exchanges.jsonl"))
+    for i in range(7):
+        sink(record(i))
+    sink.close()
+    return rows(load(str(tmp_path / "exchanges.jsonl")))
+
+
+def test_row_groups_round_trip(tmp_path, expected):
+    path = str(tmp_path / "exchanges.colz")
+    sink = ColumnarSink(path, row_group=3)
+    for i in range(7):
+        sink(record(i))
+
+    # Two full groups are on disk before close
+    assert rows(load(path)) == expected[:6]
+    sink.close()
+    assert rows(load(path)) == expected
+
+
+def test_torn_row_group_is_skipped(tmp_path, expected):
+    path = str(tmp_path / "exchanges.colz")
+    sink = ColumnarSink(path, row_group=3)
+    for i in range(6):
+        sink(record(i))
+    sink.close()
+    with open(path, "r+b") as fh:
+        fh.truncate(os.path.getsize(path) - 5)
+
+    exchanges = load(path)
+
+    assert rows(exchanges) == expected[:3]
+    assert exchanges.status_by_endpoint() == {"GET /booking/{id}": {200: 2, 404: 1}}
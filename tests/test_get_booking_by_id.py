@@ -1,41 +1,30 @@
-import requests
 import pytest
+from utils.logger import body
+from utils.schemas import assert_schema
 
 # ---------------------- POSITIVE TESTS ----------------------
 
-def test_get_booking_by_id_success(base_url, logger):
+@pytest.mark.booking_template("sally_brown")
+def test_get_booking_by_id_success(api_client, created_booking, logger):
     """Happy path: Successfully retrieve booking by ID"""
-    # Step 1: Create a new booking
-    create_payload = {
-        "firstname": "Sally",
-        "lastname": "Brown",
-        "totalprice": 111,
-        "depositpaid": True,
-        "bookingdates": {
-            "checkin": "2013-02-23",
-            "checkout": "2014-10-23"
-        },
-        "additionalneeds": "Breakfast"
-    }
-
-    create_response = requests.post(f"{base_url}/booking", json=create_payload)
-    assert create_response.status_code == 200, f"Booking creation failed: {create_response.text}"
-    booking_id = create_response.json()["bookingid"]
-
-    logger.info(f"Created booking with ID: {booking_id}")
+    # Step 1: Take a pre-created booking
+    booking_id, create_payload = created_booking
+
+    logger.info("Using booking with ID: %s", booking_id)
 
     # Step 2: Get booking by ID
     headers = {"Accept": "application/json"}
-    get_response = requests.get(f"{base_url}/booking/{booking_id}", headers=headers)
+    get_response = api_client.get_booking(booking_id, headers=headers)
 
-    logger.info(f"GET /booking/{booking_id} - Status Code: {get_response.status_code}")
-    logger.debug(f"Booking Details: {get_response.text}")
+    logger.info("GET /booking/%s - Status Code: %s", booking_id, get_response.status_code)
+    logger.debug("Booking Details: %s", body(get_response))
 
     assert get_response.status_code == 200
 
     data = get_response.json()
-    assert data["firstname"] == "Sally"
-    assert data["lastname"] == "Brown"
+    assert_schema("booking", data)
+    assert data["firstname"] == create_payload["firstname"]
+    assert data["lastname"] == create_payload["lastname"]
     assert data["totalprice"] == 111
     assert data["depositpaid"] is True
     assert data["bookingdates"]["checkin"] == "2013-02-23"
@@ -49,11 +38,11 @@ def test_get_booking_by_id_success(base_url, logger):
     ("negative ID", -1),
     ("string ID", "abc123"),
 ])
-def test_get_booking_invalid_id_formats(base_url, test_case, booking_id, logger):
+def test_get_booking_invalid_id_formats(api_client, test_case, booking_id, logger):
     """Non-happy path: Request booking with invalid or non-existent ID"""
-    url = f"{base_url}/booking/{booking_id}"
-    logger.info(f"Testing {test_case} with ID: {booking_id}")
-    response = requests.get(url, headers={"Accept": "application/json"})
+    url = api_client.url(f"/booking/{booking_id}")
+    logger.info("Testing %s with ID: %s", test_case, booking_id)
+    response = api_client.get_booking(booking_id, headers={"Accept": "application/json"})
 
-    logger.debug(f"GET {url} - Status: {response.status_code} - Body: {response.text}")
+    logger.debug("GET %s - Status: %s - Body: %s", url, response.status_code, body(response))
     assert response.status_code == 404, f"{test_case}: Expected 404 but got {response.status_code}"
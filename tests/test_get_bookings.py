@@ -1,45 +1,61 @@
-import requests
 import pytest
+from utils.logger import body
+from utils.streaming import validate_stream
 
 BOOKING_ENDPOINT = "/booking"
 
 # ---------------------- POSITIVE TESTS ----------------------
 
-def test_get_all_booking_ids_success(base_url, logger):
-    url = f"{base_url}{BOOKING_ENDPOINT}"
-    response = requests.get(url)
+def test_get_all_booking_ids_success(api_client, logger):
+    url = api_client.url(BOOKING_ENDPOINT)
+    # The shared listing grows without bound; parse it incrementally, never whole
+    response = api_client.get_bookings(stream=True)
 
-    logger.info(f"GET {url} - Status Code: {response.status_code}")
-    logger.debug(f"Response Body: {response.text}")
+    logger.info("GET %s - Status Code: %s", url, response.status_code)
 
     assert response.status_code == 200, f"Expected 200 OK but got {response.status_code}"
-    data = response.json()
-    assert isinstance(data, list), "Expected response to be a list"
-
-    if data:
-        assert "bookingid" in data[0], "Missing 'bookingid' in response item"
-        assert isinstance(data[0]["bookingid"], int), "'bookingid' should be an integer"
-
-
-def test_get_booking_by_firstname_success(base_url, logger):
-    url = f"{base_url}{BOOKING_ENDPOINT}"
-    params = {"firstname": "Jim"}
-    response = requests.get(url, params=params)
-
-    logger.info(f"GET {url} with params {params} - Status Code: {response.status_code}")
-    logger.debug(f"Response Body: {response.text}")
+    stats = validate_stream(response, "booking_id")
+    logger.info("Validated %s booking ids (%s bytes) in %.1f ms, %.0f ids/s", stats.count, stats.bytes,
+                stats.seconds * 1000, stats.count / stats.seconds if stats.seconds else 0)
+
+
+def test_get_booking_by_firstname_success(api_client, booking_factory, namespaced, logger):
+    # Filter on this worker's namespaced name so parallel workers never collide
+    payload = namespaced({
+        "firstname": "Jim",
+        "lastname": "Brown",
+        "totalprice": 111,
+        "depositpaid": True,
+        "bookingdates": {
+            "checkin": "2018-01-01",
+            "checkout": "2019-01-01"
+        },
+        "additionalneeds": "Breakfast"
+    })
+    booking_id = api_client.create_booking(payload).json()["bookingid"]
+    booking_factory.track(booking_id)
+
+    url = api_client.url(BOOKING_ENDPOINT)
+    params = {"firstname": payload["firstname"]}
+    response = api_client.get_bookings(params)
+
+    logger.info("GET %s with params %s - Status Code: %s", url, params, response.status_code)
+    logger.debug("Response Body: %s", body(response))
 
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
+    data = response.json()
+    assert isinstance(data, list)
+    assert booking_id in [item["bookingid"] for item in data], "Created booking missing from filter"
 
 
-def test_get_booking_by_date_range_success(base_url, logger):
-    url = f"{base_url}{BOOKING_ENDPOINT}"
-    params = {"checkin": "2024-01-01", "checkout": "2024-01-05"}
-    response = requests.get(url, params=params)
+def test_get_booking_by_date_range_success(api_client, namespaced, logger):
+    url = api_client.url(BOOKING_ENDPOINT)
+    params = namespaced({"firstname": "Jim"})
+    params.update({"checkin": "2024-01-01", "checkout": "2024-01-05"})
+    response = api_client.get_bookings(params)
 
-    logger.info(f"GET {url} with params {params} - Status Code: {response.status_code}")
-    logger.debug(f"Response Body: {response.text}")
+    logger.info("GET %s with params %s - Status Code: %s", url, params, response.status_code)
+    logger.debug("Response Body: %s", body(response))
 
     assert response.status_code == 200
     assert isinstance(response.json(), list)
@@ -55,12 +71,12 @@ def test_get_booking_by_date_range_success(base_url, logger):
         marks=pytest.mark.xfail(reason="API does not validate unknown query param keys")
     ),
 ])
-def test_get_booking_with_query_params_validation(base_url, logger, description, params, expected_status):
-    url = f"{base_url}{BOOKING_ENDPOINT}"
-    response = requests.get(url, params=params)
+def test_get_booking_with_query_params_validation(api_client, logger, description, params, expected_status):
+    url = api_client.url(BOOKING_ENDPOINT)
+    response = api_client.get_bookings(params)
 
-    logger.info(f"{description} - GET {url} with {params} - Status: {response.status_code}")
-    logger.debug(f"Response Body: {response.text}")
+    logger.info("%s - GET %s with %s - Status: %s", description, url, params, response.status_code)
+    logger.debug("Response Body: %s", body(response))
 
     assert response.status_code == expected_status
 
@@ -79,12 +95,12 @@ def test_get_booking_with_query_params_validation(base_url, logger, description,
         marks=pytest.mark.xfail(reason="API returns 500 instead of 400 for invalid month")
     ),
 ])
-def test_get_booking_invalid_date_format(base_url, description, params, logger):
-    url = f"{base_url}/booking"
-    response = requests.get(url, params=params)
+def test_get_booking_invalid_date_format(api_client, description, params, logger):
+    url = api_client.url(BOOKING_ENDPOINT)
+    response = api_client.get_bookings(params)
 
-    logger.info(f"{description} → GET {url} with params {params} - Status Code: {response.status_code}")
-    logger.debug(f"Response Body: {response.text}")
+    logger.info("%s → GET %s with params %s - Status Code: %s", description, url, params, response.status_code)
+    logger.debug("Response Body: %s", body(response))
 
     assert response.status_code == 400, f"{description} → Expected 400, got {response.status_code}"
 
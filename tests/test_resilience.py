@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+from utils.resilience import CircuitBreaker, CircuitOpenError, is_failure
+
+
+def tripped(cooldown):
+    """A breaker that has just opened: ten calls, half of them failed."""
+    breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=10, cooldown=cooldown)
+    for failed in [False, True] * 5:
+        breaker.check()
+        breaker.record(failed)
+    return breaker
+
+
+def test_stays_closed_below_min_calls():
+    breaker = CircuitBreaker(threshold=0.5, window=10, min_calls=10)
+    for _ in range(9):
+        breaker.record(True)
+
+    assert breaker.state == "closed"
+    breaker.check()
+
+
+def test_opens_at_threshold_and_fails_fast():
+    breaker = tripped(cooldown=60)
+
+    assert breaker.state == "open"
+    assert breaker.trips == 1
+    with pytest.raises(CircuitOpenError, match="5/10 recent requests failed"):
+        breaker.check()
+    assert breaker.rejected == 1
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = tripped(cooldown=0)
+
+    breaker.check()
+
+    assert breaker.state == "half-open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_successful_probe_closes():
+    breaker = tripped(cooldown=0)
+    breaker.check()
+
+    breaker.record(False)
+
+    assert breaker.state == "closed"
+    breaker.check()
+    # The window starts over: one more failure must not re-open it
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+def test_failed_probe_reopens():
+    breaker = tripped(cooldown=0)
+    breaker.check()
+
+    breaker.record(True)
+
+    assert breaker.state == "open"
+    assert breaker.trips == 1, "A failed probe re-opens the same trip"
+
+
+@pytest.mark.parametrize("status, failed", [(200, False), (500, False), (429, True), (503, True)])
+def test_is_failure_counts_retryable_statuses(status, failed):
+    assert is_failure(SimpleNamespace(status_code=status)) is failed
+
+
+def test_is_failure_counts_errors():
+    assert is_failure(None, ConnectionError())
@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+from utils.scheduler import CACHE_KEY, CostScheduler
+
+
+class StubCache(dict):
+    def get(self, key, default):
+        return super().get(key, default)
+
+    def set(self, key, value):
+        self[key] = value
+
+
+def scheduler(history=None):
+    cache = StubCache({CACHE_KEY: history} if history is not None else {})
+    return CostScheduler(SimpleNamespace(cache=cache), reorder=True)
+
+
+def item(nodeid, *fixtures):
+    return SimpleNamespace(nodeid=nodeid, fixturenames=fixtures)
+
+
+def entry(duration, last_failed=False, failure_rate=0.0):
+    return {"duration": duration, "failure_rate": failure_rate, "last_failed": last_failed, "runs": 1}
+
+
+def report(nodeid, when="call", outcome="passed", duration=1.0):
+    return SimpleNamespace(nodeid=nodeid, when=when, duration=duration, outcome=outcome,
+                           passed=outcome == "passed", failed=outcome == "failed")
+
+
+def ids(items):
+    return [i.nodeid for i in items]
+
+
+# ---------------------- ORDERING ----------------------
+
+def test_failed_then_new_then_longest_first():
+    order = scheduler({
+        "a.py::fast": entry(0.1),
+        "a.py::slow": entry(2.0),
+        "a.py::broken": entry(0.1, last_failed=True),
+    }).order([item("a.py::fast"), item("a.py::slow"), item("a.py::new"), item("a.py::broken")])
+
+    assert ids(order) == ["a.py::broken", "a.py::new", "a.py::slow", "a.py::fast"]
+
+
+def test_modules_stay_together_heaviest_first():
+    order = scheduler({
+        "light.py::one": entry(0.1),
+        "heavy.py::one": entry(1.0),
+        "light.py::two": entry(0.1),
+        "heavy.py::two": entry(1.0),
+    }).order([item("light.py::one"), item("heavy.py::one"), item("light.py::two"), item("heavy.py::two")])
+
+    assert ids(order) == ["heavy.py::one", "heavy.py::two", "light.py::one", "light.py::two"]
+
+
+def test_module_with_a_failure_comes_first():
+    order = scheduler({
+        "heavy.py::one": entry(5.0),
+        "light.py::one": entry(0.1, last_failed=True),
+    }).order([item("heavy.py::one"), item("light.py::one")])
+
+    assert ids(order) == ["light.py::one", "heavy.py::one"]
+
+
+def test_fixture_users_are_grouped():
+    order = scheduler({
+        "a.py::plain": entry(0.5),
+        "a.py::booked1": entry(0.2),
+        "a.py::booked2": entry(0.4),
+    }).order([item("a.py::booked1", "created_booking"), item("a.py::plain"),
+              item("a.py::booked2", "created_booking")])
+
+    assert ids(order) == ["a.py::booked2", "a.py::booked1", "a.py::plain"]
+
+
+# ---------------------- RECORDING ----------------------
+
+def test_history_learns_call_duration_and_failures():
+    plugin = scheduler({"a.py::t": entry(1.0)})
+    plugin.pytest_runtest_logreport(report("a.py::t", when="setup", duration=9.0))
+    plugin.pytest_runtest_logreport(report("a.py::t", outcome="failed", duration=3.0))
+    plugin.pytest_sessionfinish(None)
+
+    learned = plugin.config.cache[CACHE_KEY]["a.py::t"]
+    assert learned["duration"] == 2.0, "Setup time must stay out of the duration"
+    assert learned["last_failed"] is True
+    assert learned["failure_rate"] > 0
+
+
+def test_skipped_test_keeps_its_history():
+    plugin = scheduler({"a.py::t": entry(1.0)})
+    plugin.pytest_runtest_logreport(report("a.py::t", outcome="skipped"))
+    plugin.pytest_runtest_logreport(report("a.py::new", outcome="skipped"))
+    plugin.pytest_sessionfinish(None)
+
+    assert plugin.config.cache[CACHE_KEY] == {"a.py::t": entry(1.0)}
@@ -0,0 +1,40 @@
+import pytest
+from utils.streaming import ArrayStream, StreamFormatError
+
+
+class ChunkedResponse:
+    """Just enough of a streamed response: the body in `size`-byte chunks."""
+
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+
+    def iter_content(self, chunk_size):
+        return (self.body[i:i + self.size] for i in range(0, len(self.body), self.size))
+
+
+@pytest.mark.parametrize("size", [1, 3, 1024])
+@pytest.mark.parametrize("body, expected", [
+    (b"[]", []),
+    (b" [ ] \n", []),
+    (b'[1, 22, "x", {"a": [1, 2]}]', [1, 22, "x", {"a": [1, 2]}]),
+    (b'[{"bookingid": 1}]\r\n', [{"bookingid": 1}]),
+])
+def test_elements_across_chunk_boundaries(body, expected, size):
+    assert list(ArrayStream(ChunkedResponse(body, size))) == expected
+
+
+@pytest.mark.parametrize("size", [1, 1024])
+@pytest.mark.parametrize("body", [
+    b"[1]trailing",
+    b"[1] ]",
+    b"[] []",
+    b"[1],",
+    b"{}",
+    b"[1 2]",
+    b"[1,",
+    b"",
+])
+def test_malformed_bodies_raise(body, size):
+    with pytest.raises(StreamFormatError):
+        list(ArrayStream(ChunkedResponse(body, size)))
@@ -0,0 +1,94 @@
+import multiprocessing
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from utils.api_client import ApiClient
+from utils.resilience import make_retry
+from utils.throttle import Throttle, fcntl
+
+RATE = 50.0
+PER_PROCESS = 10
+
+shared = pytest.mark.skipif(fcntl is None, reason="needs fcntl locks")
+
+
+def take_slots(path, start, times):
+    """One worker: wait for a common start, then send PER_PROCESS requests."""
+    throttle = Throttle(rate=RATE, burst=1, path=path)
+    time.sleep(max(0.0, start - time.time()))
+    for _ in range(PER_PROCESS):
+        with throttle.slot():
+            times.put(time.time())
+
+
+def test_memory_bucket_paces_at_rate():
+    throttle = Throttle(rate=RATE, burst=1)
+    start = time.perf_counter()
+    for _ in range(PER_PROCESS):
+        with throttle.slot():
+            pass
+
+    assert time.perf_counter() - start >= (PER_PROCESS - 1) / RATE * 0.9
+    assert throttle.stats()["requests"] == PER_PROCESS
+
+
+@shared
+def test_file_bucket_rate_holds_across_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    times = context.Queue()
+    path = str(tmp_path / "throttle")
+    start = time.time() + 0.3
+    workers = [context.Process(target=take_slots, args=(path, start, times)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    stamps = sorted(times.get(timeout=10) for _ in range(2 * PER_PROCESS))
+    for worker in workers:
+        worker.join(timeout=10)
+
+    # Two processes share one bucket: 2 * PER_PROCESS tokens at RATE, the first one free
+    assert stamps[-1] - stamps[0] >= (2 * PER_PROCESS - 1) / RATE * 0.9
+    assert all(worker.exitcode == 0 for worker in workers)
+
+
+@shared
+def test_file_slots_are_shared_between_throttles(tmp_path):
+    path = str(tmp_path / "throttle")
+    first = Throttle(max_in_flight=1, path=path)
+    second = Throttle(max_in_flight=1, path=path)
+
+    with first.slot():
+        assert second.slots.try_acquire() is None
+    held = second.slots.try_acquire()
+    assert held is not None
+    second.slots.release(held)
+
+
+class Unavailable(BaseHTTPRequestHandler):
+    """Answers 503 to the first two requests, then 200."""
+    hits = 0
+
+    def do_GET(self):
+        type(self).hits += 1
+        self.send_response(503 if self.hits <= 2 else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_every_retry_takes_a_slot():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Unavailable)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    throttle = Throttle(rate=RATE, burst=1)
+    client = ApiClient(f"http://127.0.0.1:{server.server_port}", retry=make_retry(wait=False),
+                       throttle=throttle)
+    try:
+        assert client.get("/booking").status_code == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert throttle.stats()["requests"] == 3
@@ -0,0 +1,84 @@
+import json
+import time
+from types import SimpleNamespace
+
+from utils.token_provider import TokenProvider
+
+
+class StubClient:
+    """Mints 'token1', 'token2', ...; the validity probe accepts only tokens it minted."""
+    base_url = "http://stub"
+
+    def __init__(self, revoked=()):
+        self.minted = []
+        self.probes = 0
+        self.revoked = set(revoked)
+
+    def auth(self, payload):
+        self.minted.append(f"token{len(self.minted) + 1}")
+        return SimpleNamespace(status_code=200, json=lambda: {"token": self.minted[-1]})
+
+    def patch(self, path, json=None, headers=None):
+        self.probes += 1
+        token = headers["Cookie"].split("=", 1)[1]
+        return SimpleNamespace(status_code=403 if token in self.revoked else 405)
+
+
+def test_token_is_reused_in_memory():
+    client = StubClient()
+    provider = TokenProvider(client)
+
+    assert provider.get() == provider.get() == "token1"
+    assert client.minted == ["token1"]
+
+
+def test_stale_token_is_refreshed():
+    client = StubClient()
+    # Inside the refresh margin from the moment it is minted
+    provider = TokenProvider(client, ttl=60, refresh_margin=60)
+
+    assert provider.get() == "token1"
+    assert provider.get() == "token2"
+
+
+def test_invalidate_mints_anew():
+    client = StubClient()
+    provider = TokenProvider(client)
+    provider.get()
+
+    provider.invalidate()
+
+    assert provider.get() == "token2"
+
+
+def test_disk_cache_is_shared_and_probed_once(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    client = StubClient()
+    TokenProvider(client, cache_path=path).get()
+
+    other = TokenProvider(client, cache_path=path)
+
+    assert other.get() == other.get() == "token1"
+    assert client.minted == ["token1"]
+    assert client.probes == 1
+
+
+def test_expired_disk_token_is_replaced(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    client = StubClient()
+    provider = TokenProvider(client, cache_path=path)
+    with open(path, "w") as fh:
+        json.dump({provider.key: {"token": "old", "expires_at": time.time() - 1}}, fh)
+
+    assert provider.get() == "token1"
+    assert client.probes == 0
+    with open(path) as fh:
+        assert json.load(fh)[provider.key]["token"] == "token1"
+
+
+def test_rejected_disk_token_is_replaced(tmp_path):
+    path = str(tmp_path / "tokens.json")
+    client = StubClient(revoked={"token1"})
+    TokenProvider(client, cache_path=path).get()
+
+    assert TokenProvider(client, cache_path=path).get() == "token2"
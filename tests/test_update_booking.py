@@ -1,29 +1,18 @@
-import requests
 import pytest
+from utils.logger import body
+from utils.mutations import expect_status, mutated, mutation_params
+from utils.schemas import assert_schema
 
 # -------------------------- POSITIVE TESTS --------------------------
-@pytest.mark.usefixtures("base_url", "logger", "headers_with_token")
-def test_update_booking(base_url, logger, headers_with_token):
-    # Step 1: Create a booking to update
-    create_url = f"{base_url}/booking"
-    create_payload = {
-        "firstname": "Jim",
-        "lastname": "Brown",
-        "totalprice": 111,
-        "depositpaid": True,
-        "bookingdates": {
-            "checkin": "2018-01-01",
-            "checkout": "2019-01-01"
-        },
-        "additionalneeds": "Breakfast"
-    }
-    create_response = requests.post(create_url, json=create_payload)
-    assert create_response.status_code == 200
-    booking_id = create_response.json()["bookingid"]
+@pytest.mark.usefixtures("api_client", "logger", "headers_with_token")
+@pytest.mark.booking_template("jim_brown")
+def test_update_booking(api_client, created_booking, namespaced, logger, headers_with_token):
+    # Step 1: Take a pre-created booking to update
+    booking_id = created_booking.id
 
     # Step 2: Update the booking
-    update_url = f"{base_url}/booking/{booking_id}"
-    update_payload = {
+    update_url = api_client.url(f"/booking/{booking_id}")
+    update_payload = namespaced({
         "firstname": "James",
         "lastname": "Brown",
         "totalprice": 111,
@@ -33,16 +22,17 @@ def test_update_booking(base_url, logger, headers_with_token):
             "checkout": "2019-01-01"
         },
         "additionalneeds": "Breakfast"
-    }
+    })
 
-    response = requests.put(update_url, json=update_payload, headers=headers_with_token)
+    response = api_client.update_booking(booking_id, update_payload, headers=headers_with_token)
 
-    logger.info(f"PUT {update_url} - Status Code: {response.status_code}")
-    logger.debug(f"Update Payload: {update_payload}")
-    logger.debug(f"Response Body: {response.text}")
+    logger.info("PUT %s - Status Code: %s", update_url, response.status_code)
+    logger.debug("Update Payload: %s", update_payload)
+    logger.debug("Response Body: %s", body(response))
 
     assert response.status_code == 200, f"Expected 200 OK but got {response.status_code}"
     updated = response.json()
+    assert_schema("booking", updated)
 
     # Validate updated fields
     assert updated["firstname"] == update_payload["firstname"]
@@ -54,50 +44,27 @@ def test_update_booking(base_url, logger, headers_with_token):
 
 # -------------------------- NEGATIVE TESTS --------------------------
 
-def test_update_booking_without_token(base_url, logger):
-    payload = {
-        "firstname": "Unauth",
-        "lastname": "User",
-        "totalprice": 100,
-        "depositpaid": False,
-        "bookingdates": {
-            "checkin": "2024-01-01",
-            "checkout": "2024-01-05"
-        },
-        "additionalneeds": "None"
-    }
-    # Create a booking
-    response = requests.post(f"{base_url}/booking", json=payload)
-    booking_id = response.json()["bookingid"]
+@pytest.mark.booking_template("unauth_user")
+def test_update_booking_without_token(api_client, created_booking, logger):
+    booking_id, payload = created_booking
 
     # Attempt update without auth
     update_payload = payload.copy()
     update_payload["firstname"] = "Unauthorized"
 
-    update_response = requests.put(
-        f"{base_url}/booking/{booking_id}",
-        json=update_payload,
+    update_response = api_client.update_booking(
+        booking_id,
+        update_payload,
         headers={"Content-Type": "application/json"}
     )
 
-    logger.info(f"PUT without token - Status: {update_response.status_code}")
+    logger.info("PUT without token - Status: %s", update_response.status_code)
     assert update_response.status_code == 403
 
 
-def test_update_booking_with_invalid_token(base_url, logger):
-    payload = {
-        "firstname": "Invalid",
-        "lastname": "Token",
-        "totalprice": 222,
-        "depositpaid": True,
-        "bookingdates": {
-            "checkin": "2024-02-01",
-            "checkout": "2024-02-07"
-        },
-        "additionalneeds": "WiFi"
-    }
-    response = requests.post(f"{base_url}/booking", json=payload)
-    booking_id = response.json()["bookingid"]
+@pytest.mark.booking_template("invalid_token")
+def test_update_booking_with_invalid_token(api_client, created_booking, logger):
+    booking_id, payload = created_booking
 
     invalid_headers = {
         "Content-Type": "application/json",
@@ -105,18 +72,18 @@ def test_update_booking_with_invalid_token(base_url, logger):
         "Cookie": "token=faketoken123"
     }
 
-    update_response = requests.put(
-        f"{base_url}/booking/{booking_id}",
-        headers=invalid_headers,
-        json=payload
+    update_response = api_client.update_booking(
+        booking_id,
+        payload,
+        headers=invalid_headers
     )
 
-    logger.info(f"PUT with invalid token - Status: {update_response.status_code}")
+    logger.info("PUT with invalid token - Status: %s", update_response.status_code)
     assert update_response.status_code == 403
 
 
-def test_update_nonexistent_booking(base_url, headers_with_token, logger):
-    fake_id = 999999
+def test_update_nonexistent_booking(api_client, headers_with_token, nonexistent_booking_id, logger):
+    fake_id = nonexistent_booking_id
     update_payload = {
         "firstname": "Ghost",
         "lastname": "Booking",
@@ -129,83 +96,37 @@ def test_update_nonexistent_booking(base_url, headers_with_token, logger):
         "additionalneeds": "None"
     }
 
-    response = requests.put(
-        f"{base_url}/booking/{fake_id}",
-        json=update_payload,
+    response = api_client.update_booking(
+        fake_id,
+        update_payload,
         headers=headers_with_token
     )
 
-    logger.info(f"PUT to nonexistent booking - Status: {response.status_code}")
+    logger.info("PUT to nonexistent booking - Status: %s", response.status_code)
     assert response.status_code in [404, 405]
 
 
-@pytest.mark.parametrize("description,invalid_field_payload,expected_status", [
-    pytest.param(
-        "Firstname as integer", {"firstname": 12345}, 400,
-        marks=pytest.mark.xfail(reason="API accepts integer as firstname"),
-    ),
-    pytest.param(
-        "Lastname as boolean", {"lastname": False}, 400,
-        marks=pytest.mark.xfail(reason="API accepts boolean as lastname"),
-    ),
-    pytest.param(
-        "Totalprice as string", {"totalprice": "one hundred"}, 400,
-        marks=pytest.mark.xfail(reason="API accepts totalprice as string and sets to null"),
-    ),
-    pytest.param(
-        "Depositpaid as string", {"depositpaid": "true"}, 400,
-        marks=pytest.mark.xfail(reason="API accepts depositpaid as string"),
-    ),
-    pytest.param(
-        "Checkin as integer", {"bookingdates": {"checkin": 20230701}}, 400,
-        marks=pytest.mark.xfail(reason="API accepts checkin as integer"),
-    ),
-    pytest.param(
-        "Checkout as boolean", {"bookingdates": {"checkout": True}}, 400,
-        marks=pytest.mark.xfail(reason="API accepts checkout as boolean"),
-    ),
-])
-def test_update_booking_with_invalid_data_types(base_url, headers_with_token, logger, description, invalid_field_payload, expected_status):
-    # Step 1: Create valid booking
-    valid_payload = {
-        "firstname": "Valid",
-        "lastname": "Payload",
-        "totalprice": 123,
-        "depositpaid": True,
-        "bookingdates": {
-            "checkin": "2023-01-01",
-            "checkout": "2023-01-10"
-        },
-        "additionalneeds": "Lunch"
-    }
+@pytest.mark.booking_template("valid_payload")
+@pytest.mark.parametrize("description,field,mutation,expected_status", mutation_params("update"))
+def test_update_booking_with_invalid_data_types(api_client, created_booking, headers_with_token, logger, description, field, mutation, expected_status):
+    # Step 1: Take a pre-created valid booking
+    booking_id, valid_payload = created_booking
 
-    response = requests.post(f"{base_url}/booking", json=valid_payload)
-    assert response.status_code == 200
-    booking_id = response.json()["bookingid"]
-
-    # Step 2: Merge invalid field into valid payload
-    invalid_payload = valid_payload.copy()
-    for key, val in invalid_field_payload.items():
-        if key == "bookingdates":
-            invalid_payload["bookingdates"] = valid_payload["bookingdates"].copy()
-            invalid_payload["bookingdates"].update(val)
-        else:
-            invalid_payload[key] = val
+    # Step 2: Swap the invalid value into the valid payload
+    invalid_payload = mutated(field, mutation, base=valid_payload)
 
     # Step 3: Send PUT request
-    update_url = f"{base_url}/booking/{booking_id}"
-    logger.info(f"{description} - PUT {update_url} with payload: {invalid_payload}")
+    update_url = api_client.url(f"/booking/{booking_id}")
+    logger.info("%s - PUT %s with payload: %s", description, update_url, invalid_payload)
 
-    update_response = requests.put(
-        update_url,
-        headers=headers_with_token,
-        json=invalid_payload
+    update_response = api_client.update_booking(
+        booking_id,
+        invalid_payload,
+        headers=headers_with_token
     )
 
-    logger.info(f"Status Code: {update_response.status_code}")
-    logger.debug(f"Response Body: {update_response.text}")
+    logger.info("Status Code: %s", update_response.status_code)
+    logger.debug("Response Body: %s", body(update_response))
 
     # Step 4: Expect failure
-    assert update_response.status_code == expected_status, (
-        f"{description}: Expected {expected_status}, got {update_response.status_code}"
-    )
+    expect_status(update_response, expected_status, description)
@@ -0,0 +1,118 @@
+import time
+
+import requests
+
+from utils.cassette import CassetteAdapter
+from utils.differential import DiffAdapter
+from utils.metrics import TimingAdapter, reset_phases
+from utils.resilience import is_failure
+
+DEFAULT_POOL_SIZE = 10
+
+
+class ApiClient:
+    """Pooled HTTP client for the RESTful Booker API.
+
+    All calls go through a single keep-alive `requests.Session`, so the TCP/TLS
+    handshake is paid once per pooled connection instead of once per request.
+    When a `MetricsRecorder` is given, every call is recorded with its
+    connection-phase and total timings; with a `Cassette`, exchanges are
+    recorded to or replayed from disk. A urllib3 `Retry` (see
+    `utils.resilience.make_retry`) is applied by the adapter, and a
+    `CircuitBreaker` sees the outcome of every call after its retries. A
+    `Throttle` paces every attempt, retries included, and caps how many are in
+    flight at once, and a
+    `Differ` mirrors every call to other targets and diffs their answers.
+    """
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, recorder=None, cassette=None,
+                 retry=0, breaker=None, timeout=None, throttle=None, differ=None):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.breaker = breaker
+        self.throttle = throttle
+        self.timeout = timeout
+        self.session = requests.Session()
+        pool = {"pool_connections": pool_size, "pool_maxsize": pool_size, "max_retries": retry}
+        if cassette is None:
+            adapter = TimingAdapter(throttle=throttle, **pool)
+        else:
+            adapter = CassetteAdapter(cassette, throttle=throttle, **pool)
+        if differ is not None:
+            adapter = DiffAdapter(adapter, differ)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        if self.breaker is not None:
+            self.breaker.check()
+        return self._send(method, path, **kwargs)
+
+    def _send(self, method, path, **kwargs):
+        if self.recorder is None and self.breaker is None:
+            return self.session.request(method, self.url(path), **kwargs)
+
+        phases = reset_phases()
+        start = time.perf_counter()
+        response = error = None
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+            return response
+        except requests.RequestException as e:
+            error = e
+            raise
+        finally:
+            if self.breaker is not None:
+                self.breaker.record(is_failure(response, error))
+            if self.recorder is not None:
+                # The adapter noted how long the throttle held each attempt back
+                wait = phases["wait"]
+                ttfb = response.elapsed.total_seconds() - wait if response is not None else 0.0
+                self.recorder.record(method, path, response, phases, time.perf_counter() - start - wait,
+                                     stream=kwargs.get("stream", False), ttfb=max(0.0, ttfb))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request("PATCH", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    # ---------------------- BOOKER HELPERS ----------------------
+
+    def auth(self, payload=None, **kwargs):
+        return self.post("/auth", json=payload, **kwargs)
+
+    def create_booking(self, payload, **kwargs):
+        return self.post("/booking", json=payload, **kwargs)
+
+    def get_bookings(self, params=None, **kwargs):
+        return self.get("/booking", params=params, **kwargs)
+
+    def get_booking(self, booking_id, **kwargs):
+        return self.get(f"/booking/{booking_id}", **kwargs)
+
+    def update_booking(self, booking_id, payload, **kwargs):
+        return self.put(f"/booking/{booking_id}", json=payload, **kwargs)
+
+    def patch_booking(self, booking_id, payload, **kwargs):
+        return self.patch(f"/booking/{booking_id}", json=payload, **kwargs)
+
+    def delete_booking(self, booking_id, **kwargs):
+        return self.delete(f"/booking/{booking_id}", **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,492 @@
+"""Asyncio and pre-fork serving modes for the stand-in booking API.
+
+`BookingServer` answers on a thread per connection and, under the GIL, runs
+out of CPU well before a load run's client does. Two more modes serve the
+very same endpoint code (`BookingRequestHandler`) behind a cheaper front:
+
+- `AsyncBookingServer` parses HTTP/1.1 keep-alive requests on one asyncio
+  event loop and answers them inline: no thread switch per request.
+- `PreforkBookingServer` binds the listening socket, then forks `workers`
+  processes that all accept on it, each running the asyncio front. The
+  store is sharded by id - worker k owns ids k+1, k+1+N, k+1+2N, ... - so
+  POST /booking is answered by whichever worker accepted the connection,
+  /booking/{id} is forwarded to the owner over a Unix socket and GET
+  /booking gathers the matching ids of every shard. Tokens are HMAC-signed
+  with a secret drawn before the fork, so any worker can check any token. A
+  `--dataset` snapshot is mapped once, before the fork, and its pages are
+  shared by every worker.
+
+Every mode keeps `ServerStats` and answers `GET /__stats` for all of its
+processes, so a load run can show the server was not its bottleneck.
+
+    python -m utils.booking_server --mode prefork --workers 4
+"""
+import asyncio
+import hmac
+import io
+import json
+import os
+import pickle
+import secrets
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from email.utils import formatdate
+from heapq import merge
+from http import HTTPStatus
+
+from utils.booking_server import (
+    JSON_TYPE, BookingRequestHandler, BookingServer, BookingStore, InvalidDateError, ServerStats, TokenSet,
+    list_filters, render_listing, stats_report,
+)
+
+SERVER_MODES = ("threaded", "asyncio", "prefork")
+LAG_INTERVAL = 0.05
+BACKLOG = 1024
+
+_TEXT = "text/plain; charset=utf-8"
+_SERVER = f"{BookingRequestHandler.server_version} {BookingRequestHandler.sys_version}"
+_REASONS = {status.value: status.phrase for status in HTTPStatus}
+_FRAME = struct.Struct("!I")  # length prefix of a pickled RPC message
+
+
+def make_server(mode="threaded", workers=0, **kwargs):
+    """Stand-in server for a `SERVER_MODES` entry; `workers` only applies to pre-fork."""
+    if mode == "asyncio":
+        return AsyncBookingServer(**kwargs)
+    if mode == "prefork":
+        return PreforkBookingServer(workers=workers, **kwargs)
+    return BookingServer(**kwargs)
+
+
+def _listen(host, port):
+    sock = socket.create_server((host, port), backlog=BACKLOG)
+    sock.setblocking(False)
+    return sock
+
+
+# ---------------------- HTTP ----------------------
+
+class Headers(dict):
+    """Request headers keyed by lower-cased name, with a case-insensitive `get`."""
+
+    def get(self, name, default=None):
+        return dict.get(self, name.lower(), default)
+
+
+def _parse_head(head):
+    """(method, path, version, headers) of a request head, or None if it is malformed."""
+    line, _, rest = head.partition(b"\r\n")
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        return None
+    headers = Headers()
+    for field in rest.split(b"\r\n"):
+        name, colon, value = field.partition(b":")
+        if colon:
+            headers[name.decode("latin-1").strip().lower()] = value.decode("latin-1").strip()
+    return method, path, version, headers
+
+
+def _keep_alive(version, headers):
+    connection = (headers.get("Connection") or "").lower()
+    return connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+
+_date = [0, ""]
+
+
+def _render(status, content_type, body, keep_alive):
+    now = int(time.time())
+    if now != _date[0]:
+        _date[:] = [now, formatdate(now, usegmt=True)]
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nServer: {_SERVER}\r\nDate: {_date[1]}\r\n"
+            f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n")
+    if not keep_alive:
+        head += "Connection: close\r\n"
+    return head.encode("latin-1") + b"\r\n" + body
+
+
+class CapturedHandler(BookingRequestHandler):
+    """The stand-in endpoints run on an already parsed request, capturing the response."""
+
+    def __init__(self, server, command, path, headers, body):
+        self.server = server
+        self.command = command
+        self.path = path
+        self.headers = headers
+        self.rfile = io.BytesIO(body)
+        self.response = (500, _TEXT, b"Internal Server Error")
+
+    def _tracked(self):
+        # The asyncio front times the whole exchange, parsing included
+        return nullcontext()
+
+    def _send(self, status, body=b"", content_type=_TEXT):
+        self.response = (status, content_type, body)
+
+    def run(self):
+        """(status, content type, body) of the request."""
+        verb = getattr(self, f"do_{self.command}", None)
+        if verb is None:
+            return 501, _TEXT, b"Not Implemented"
+        verb()
+        return self.response
+
+
+async def _watch_lag(stats):
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        stats.lag.append(max(0.0, loop.time() - due))
+
+
+class AsyncBookingServer:
+    """Run the stand-in API on an asyncio event loop in a background thread.
+
+    Same interface as `BookingServer`: `start()`, `url`, `store`, `stop()`.
+    """
+
+    mode = "asyncio"
+
+    def __init__(self, host="127.0.0.1", port=0, store=None, sock=None):
+        self.sock = sock if sock is not None else _listen(host, port)
+        self.store = store if store is not None else BookingStore()
+        self.tokens = TokenSet()
+        self.stats = ServerStats(self.mode)
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._connections = {}  # task -> writer
+
+    @property
+    def url(self):
+        host, port = self.sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self.serve(ready.set)), name="booking-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    async def serve(self, started=None):
+        """Serve until `stop()`, then close every open connection."""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._connection, sock=self.sock)
+        monitor = asyncio.create_task(_watch_lag(self.stats))
+        if started is not None:
+            started()
+        async with server:
+            await self._stopping.wait()
+        monitor.cancel()
+        for writer in self._connections.values():
+            writer.close()
+        # Closed transports end each connection's pending read with EOF
+        await asyncio.gather(*self._connections, return_exceptions=True)
+
+    async def _connection(self, reader, writer):
+        self._connections[asyncio.current_task()] = writer
+        self.stats.opened()
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                with self.stats.track():
+                    request = _parse_head(head)
+                    if request is None:
+                        writer.write(_render(400, _TEXT, b"Bad Request", keep_alive=False))
+                        return
+                    method, path, version, headers = request
+                    length = int(headers.get("Content-Length") or 0)
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, content_type, payload = await self.respond(method, path, headers, body)
+                    except Exception:
+                        status, content_type, payload = 500, _TEXT, b"Internal Server Error"
+                    keep_alive = _keep_alive(version, headers)
+                    writer.write(_render(status, content_type, payload, keep_alive))
+                if not keep_alive:
+                    return
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+            pass
+        finally:
+            del self._connections[asyncio.current_task()]
+            self.stats.closed()
+            writer.close()
+
+    async def respond(self, method, path, headers, body):
+        return CapturedHandler(self, method, path, headers, body).run()
+
+
+# ---------------------- PRE-FORK ----------------------
+
+class SignedTokens:
+    """Tokens any worker can check without shared state: a nonce and its HMAC."""
+
+    def __init__(self, secret):
+        self.secret = secret
+
+    def _sign(self, nonce):
+        return hmac.new(self.secret, nonce.encode(), "sha256").hexdigest()[:8]
+
+    def issue(self):
+        nonce = secrets.token_hex(4)[:7]
+        return nonce + self._sign(nonce)
+
+    def __contains__(self, token):
+        return len(token) == 15 and hmac.compare_digest(token[7:], self._sign(token[:7]))
+
+
+async def _read_frame(reader):
+    size, = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+    return pickle.loads(await reader.readexactly(size))
+
+
+def _write_frame(writer, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    writer.write(_FRAME.pack(len(data)) + data)
+
+
+class _Peer:
+    """Calls to one sibling worker, multiplexed over a single Unix socket."""
+
+    def __init__(self, reader, writer, on_close=None):
+        self.writer = writer
+        self.pending = {}
+        self.closed = False
+        self._on_close = on_close
+        self._next_id = 0
+        self._receiver = asyncio.create_task(self._receive(reader))
+
+    async def call(self, op):
+        if self.closed:
+            raise ConnectionError("sibling worker went away")
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self._next_id] = future
+        _write_frame(self.writer, (self._next_id, op))
+        return await future
+
+    async def _receive(self, reader):
+        try:
+            while True:
+                call_id, result = await _read_frame(reader)
+                self.pending.pop(call_id).set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.closed = True
+            for future in self.pending.values():
+                future.set_exception(ConnectionError("sibling worker went away"))
+            self.pending.clear()
+            self.writer.close()
+            if self._on_close is not None:
+                self._on_close()
+
+
+class PreforkWorker(AsyncBookingServer):
+    """One forked worker: owns the ids of shard `index`, forwards the rest."""
+
+    mode = "prefork"
+
+    def __init__(self, sock, store, index, count, secret, rpc_paths):
+        super().__init__(store=store, sock=sock)
+        self.store.shard(index, count)
+        self.tokens = SignedTokens(secret)
+        self.index = index
+        self.count = count
+        self.rpc_paths = rpc_paths
+        self._peers = {}
+
+    async def serve(self, started=None):
+        rpc = await asyncio.start_unix_server(self._rpc_connection, path=self.rpc_paths[self.index])
+        async with rpc:
+            await super().serve(started)
+
+    def owner(self, booking_id):
+        return (booking_id - 1) % self.count if booking_id > 0 else self.index
+
+    async def respond(self, method, path, headers, body):
+        handler = CapturedHandler(self, method, path, headers, body)
+        collection, booking_id, query = handler._route()
+        try:
+            if collection == "booking" and booking_id is not None and self.owner(booking_id) != self.index:
+                self.stats.forwarded += 1
+                return await self._call(self.owner(booking_id), ("http", method, path, headers, body))
+            if method == "GET" and booking_id is None and collection == "booking":
+                return await self._list(handler, query)
+            if method == "GET" and collection == "__stats":
+                workers = await self._scatter(("stats", query.get("reset") == "1"))
+                return 200, JSON_TYPE, json.dumps(stats_report(workers)).encode()
+        except ConnectionError:
+            # The shard's worker is gone; answer at once rather than wait on it
+            return 502, _TEXT, b"Bad Gateway"
+        return handler.run()
+
+    async def _list(self, handler, query):
+        try:
+            filters = list_filters(query)
+        except InvalidDateError:
+            filters = None
+        if filters is None:
+            # The 500 or empty listing never reaches the store
+            return handler.run()
+        shards = await self._scatter(("query", filters))
+        return 200, JSON_TYPE, render_listing(merge(*shards))
+
+    # ---------------------- SHARD RPC ----------------------
+
+    async def _scatter(self, op):
+        """Result of `op` on every shard, in shard order."""
+        results = list(await asyncio.gather(*(self._call(k, op) for k in range(self.count) if k != self.index)))
+        results.insert(self.index, self._execute(op))
+        return results
+
+    async def _call(self, index, op):
+        if index not in self._peers:
+            self._peers[index] = asyncio.ensure_future(self._connect(index))
+        peer = await self._peers[index]
+        return await peer.call(op)
+
+    async def _connect(self, index):
+        connecting = asyncio.current_task()
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.rpc_paths[index])
+        except OSError as e:
+            self._forget(index, connecting)
+            raise ConnectionError(f"shard {index} is not listening") from e
+        return _Peer(reader, writer, on_close=lambda: self._forget(index, connecting))
+
+    def _forget(self, index, connecting):
+        """Drop a dead connection to shard `index`, so the next call reconnects or fails fast."""
+        if self._peers.get(index) is connecting:
+            del self._peers[index]
+
+    def _execute(self, op):
+        kind, *args = op
+        if kind == "http":
+            return CapturedHandler(self, *args).run()
+        if kind == "query":
+            # A shared dataset holds every shard's base rows; report only ours
+            return [i for i in self.store.query(**args[0]) if self.owner(i) == self.index]
+        snapshot = self.stats.snapshot()
+        if args[0]:
+            self.stats.reset()
+        return snapshot
+
+    async def _rpc_connection(self, reader, writer):
+        try:
+            while True:
+                call_id, op = await _read_frame(reader)
+                # Not counted as a request: the worker that accepted it counts it
+                with self.stats.track(count=False):
+                    result = self._execute(op)
+                _write_frame(writer, (call_id, result))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class PreforkBookingServer:
+    """Fork `workers` processes serving the stand-in on one shared listening socket.
+
+    `store` may be a `SnapshotStore` (not persisted): each worker inherits it
+    through the fork and takes its id shard. Call `start()` before the
+    process starts other threads; a fork only copies the calling thread.
+    """
+
+    mode = "prefork"
+
+    def __init__(self, host="127.0.0.1", port=0, store=None, workers=0):
+        self.workers = workers or os.cpu_count() or 1
+        self.sock = _listen(host, port)
+        self.store = store
+        self.pids = []
+        self._dir = None
+
+    @property
+    def url(self):
+        host, port = self.sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        secret = secrets.token_bytes(16)
+        self._dir = tempfile.mkdtemp(prefix="booking-prefork-")
+        rpc_paths = [os.path.join(self._dir, f"shard{k}.sock") for k in range(self.workers)]
+        ready_r, ready_w = os.pipe()
+        for index in range(self.workers):
+            pid = os.fork()
+            if pid == 0:
+                os.close(ready_r)
+                self._worker(index, secret, rpc_paths, ready_w)
+            self.pids.append(pid)
+        os.close(ready_w)
+        # One byte per worker once it listens; EOF first means one died
+        ready = b""
+        while len(ready) < self.workers:
+            chunk = os.read(ready_r, self.workers)
+            if not chunk:
+                os.close(ready_r)
+                self.stop()
+                raise RuntimeError("a pre-fork worker exited during startup")
+            ready += chunk
+        os.close(ready_r)
+        return self
+
+    def _worker(self, index, secret, rpc_paths, ready_w):
+        def started():
+            os.write(ready_w, b".")
+            os.close(ready_w)
+
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent stops us with SIGTERM
+            store = self.store if self.store is not None else BookingStore()
+            worker = PreforkWorker(self.sock, store, index, self.workers, secret, rpc_paths)
+            asyncio.run(worker.serve(started))
+        except BaseException:
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+
+    def stop(self):
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in self.pids:
+            os.waitpid(pid, 0)
+        self.pids = []
+        self.sock.close()
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
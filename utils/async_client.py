@@ -0,0 +1,229 @@
+import asyncio
+import inspect
+import time
+from contextlib import nullcontext
+
+import httpx
+
+from utils.api_client import DEFAULT_POOL_SIZE
+from utils.cassette import CassetteTransport
+from utils.differential import DiffTransport
+from utils.metrics import TEST_ID
+from utils.resilience import is_failure, next_delay
+
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncApiClient:
+    """httpx-based async twin of `ApiClient`, with the same booking helpers.
+
+    `retry` (a urllib3 `Retry`), `breaker`, `throttle` and `differ` behave as on
+    `ApiClient`; httpx has no retry layer of its own, so `_send` loops over the
+    attempts here and each attempt waits for the throttle.
+    """
+
+    def __init__(self, base_url, pool_size=DEFAULT_POOL_SIZE, recorder=None, cassette=None,
+                 retry=None, breaker=None, timeout=None, throttle=None, differ=None):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.retry = retry
+        self.breaker = breaker
+        self.throttle = throttle
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        transport = httpx.AsyncHTTPTransport(limits=limits)
+        if cassette is not None:
+            transport = CassetteTransport(cassette, transport)
+        if differ is not None:
+            transport = DiffTransport(differ, transport)
+        options = {"timeout": timeout} if timeout is not None else {}
+        self.client = httpx.AsyncClient(base_url=self.base_url, transport=transport, **options)
+
+    def url(self, path):
+        return f"{self.base_url}{path}"
+
+    async def _send(self, method, path, **kwargs):
+        """Send with retries; returns (response, retries made).
+
+        Like `ApiClient`, the breaker sees one outcome per call, the last
+        attempt's, however many retries it took.
+        """
+        if self.breaker is not None:
+            self.breaker.check()
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                async with self.throttle.aslot() if self.throttle else nullcontext():
+                    response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError as e:
+                error = e
+            if not self._should_retry(method, response, error, attempt):
+                if self.breaker is not None:
+                    self.breaker.record(is_failure(response, error))
+                if error is not None:
+                    raise error
+                return response, attempt
+            attempt += 1
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            await asyncio.sleep(next_delay(self.retry, attempt, retry_after))
+
+    def _should_retry(self, method, response, error, attempt):
+        if self.retry is None or attempt >= (self.retry.total or 0):
+            return False
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            # Never reached the server, so safe for any method
+            return True
+        # No allowed_methods means every method may be retried, as in urllib3
+        allowed = self.retry.allowed_methods
+        if allowed and method.upper() not in allowed:
+            return False
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+        return self.retry.is_retry(method, response.status_code, "Retry-After" in response.headers)
+
+    async def request(self, method, path, **kwargs):
+        if self.recorder is None:
+            response, _ = await self._send(method, path, **kwargs)
+            return response
+
+        # httpcore trace events give connect/TLS/headers timestamps; DNS is
+        # folded into its TCP connect phase.
+        marks = {}
+
+        async def trace(event, info):
+            # "connection.connect_tcp.started" -> "connect_tcp.started"
+            marks[event.split(".", 1)[1]] = time.perf_counter()
+
+        start = time.perf_counter()
+        response, retries = None, 0
+        try:
+            response, retries = await self._send(method, path, extensions={"trace": trace}, **kwargs)
+            return response
+        finally:
+            def span(phase):
+                return marks.get(f"{phase}.complete", 0.0) - marks.get(f"{phase}.started", 0.0)
+
+            phases = {"dns": 0.0, "connect": span("connect_tcp"), "tls": span("start_tls")}
+            headers_at = marks.get("receive_response_headers.complete")
+            self.recorder.record(method, path, response, phases, time.perf_counter() - start,
+                                 ttfb=headers_at - start if headers_at else 0.0, retries=retries)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path, **kwargs):
+        return await self.request("PUT", path, **kwargs)
+
+    async def patch(self, path, **kwargs):
+        return await self.request("PATCH", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+    # ---------------------- BOOKER HELPERS ----------------------
+
+    async def auth(self, payload=None, **kwargs):
+        return await self.post("/auth", json=payload, **kwargs)
+
+    async def create_booking(self, payload, **kwargs):
+        return await self.post("/booking", json=payload, **kwargs)
+
+    async def get_bookings(self, params=None, **kwargs):
+        return await self.get("/booking", params=params, **kwargs)
+
+    async def get_booking(self, booking_id, **kwargs):
+        return await self.get(f"/booking/{booking_id}", **kwargs)
+
+    async def update_booking(self, booking_id, payload, **kwargs):
+        return await self.put(f"/booking/{booking_id}", json=payload, **kwargs)
+
+    async def patch_booking(self, booking_id, payload, **kwargs):
+        return await self.patch(f"/booking/{booking_id}", json=payload, **kwargs)
+
+    async def delete_booking(self, booking_id, **kwargs):
+        return await self.delete(f"/booking/{booking_id}", **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AwaitableClient:
+    """Expose a sync `ApiClient` through the async interface, one call at a time.
+
+    Lets a matrix sender written against `AsyncApiClient` run serially on the
+    shared pooled session when concurrent dispatch is off.
+    """
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+def sender_kwargs(sender, params, shared):
+    """Pick the parametrize args and shared fixtures `sender` actually declares."""
+    accepted = inspect.signature(sender).parameters
+    merged = {**shared, **params}
+    return {name: value for name, value in merged.items() if name in accepted}
+
+
+async def gather_bounded(coros, concurrency=DEFAULT_CONCURRENCY, test_ids=None):
+    """Await `coros` concurrently, at most `concurrency` at a time.
+
+    Results keep input order; exceptions are returned in place, not raised.
+    `test_ids` attributes each coroutine's requests to its own test case.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(coro, test_id):
+        if test_id:
+            TEST_ID.set(test_id)
+        async with semaphore:
+            return await coro
+
+    test_ids = test_ids or [None] * len(coros)
+    return await asyncio.gather(
+        *(bounded(coro, test_id) for coro, test_id in zip(coros, test_ids)), return_exceptions=True)
+
+
+def run_matrix(base_url, sender, cases, concurrency=DEFAULT_CONCURRENCY, recorder=None, test_ids=None,
+               cassette=None, retry=None, breaker=None, timeout=None, throttle=None, differ=None):
+    """Dispatch `sender(client, **case)` for every case at once; return results in order."""
+    async def main():
+        async with AsyncApiClient(base_url, pool_size=concurrency, recorder=recorder, cassette=cassette,
+                                  retry=retry, breaker=breaker, timeout=timeout, throttle=throttle,
+                                  differ=differ) as client:
+            coros = [sender(client, **case) for case in cases]
+            return await gather_bounded(coros, concurrency, test_ids)
+
+    return asyncio.run(main())
+
+
+def run_single(client, sender, case, test_id=None):
+    """Run one case serially through a sync `ApiClient`.
+
+    `test_id` marks its requests as the test's own, though they are sent
+    while the `matrix_response` fixture is being set up.
+    """
+    async def main():
+        if test_id:
+            TEST_ID.set(test_id)
+        return await sender(AwaitableClient(client), **case)
+
+    return asyncio.run(main())
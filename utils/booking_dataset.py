@@ -0,0 +1,199 @@
+"""Seeded, realistic booking datasets for the stand-in, generated a column at a time.
+
+Every column is drawn in one batch from a distribution table of `SLOTS`
+outcomes: 16-bit uniform draws (`Random.randbytes`) are mapped through the
+table by `map(table.__getitem__, ...)`, so no Python code runs per booking:
+a million rows draw in about a second and land in a snapshot in about two.
+The distributions:
+
+- first and last names are Zipf-distributed over thousands of names (the
+  common ones first, then syllable-built ones), so the commonest name holds
+  a few percent of bookings and most names match a handful;
+- check-in days follow a yearly season (peak in July) with more Friday and
+  Saturday arrivals; stays are 1-21 nights, mostly short, with weekly peaks;
+- totalprice is nights times a log-normal nightly rate (median `NIGHTLY_MEDIAN`);
+- depositpaid is true for `DEPOSIT_RATE` of bookings, and `NO_NEEDS` of them
+  have no additionalneeds at all.
+
+The columns are written straight into a stand-in snapshot (`write_columns`)
+or, for a `.jsonl` path, as one `{"bookingid": ..., "booking": ...}` object
+per line. The same seed and size give the same bookings in either format.
+
+    python -m utils.booking_dataset data/bookings.snap --rows 1000000 --seed 7
+    python -m utils.booking_dataset data/bookings.jsonl --rows 10000
+"""
+import json
+import math
+import operator
+import random
+import sys
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+from statistics import NormalDist
+
+from utils.booking_snapshot import ABSENT, PRICE_INT, write_columns
+
+SLOTS = 1 << 16  # outcomes per distribution table: the resolution of every sampled weight
+JSONL_BATCH = 100_000
+
+FIRSTNAMES = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth",
+    "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Daniel", "Lisa", "Matthew", "Nancy", "Mark", "Sandra", "Paul", "Ashley", "Steven", "Emily",
+    "Andrew", "Michelle", "Kevin", "Amanda", "Brian", "Melissa", "George", "Rebecca", "Edward", "Laura",
+    "Jim", "Sally", "Eva", "Oliver", "Sofia", "Lucas", "Amelia", "Noah", "Isla", "Leo",
+)
+LASTNAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Wilson", "Anderson", "Taylor", "Thomas", "Moore", "Jackson", "Martin", "Lee", "Thompson", "White",
+    "Harris", "Clark", "Lewis", "Robinson", "Walker", "Young", "Allen", "King", "Wright", "Scott",
+    "Green", "Baker", "Adams", "Nelson", "Hill", "Campbell", "Mitchell", "Roberts", "Carter", "Phillips",
+    "Evans", "Turner", "Parker", "Collins", "Edwards", "Stewart", "Morris", "Murphy", "Cook", "Ericsson",
+)
+# Syllables that build the long tail of names behind the common ones above
+NAME_STARTS = ("Al", "Bel", "Cor", "Dar", "El", "Fen", "Gal", "Har", "Is", "Jor", "Kal", "Lor",
+               "Mar", "Nor", "Ol", "Per", "Quin", "Ros", "Sel", "Tam", "Ul", "Val", "Wyn", "Zar")
+NAME_MIDDLES = ("", "a", "e", "i", "o", "an", "en", "ri", "li", "ve")
+FIRSTNAME_ENDS = ("a", "o", "an", "el", "en", "ia", "ie", "in", "is", "on", "us", "yn")
+LASTNAME_ENDS = ("son", "ton", "ley", "man", "field", "wood", "well", "ford", "berg", "ridge",
+                 "worth", "by", "ham", "er", "ing", "ett", "ski", "ova", "stein", "more")
+NEEDS = ("Breakfast", "Late checkout", "Parking", "Early check-in", "Extra bed", "Airport transfer",
+         "Dinner", "Cot", "Pet friendly", "Lunch")
+FIRSTNAME_COUNT = 2000
+LASTNAME_COUNT = 4000
+ZIPF_EXPONENT = 0.7
+NO_NEEDS = 0.35
+DEPOSIT_RATE = 0.75
+# Relative weight of each stay length in nights
+NIGHTS = {1: 16, 2: 21, 3: 17, 4: 10, 5: 7, 6: 4, 7: 10, 8: 2, 10: 3, 14: 6, 21: 1}
+NIGHTLY_MEDIAN = 110
+NIGHTLY_SIGMA = 0.45
+FIRST_DAY = date(2018, 1, 1)
+YEARS = 9
+PEAK_DAY_OF_YEAR = 196  # mid-July
+SEASONALITY = 0.45
+WEEKEND_ARRIVALS = 1.3
+
+
+def _zipf(count, exponent=1.0):
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _names(common, ends, count):
+    """`common` followed by syllable-built names, `count` distinct ones in all."""
+    built = (start + middle + end for middle in NAME_MIDDLES for end in ends for start in NAME_STARTS)
+    return list(dict.fromkeys(common + tuple(built)))[:count]
+
+
+def _table(outcomes, weights, typecode="I"):
+    """`SLOTS` outcomes, each repeated in proportion to its weight."""
+    total = sum(weights)
+    table, start = array(typecode), 0
+    for outcome, cumulative in zip(outcomes, accumulate(weights)):
+        end = round(SLOTS * cumulative / total)
+        table.extend(array(typecode, [outcome]) * (end - start))
+        start = end
+    return table
+
+
+def _sample(rng, table, rows):
+    """`rows` independent draws from a `_table`."""
+    draws = array("H", rng.randbytes(2 * rows))
+    if sys.byteorder == "big":
+        draws.byteswap()  # the same bookings for a seed on every machine
+    return array(table.typecode, map(table.__getitem__, draws))
+
+
+def _checkin_weights(start, days):
+    weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        season = 1 + SEASONALITY * math.cos(2 * math.pi * (day.timetuple().tm_yday - PEAK_DAY_OF_YEAR) / 365.25)
+        weights.append(season * (WEEKEND_ARRIVALS if day.weekday() in (4, 5) else 1.0))
+    return weights
+
+
+def _nightly_rates():
+    """Quantiles of the log-normal nightly rate, one per slot."""
+    rate = NormalDist(math.log(NIGHTLY_MEDIAN), NIGHTLY_SIGMA)
+    return array("I", (round(math.exp(rate.inv_cdf((slot + 0.5) / SLOTS))) for slot in range(SLOTS)))
+
+
+def generate(rows, seed=0, start=FIRST_DAY, years=YEARS):
+    """`(columns, values, dates)` of `rows` bookings with ids 1..rows, as `write_columns` takes them."""
+    rng = random.Random(seed)
+    values = {}
+
+    def codes(texts):
+        return [values.setdefault(json.dumps(text), len(values)) for text in texts]
+
+    firstnames = codes(_names(FIRSTNAMES, FIRSTNAME_ENDS, FIRSTNAME_COUNT))
+    lastnames = codes(_names(LASTNAMES, LASTNAME_ENDS, LASTNAME_COUNT))
+    needs = codes(NEEDS)
+    days = round(years * 365.25)
+    dates = [(start + timedelta(days=offset)).isoformat() for offset in range(days + max(NIGHTS))]
+    needs_weights = [(1 - NO_NEEDS) * weight / sum(_zipf(len(needs))) for weight in _zipf(len(needs))]
+
+    # Date codes are day offsets: consecutive days are already the sorted date table
+    checkins = _sample(rng, _table(range(days), _checkin_weights(start, days)), rows)
+    nights = _sample(rng, _table(list(NIGHTS), list(NIGHTS.values())), rows)
+    rates = _sample(rng, _nightly_rates(), rows)
+    deposit = bytes(int(byte < DEPOSIT_RATE * 256) for byte in range(256))
+    columns = {
+        "id": array("I", range(1, rows + 1)),
+        "firstname": _sample(rng, _table(firstnames, _zipf(len(firstnames), ZIPF_EXPONENT)), rows),
+        "lastname": _sample(rng, _table(lastnames, _zipf(len(lastnames), ZIPF_EXPONENT)), rows),
+        "checkin": checkins,
+        "checkout": array("I", map(operator.add, checkins, nights)),
+        "additionalneeds": _sample(rng, _table([ABSENT] + needs, [NO_NEEDS] + needs_weights), rows),
+        "totalprice": array("d", map(operator.mul, rates, nights)),
+        "price_kind": array("B", [PRICE_INT]) * rows,
+        "depositpaid": array("B", rng.randbytes(rows).translate(deposit)),
+    }
+    return columns, list(values), dates
+
+
+def write_jsonl(path, columns, values, dates):
+    """One `{"bookingid": ..., "booking": ...}` object per line, byte-for-byte what json.dumps gives."""
+    line = ('{"bookingid": %d, "booking": {"firstname": %s, "lastname": %s, "totalprice": %d, '
+            '"depositpaid": %s, "bookingdates": {"checkin": "%s", "checkout": "%s"}%s}}\n')
+    needs = {ABSENT: ""}
+    needs.update((code, f', "additionalneeds": {text}') for code, text in enumerate(values))
+    deposit = ("false", "true")
+    c = columns
+    with open(path, "w") as fh:
+        for first in range(0, len(c["id"]), JSONL_BATCH):
+            batch = slice(first, first + JSONL_BATCH)
+            fh.writelines(
+                line % (booking_id, values[firstname], values[lastname], price, deposit[paid],
+                        dates[checkin], dates[checkout], needs[need])
+                for booking_id, firstname, lastname, price, paid, checkin, checkout, need in zip(
+                    c["id"][batch], c["firstname"][batch], c["lastname"][batch], c["totalprice"][batch],
+                    c["depositpaid"][batch], c["checkin"][batch], c["checkout"][batch],
+                    c["additionalneeds"][batch]))
+
+
+def write_dataset(path, rows, seed=0, **kwargs):
+    """Generate `rows` bookings into a snapshot at `path`, or JSON lines if it ends in `.jsonl`."""
+    columns, values, dates = generate(rows, seed, **kwargs)
+    if path.endswith(".jsonl"):
+        write_jsonl(path, columns, values, dates)
+    else:
+        write_columns(path, columns, values, dates)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate a seeded booking dataset for the stand-in")
+    parser.add_argument("path", help="Snapshot to write (for --dataset), or a .jsonl file")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=date.fromisoformat, default=FIRST_DAY, help="First check-in day")
+    parser.add_argument("--years", type=float, default=YEARS, help="Years of check-in days from --start")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    write_dataset(args.path, args.rows, args.seed, start=args.start, years=args.years)
+    print(f"Wrote {args.rows} bookings to {args.path} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,81 @@
+import threading
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.api_client import DEFAULT_POOL_SIZE
+from utils.payloads import BOOKING_TEMPLATES, with_namespace
+
+Booking = namedtuple("Booking", "id payload")
+
+# DELETE answers 201 on success; 405 means a test already deleted it
+TEARDOWN_OK_STATUSES = (200, 201, 405)
+
+
+class BookingFactory:
+    """Hands out pre-created bookings and deletes everything it made at teardown.
+
+    `prefetch` creates the whole session's demand concurrently up front, so a
+    test's "Step 1: Create a booking" becomes a pop from an in-memory pool.
+    """
+
+    def __init__(self, client, namespace, workers=DEFAULT_POOL_SIZE):
+        self.client = client
+        self.namespace = namespace
+        self.workers = workers
+        self.created = []
+        self._pools = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def track(self, booking_id):
+        """Register a booking created elsewhere so teardown removes it too."""
+        with self._lock:
+            self.created.append(booking_id)
+
+    def create(self, template):
+        payload = with_namespace(BOOKING_TEMPLATES[template], self.namespace)
+        response = self.client.create_booking(payload)
+        if response.status_code != 200:
+            raise RuntimeError(f"Booking creation failed ({response.status_code}): {response.text}")
+        booking = Booking(response.json()["bookingid"], payload)
+        self.track(booking.id)
+        return booking
+
+    def prefetch(self, demand):
+        """Concurrently create `demand[template]` bookings for each template."""
+        jobs = [template for template, count in demand.items() for _ in range(count)]
+        with ThreadPoolExecutor(self.workers) as pool:
+            bookings = list(pool.map(self.create, jobs))
+        with self._lock:
+            for template, booking in zip(jobs, bookings):
+                self._pools[template].append(booking)
+
+    def top_up(self, template, count):
+        """Prefetch enough `template` bookings that `count` can be taken without a round trip."""
+        with self._lock:
+            missing = count - len(self._pools[template])
+        if missing > 0:
+            self.prefetch({template: missing})
+
+    def take(self, template):
+        """Pop a pooled booking, creating one on the spot if the pool ran dry."""
+        with self._lock:
+            pool = self._pools[template]
+            if pool:
+                return pool.popleft()
+        return self.create(template)
+
+    def teardown(self, headers):
+        """Delete every tracked booking concurrently; return the ids that failed."""
+        with self._lock:
+            booking_ids, self.created = self.created, []
+            self._pools.clear()
+
+        def delete(booking_id):
+            return self.client.delete_booking(booking_id, headers=headers).status_code
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            statuses = list(pool.map(delete, booking_ids))
+        return [
+            booking_id for booking_id, status in zip(booking_ids, statuses)
+            if status not in TEARDOWN_OK_STATUSES
+        ]
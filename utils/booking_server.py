@@ -0,0 +1,804 @@
+"""In-memory stand-in for the RESTful Booker API.
+
+Implements /ping, /auth, /booking and /booking/{id} closely enough to the live
+service that the suite passes (and xfails) the same way against both. The live
+API's known quirks are reproduced on purpose:
+
+- /auth answers 200 with {"reason": "Bad credentials"} for any bad or missing
+  credentials instead of 401/400.
+- POST /booking does not type-check: names are cast to strings, a non-numeric
+  totalprice is stored as null and dates are coerced the way JavaScript's
+  `new Date(...)` would. Only an absent required field is rejected (500).
+- GET /booking ignores unknown query keys and lenient-parses dates; only an
+  ISO-shaped but impossible date (e.g. 2024-13-01) blows up with 500.
+- PUT/PATCH/DELETE need a token cookie or admin Basic auth (403 otherwise),
+  answer 405 for unknown ids, and DELETE succeeds with 201 Created.
+
+`GET /__stats` is the stand-in's own: the `ServerStats` saturation counters
+of every serving process (see `utils/async_booking_server.py` for the
+asyncio and pre-fork modes), `?reset=1` starting a fresh window.
+"""
+import base64
+import json
+import math
+import os
+import re
+import secrets
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from operator import itemgetter
+from urllib.parse import parse_qs, urlsplit
+
+from utils.metrics import percentile
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "password123"
+BASIC_AUTH = "Basic " + base64.b64encode(
+    f"{ADMIN_USERNAME}:{ADMIN_PASSWORD}".encode()).decode()
+
+REQUIRED_FIELDS = ("firstname", "lastname", "totalprice", "depositpaid", "bookingdates")
+REQUIRED_DATES = ("checkin", "checkout")
+INVALID_DATE = "0NaN-aN-aN"
+JSON_TYPE = "application/json; charset=utf-8"
+LAG_SAMPLES = 1000
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_BOOKING_ID = re.compile(r"-?[0-9]+")
+_LENIENT_FORMATS = ("%m-%d-%Y", "%m/%d/%Y", "%Y/%m/%d")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_second = itemgetter(1)  # the id of a (date, id) column entry
+
+
+class InvalidDateError(ValueError):
+    """An ISO-shaped date that names an impossible day (the live API 500s)."""
+
+
+def parse_js_date(value):
+    """Mimic `new Date(value)`: return a `date`, or None for Invalid Date."""
+    if value is None or isinstance(value, (bool, int, float)):
+        try:
+            return (_EPOCH + timedelta(milliseconds=float(value or 0))).date()
+        except (OverflowError, ValueError):
+            # Past datetime's range, or NaN/Infinity
+            return None
+    if not isinstance(value, str):
+        return None
+    if _ISO_DATE.match(value):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            raise InvalidDateError(value)
+    for fmt in _LENIENT_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _format_date(value):
+    try:
+        parsed = parse_js_date(value)
+    except InvalidDateError:
+        parsed = None
+    return parsed.isoformat() if parsed else INVALID_DATE
+
+
+def _cast_price(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    try:
+        number = float(str(value).strip())
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else number
+
+
+def _cast_bool(value):
+    if isinstance(value, str) and value.lower() in ("true", "1", "yes"):
+        return True
+    if isinstance(value, str) and value.lower() in ("false", "0", "no", ""):
+        return False
+    return value if isinstance(value, bool) else bool(value)
+
+
+def _cast_name(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return value if value is None else str(value)
+
+
+def is_complete(payload):
+    if not isinstance(payload, dict):
+        return False
+    if any(field not in payload for field in REQUIRED_FIELDS):
+        return False
+    dates = payload["bookingdates"]
+    return isinstance(dates, dict) and all(key in dates for key in REQUIRED_DATES)
+
+
+def normalize_booking(payload):
+    """Coerce a booking payload the way the live API's model layer does."""
+    dates = payload.get("bookingdates") or {}
+    booking = {
+        "firstname": _cast_name(payload.get("firstname")),
+        "lastname": _cast_name(payload.get("lastname")),
+        "totalprice": _cast_price(payload.get("totalprice")),
+        "depositpaid": _cast_bool(payload.get("depositpaid")),
+        "bookingdates": {
+            "checkin": _format_date(dates.get("checkin")),
+            "checkout": _format_date(dates.get("checkout")),
+        },
+    }
+    if "additionalneeds" in payload:
+        booking["additionalneeds"] = payload["additionalneeds"]
+    return booking
+
+
+def list_filters(query):
+    """`BookingStore.query` filters for GET /booking, or None when nothing can match.
+
+    Raises `InvalidDateError` for an impossible ISO date (the live API 500s).
+    """
+    filters = {key: query[key] for key in ("firstname", "lastname") if key in query}
+    for key in ("checkin", "checkout"):
+        if key in query:
+            parsed = parse_js_date(query[key])
+            if parsed is None:
+                return None
+            filters[key] = parsed
+    return filters
+
+
+def render_listing(ids):
+    """GET /booking body: byte-for-byte what json.dumps gives, at half the cost for big listings."""
+    return ("[" + ", ".join(['{"bookingid": %d}' % booking_id for booking_id in ids]) + "]").encode()
+
+
+class TokenSet(set):
+    """Tokens minted by /auth, checked with `in`."""
+
+    def issue(self):
+        token = secrets.token_hex(8)[:15]
+        self.add(token)
+        return token
+
+
+class ServerStats:
+    """Saturation counters of one serving process.
+
+    `busy` is the wall time with at least one request in progress, so a busy
+    fraction near 1 means requests queue behind each other. Event-loop fronts
+    also sample `lag`: how late a timer fires, i.e. how long ready work waits
+    for the loop.
+    """
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.connections = 0
+        self.lag = deque(maxlen=LAG_SAMPLES)
+        self.reset()
+
+    def reset(self):
+        """Start a new measurement window (in-flight requests carry over)."""
+        with self._lock:
+            self.started = time.monotonic()
+            self.requests = 0
+            self.forwarded = 0
+            self.busy = 0.0
+            self._busy_since = self.started if self.in_flight else None
+            self.peak_in_flight = self.in_flight
+            self.peak_connections = self.connections
+            self.lag.clear()
+
+    def opened(self):
+        with self._lock:
+            self.connections += 1
+            self.peak_connections = max(self.peak_connections, self.connections)
+
+    def closed(self):
+        with self._lock:
+            self.connections -= 1
+
+    @contextmanager
+    def track(self, count=True):
+        """Time one request; `count=False` for work done on another worker's behalf."""
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if self.in_flight == 1:
+                self._busy_since = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.requests += count
+                if not self.in_flight:
+                    self.busy += time.monotonic() - self._busy_since
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            uptime = max(now - self.started, 1e-9)
+            busy = self.busy + (now - self._busy_since if self.in_flight else 0.0)
+            lag = sorted(self.lag)
+            return {
+                "pid": os.getpid(),
+                "mode": self.mode,
+                "uptime_s": round(uptime, 3),
+                "requests": self.requests,
+                "forwarded": self.forwarded,
+                "rps": round(self.requests / uptime, 1),
+                "busy": round(min(busy / uptime, 1.0), 4),
+                "peak_in_flight": self.peak_in_flight,
+                "peak_connections": self.peak_connections,
+                "lag_p99_ms": round(percentile(lag, 99) * 1000, 3) if lag else None,
+                "lag_max_ms": round(lag[-1] * 1000, 3) if lag else None,
+            }
+
+
+def stats_report(workers):
+    """GET /__stats body: one `ServerStats.snapshot()` per serving process plus totals."""
+    lags = [worker["lag_p99_ms"] for worker in workers if worker["lag_p99_ms"] is not None]
+    return {
+        "mode": workers[0]["mode"],
+        "workers": workers,
+        "totals": {
+            "requests": sum(worker["requests"] for worker in workers),
+            "rps": round(sum(worker["rps"] for worker in workers), 1),
+            "busy_max": max(worker["busy"] for worker in workers),
+            "lag_p99_ms_max": max(lags) if lags else None,
+        },
+    }
+
+
+class SortedColumn:
+    """(value, id) pairs kept sorted in chunks of about `CHUNK` entries.
+
+    The sortedcontainers layout: an insert or delete shifts one chunk rather
+    than the whole column, and `_maxes` (each chunk's last entry) locates the
+    chunk by bisection.
+    """
+
+    CHUNK = 1000
+
+    def __init__(self):
+        self._chunks = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def update(self, items):
+        """Add many entries with one sort instead of an insert each."""
+        items = sorted([entry for chunk in self._chunks for entry in chunk] + list(items))
+        self._chunks = [items[i:i + self.CHUNK] for i in range(0, len(items), self.CHUNK)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(items)
+
+    def add(self, item):
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([item])
+            self._maxes.append(item)
+            return
+        k = min(bisect_left(self._maxes, item), len(self._maxes) - 1)
+        chunk = self._chunks[k]
+        insort(chunk, item)
+        self._maxes[k] = chunk[-1]
+        if len(chunk) > 2 * self.CHUNK:
+            self._chunks[k:k + 1] = [chunk[:self.CHUNK], chunk[self.CHUNK:]]
+            self._maxes[k:k + 1] = [chunk[self.CHUNK - 1], chunk[-1]]
+
+    def remove(self, item):
+        self._len -= 1
+        k = bisect_left(self._maxes, item)
+        chunk = self._chunks[k]
+        del chunk[bisect_left(chunk, item)]
+        if chunk:
+            self._maxes[k] = chunk[-1]
+        else:
+            del self._chunks[k]
+            del self._maxes[k]
+
+    def _rank(self, item):
+        """Number of entries < `item`, with its chunk index and offset."""
+        k = bisect_left(self._maxes, item)
+        if k == len(self._chunks):
+            return len(self), k, 0
+        offset = bisect_left(self._chunks[k], item)
+        return sum(map(len, self._chunks[:k])) + offset, k, offset
+
+    def count(self, low=None, high=None):
+        """Entries in [low, high); None leaves that end open."""
+        start = self._rank(low)[0] if low is not None else 0
+        end = self._rank(high)[0] if high is not None else len(self)
+        return max(0, end - start)
+
+    def ids(self, low=None, high=None):
+        """Ids of the entries in [low, high)."""
+        k, offset = self._rank(low)[1:] if low is not None else (0, 0)
+        ids = []
+        for chunk in self._chunks[k:]:
+            if high is not None and chunk[-1] >= high:
+                ids.extend(map(_second, chunk[offset:bisect_left(chunk, high)]))
+                break
+            ids.extend(map(_second, chunk[offset:]))
+            offset = 0
+        return ids
+
+
+class BookingStore:
+    """Thread-safe in-memory booking table with secondary indexes for GET /booking.
+
+    First and last names have hash indexes (name -> ids); check-in and
+    check-out dates are kept as sorted `(date, id)` columns, so `checkin >= X`
+    is a suffix and `checkout <= Y` a prefix found by bisection. Every write
+    updates the indexes in place. A query intersects its two most selective
+    filters and checks the others per candidate, so its cost follows the
+    size of the smallest matches instead of the table.
+    """
+
+    INTERSECT_RATIO = 4
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bookings = {}
+        self._next_id = 1
+        self._id_step = 1
+        self._by_firstname = {}
+        self._by_lastname = {}
+        self._checkins = SortedColumn()
+        self._checkouts = SortedColumn()
+
+    def __len__(self):
+        return len(self._bookings)
+
+    # ---------------------- INDEXES ----------------------
+
+    def _index(self, booking_id, booking):
+        self._by_firstname.setdefault(booking["firstname"], set()).add(booking_id)
+        self._by_lastname.setdefault(booking["lastname"], set()).add(booking_id)
+        dates = booking["bookingdates"]
+        self._checkins.add((dates["checkin"], booking_id))
+        self._checkouts.add((dates["checkout"], booking_id))
+
+    def _unindex(self, booking_id, booking):
+        for index, name in ((self._by_firstname, booking["firstname"]), (self._by_lastname, booking["lastname"])):
+            ids = index[name]
+            ids.discard(booking_id)
+            if not ids:
+                del index[name]
+        dates = booking["bookingdates"]
+        self._checkins.remove((dates["checkin"], booking_id))
+        self._checkouts.remove((dates["checkout"], booking_id))
+
+    def shard(self, index, count):
+        """From now on allocate only ids congruent to `index + 1` modulo `count`."""
+        with self._lock:
+            self._id_step = count
+            self._next_id += (index + 1 - self._next_id) % count
+
+    # ---------------------- WRITES ----------------------
+
+    def create(self, booking):
+        with self._lock:
+            booking_id = self._next_id
+            self._next_id += self._id_step
+            self._bookings[booking_id] = booking
+            self._index(booking_id, booking)
+        return booking_id
+
+    def load(self, bookings):
+        """Bulk `create`: one sort of the date indexes instead of an insert per booking."""
+        with self._lock:
+            first = self._next_id
+            checkins, checkouts = [], []
+            for position, booking in enumerate(bookings):
+                booking_id = first + position * self._id_step
+                self._bookings[booking_id] = booking
+                self._by_firstname.setdefault(booking["firstname"], set()).add(booking_id)
+                self._by_lastname.setdefault(booking["lastname"], set()).add(booking_id)
+                dates = booking["bookingdates"]
+                checkins.append((dates["checkin"], booking_id))
+                checkouts.append((dates["checkout"], booking_id))
+                self._next_id = booking_id + self._id_step
+            self._checkins.update(checkins)
+            self._checkouts.update(checkouts)
+        return range(first, self._next_id, self._id_step)
+
+    def put(self, booking_id, booking):
+        """Insert or overwrite the booking under a given id (log replay, copies)."""
+        with self._lock:
+            current = self._bookings.get(booking_id)
+            if current is not None:
+                self._unindex(booking_id, current)
+            self._bookings[booking_id] = booking
+            self._index(booking_id, booking)
+            self._next_id = max(self._next_id, booking_id + self._id_step)
+
+    def get(self, booking_id):
+        return self._bookings.get(booking_id)
+
+    def replace(self, booking_id, booking):
+        with self._lock:
+            current = self._bookings.get(booking_id)
+            if current is None:
+                return None
+            self._unindex(booking_id, current)
+            self._bookings[booking_id] = booking
+            self._index(booking_id, booking)
+        return booking
+
+    def patch(self, booking_id, changes):
+        with self._lock:
+            current = self._bookings.get(booking_id)
+            if current is None:
+                return None
+            merged = normalize_booking({**current, **changes})
+            self._unindex(booking_id, current)
+            self._bookings[booking_id] = merged
+            self._index(booking_id, merged)
+        return merged
+
+    def delete(self, booking_id):
+        with self._lock:
+            current = self._bookings.pop(booking_id, None)
+            if current is None:
+                return False
+            self._unindex(booking_id, current)
+        return True
+
+    # ---------------------- QUERIES ----------------------
+
+    @staticmethod
+    def _source_ids(ids):
+        """A copy of a name's id set, or the ids of a `(column, low, high)` date range."""
+        if isinstance(ids, tuple):
+            column, low, high = ids
+            return column.ids(low, high)
+        return list(ids)
+
+    def query(self, firstname=None, lastname=None, checkin=None, checkout=None):
+        """Return ids matching the filters in id order; dates are `date` objects (inclusive)."""
+        with self._lock:
+            # filter -> (match count, ids or a (column, low, high) range)
+            sources = {}
+            if firstname is not None:
+                ids = self._by_firstname.get(firstname, frozenset())
+                sources["firstname"] = (len(ids), ids)
+            if lastname is not None:
+                ids = self._by_lastname.get(lastname, frozenset())
+                sources["lastname"] = (len(ids), ids)
+            # Counting a date range sums chunk sizes; not worth it once a name
+            # has narrowed the candidates to a chunk's worth
+            small = bool(sources) and min(size for size, _ in sources.values()) <= SortedColumn.CHUNK
+            if checkin is not None and not small:
+                low = (checkin.isoformat(),)
+                sources["checkin"] = (self._checkins.count(low=low), (self._checkins, low, None))
+            if checkout is not None and not small:
+                # Every (date, id) with date <= checkout sorts before (checkout, inf)
+                high = (checkout.isoformat(), math.inf)
+                sources["checkout"] = (self._checkouts.count(high=high), (self._checkouts, None, high))
+            if not sources:
+                return list(self._bookings)
+
+            order = sorted(sources, key=lambda name: sources[name][0])
+            size, ids = sources[order[0]]
+            if not size:
+                return []
+            candidates = self._source_ids(ids)
+            used = order[:1]
+            # Intersect with the next smallest source as sets: a name's ids are
+            # a set already; a date range is worth reading out of its column
+            # while it is within INTERSECT_RATIO of the candidates, since every
+            # row check below is a few scattered dict lookups
+            if len(order) > 1:
+                other_size, other = sources[order[1]]
+                if not isinstance(other, tuple):
+                    candidates = other.intersection(candidates)
+                    used = order[:2]
+                elif other_size <= self.INTERSECT_RATIO * size:
+                    candidates = set(candidates).intersection(self._source_ids(other))
+                    used = order[:2]
+            bookings = self._bookings
+            if firstname is not None and "firstname" not in used:
+                candidates = [i for i in candidates if bookings[i]["firstname"] == firstname]
+            if lastname is not None and "lastname" not in used:
+                candidates = [i for i in candidates if bookings[i]["lastname"] == lastname]
+            if checkin is not None and "checkin" not in used:
+                low = checkin.isoformat()
+                candidates = [i for i in candidates if bookings[i]["bookingdates"]["checkin"] >= low]
+            if checkout is not None and "checkout" not in used:
+                high = checkout.isoformat()
+                candidates = [i for i in candidates if bookings[i]["bookingdates"]["checkout"] <= high]
+        return sorted(candidates)
+
+
+class BookingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "BookerStandIn/1.0"
+    # Buffer each response into a single write; split header/body segments
+    # trip delayed-ACK stalls on keep-alive connections.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stats.opened()
+
+    def finish(self):
+        try:
+            super().finish()
+        finally:
+            self.server.stats.closed()
+
+    # ---------------------- PLUMBING ----------------------
+
+    def _send(self, status, body=b"", content_type="text/plain; charset=utf-8"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text):
+        self._send(status, text.encode())
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data).encode(), JSON_TYPE)
+
+    def _read_json(self):
+        """Return the parsed body, or raise ValueError on malformed JSON."""
+        if not self._body:
+            return {}
+        return json.loads(self._body)
+
+    def _is_authorized(self):
+        if self.headers.get("Authorization") == BASIC_AUTH:
+            return True
+        for part in (self.headers.get("Cookie") or "").split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == "token" and value in self.server.tokens:
+                return True
+        return False
+
+    def _route(self):
+        """Split the request path into (collection, booking_id or None, query)."""
+        parts = urlsplit(self.path)
+        segments = [s for s in parts.path.split("/") if s]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        if len(segments) == 2 and segments[0] == "booking":
+            # int() alone would also take "+5", "1_0" and non-ASCII digits
+            booking_id = int(segments[1]) if _BOOKING_ID.fullmatch(segments[1]) else -1
+            return "booking", booking_id, query
+        return "/".join(segments), None, query
+
+    def _tracked(self):
+        return self.server.stats.track()
+
+    def _dispatch(self, handlers):
+        with self._tracked():
+            # Always drain the body, even for requests rejected before parsing it,
+            # so leftover bytes never bleed into the next request on the connection.
+            length = int(self.headers.get("Content-Length") or 0)
+            self._body = self.rfile.read(length) if length else b""
+            collection, booking_id, query = self._route()
+            handler = handlers.get((collection, booking_id is not None))
+            if handler is None:
+                self._send_text(404, "Not Found")
+                return
+            try:
+                handler(booking_id, query)
+            except Exception:
+                self._send_text(500, "Internal Server Error")
+
+    # ---------------------- VERBS ----------------------
+
+    def do_GET(self):
+        self._dispatch({
+            ("ping", False): lambda _id, _q: self._send_text(201, "Created"),
+            ("booking", False): self._list_bookings,
+            ("booking", True): self._get_booking,
+            ("__stats", False): self._server_stats,
+        })
+
+    def do_POST(self):
+        self._dispatch({
+            ("auth", False): self._create_token,
+            ("booking", False): self._create_booking,
+        })
+
+    def do_PUT(self):
+        self._dispatch({("booking", True): self._update_booking})
+
+    def do_PATCH(self):
+        self._dispatch({("booking", True): self._patch_booking})
+
+    def do_DELETE(self):
+        self._dispatch({("booking", True): self._delete_booking})
+
+    # ---------------------- ENDPOINTS ----------------------
+
+    def _create_token(self, _id, _query):
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_text(400, "Bad Request")
+            return
+        if (isinstance(payload, dict) and payload.get("username") == ADMIN_USERNAME
+                and payload.get("password") == ADMIN_PASSWORD):
+            self._send_json(200, {"token": self.server.tokens.issue()})
+        else:
+            self._send_json(200, {"reason": "Bad credentials"})
+
+    def _list_bookings(self, _id, query):
+        try:
+            filters = list_filters(query)
+        except InvalidDateError:
+            self._send_text(500, "Internal Server Error")
+            return
+        ids = self.server.store.query(**filters) if filters is not None else []
+        self._send(200, render_listing(ids), JSON_TYPE)
+
+    def _get_booking(self, booking_id, _query):
+        booking = self.server.store.get(booking_id)
+        if booking is None:
+            self._send_text(404, "Not Found")
+        else:
+            self._send_json(200, booking)
+
+    def _create_booking(self, _id, _query):
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_text(400, "Bad Request")
+            return
+        if not is_complete(payload):
+            self._send_text(500, "Internal Server Error")
+            return
+        booking = normalize_booking(payload)
+        booking_id = self.server.store.create(booking)
+        self._send_json(200, {"bookingid": booking_id, "booking": booking})
+
+    def _update_booking(self, booking_id, _query):
+        if not self._is_authorized():
+            self._send_text(403, "Forbidden")
+            return
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_text(400, "Bad Request")
+            return
+        if self.server.store.get(booking_id) is None:
+            self._send_text(405, "Method Not Allowed")
+            return
+        if not is_complete(payload):
+            self._send_text(400, "Bad Request")
+            return
+        booking = self.server.store.replace(booking_id, normalize_booking(payload))
+        self._send_json(200, booking)
+
+    def _patch_booking(self, booking_id, _query):
+        if not self._is_authorized():
+            self._send_text(403, "Forbidden")
+            return
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send_text(400, "Bad Request")
+            return
+        booking = self.server.store.patch(booking_id, payload if isinstance(payload, dict) else {})
+        if booking is None:
+            self._send_text(405, "Method Not Allowed")
+        else:
+            self._send_json(200, booking)
+
+    def _server_stats(self, _id, query):
+        snapshot = self.server.stats.snapshot()
+        if query.get("reset") == "1":
+            self.server.stats.reset()
+        self._send_json(200, stats_report([snapshot]))
+
+    def _delete_booking(self, booking_id, _query):
+        if not self._is_authorized():
+            self._send_text(403, "Forbidden")
+        elif self.server.store.delete(booking_id):
+            self._send_text(201, "Created")
+        else:
+            self._send_text(405, "Method Not Allowed")
+
+
+class BookingServer:
+    """Run the stand-in API on a background thread.
+
+    Binds an ephemeral port by default; `url` is the base URL to hand to the
+    API client once `start()` has returned.
+    """
+
+    mode = "threaded"
+
+    def __init__(self, host="127.0.0.1", port=0, store=None):
+        self.httpd = ThreadingHTTPServer((host, port), BookingRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.store = store if store is not None else BookingStore()
+        self.httpd.tokens = TokenSet()
+        self.httpd.stats = ServerStats(self.mode)
+        self._thread = None
+
+    @property
+    def store(self):
+        return self.httpd.store
+
+    @store.setter
+    def store(self, store):
+        self.httpd.store = store
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        # A short poll interval keeps shutdown() from stalling session teardown
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05},
+            name="booking-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from utils.async_booking_server import SERVER_MODES, make_server
+
+    parser = argparse.ArgumentParser(description="Serve the in-memory Booker stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--mode", choices=SERVER_MODES, default="threaded",
+                        help="Thread per connection, one asyncio event loop, or pre-forked asyncio workers")
+    parser.add_argument("--workers", type=int, default=0, help="Pre-fork processes (default: one per CPU)")
+    parser.add_argument("--dataset", help="Serve this booking snapshot, logging writes to <dataset>.log "
+                                          "(pre-fork: writes are not persisted)")
+    parser.add_argument("--compact-every", type=int, default=100000,
+                        help="Fold the write log into the snapshot after this many writes (0 = never)")
+    args = parser.parse_args()
+    store = None
+    if args.dataset:
+        from utils.booking_snapshot import SnapshotStore
+
+        # Forked workers cannot share one log, so they only ever write to their own shard's overlay
+        store = SnapshotStore.open(args.dataset, persist=args.mode != "prefork", compact_every=args.compact_every)
+    server = make_server(args.mode, args.workers, host=args.host, port=args.port, store=store).start()
+    print(f"Serving stand-in Booker API on {server.url} ({args.mode})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,235 @@
+"""Record/replay of HTTP exchanges, so the suite can run without the network.
+
+In record mode every exchange is sent for real and appended to the cassette of
+the test that made it (`<dir>/<module>/<test>-<hash>.json`). In replay mode all
+cassettes are loaded into one in-memory index and answered from there; nothing
+is sent.
+
+Exchanges are keyed by method, path, sorted query params, canonical JSON body
+and the headers that change the answer (auth cookie/header, Accept,
+Content-Type). Three kinds of value differ between the recording and a replay,
+so keys hold placeholders for them:
+
+- the per-run booking namespace becomes `{namespace}` (also in recorded
+  bodies, and swapped back on replay);
+- tokens seen in an auth response become `{token}`; made-up invalid tokens
+  are never learned and stay literal;
+- booking ids in the path become `{id0}`, `{id1}`, ... in the order the test
+  first uses them, because pooled bookings are created concurrently and reach
+  tests in a different order on every run.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import deque
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlsplit
+
+import httpx
+from requests import Response
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from utils.metrics import TimingAdapter, current_test
+
+MODES = ("off", "record", "replay")
+NAMESPACE_PLACEHOLDER = "{namespace}"
+TOKEN_PLACEHOLDER = "{token}"
+KEY_HEADERS = ("Cookie", "Authorization", "Accept", "Content-Type")
+# Recorded bodies are already decoded, so these no longer describe them
+DROPPED_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+_ID_SEGMENT = re.compile(r"^(/booking/)([^/]+)")
+
+
+class CassetteMissError(ConnectionError):
+    """Replay found no recorded exchange for a request."""
+
+
+def cassette_path(directory, test_id):
+    """'tests/test_auth.py::test_x[a b]' -> '<directory>/test_auth/test_x_a_b_-1a2b3c4d.json'."""
+    if not test_id:
+        return os.path.join(directory, "_session.json")
+    module, _, name = test_id.partition("::")
+    digest = hashlib.blake2b(test_id.encode(), digest_size=4).hexdigest()
+    stem = os.path.splitext(os.path.basename(module))[0]
+    return os.path.join(directory, stem, f"{_UNSAFE.sub('_', name)[:80]}-{digest}.json")
+
+
+def _canonical_body(body):
+    if not body:
+        return ""
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+class Cassette:
+    """Per-test exchange recordings plus the replay index built from them."""
+
+    def __init__(self, directory, mode, namespace=""):
+        if mode not in MODES[1:]:
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', not {mode!r}")
+        self.directory = directory
+        self.mode = mode
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._recorded = {}
+        self._index = {}
+        self._last = {}
+        self._tokens = set()
+        self._aliases = {}
+        if self.replaying:
+            self.load()
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _mask(self, text):
+        return text.replace(self.namespace, NAMESPACE_PLACEHOLDER) if self.namespace else text
+
+    def _unmask(self, text):
+        return text.replace(NAMESPACE_PLACEHOLDER, self.namespace) if self.namespace else text
+
+    def _alias(self, match):
+        with self._lock:
+            aliases = self._aliases.setdefault(current_test(), {})
+            return f"{match.group(1)}{{id{aliases.setdefault(match.group(2), len(aliases))}}}"
+
+    def _learn_token(self, content):
+        if b'"token"' in content:
+            try:
+                token = json.loads(content).get("token")
+            except (ValueError, AttributeError):
+                return
+            if token:
+                with self._lock:
+                    self._tokens.add(token)
+
+    def key(self, method, url, headers, body):
+        """Stable lookup key for one request."""
+        parts = urlsplit(url)
+        key = json.dumps([
+            method.upper(),
+            _ID_SEGMENT.sub(self._alias, parts.path),
+            sorted(parse_qsl(parts.query, keep_blank_values=True)),
+            [headers.get(name, "") for name in KEY_HEADERS],
+            _canonical_body(body),
+        ], separators=(",", ":"))
+        for token in self._tokens:
+            key = key.replace(token, TOKEN_PLACEHOLDER)
+        return self._mask(key)
+
+    def record(self, key, status, reason, headers, content):
+        self._learn_token(content)
+        headers = [[name, value] for name, value in headers if name.lower() not in DROPPED_HEADERS]
+        try:
+            body, encoded = self._mask(content.decode("utf-8")), False
+        except UnicodeDecodeError:
+            body, encoded = base64.b64encode(content).decode("ascii"), True
+        entry = {"key": key, "status": status, "reason": reason, "headers": headers,
+                 "body": body, "base64": encoded}
+        with self._lock:
+            self._recorded.setdefault(current_test(), []).append(entry)
+
+    def play(self, key):
+        """Recorded answer for `key`: the current test's own recordings first,
+        then any other test's (shared session setup), then the last one served."""
+        with self._lock:
+            by_test = self._index.get(key)
+            if not by_test:
+                raise CassetteMissError(f"No recorded exchange for {key}")
+            queue = by_test.get(current_test())
+            if not queue:
+                queue = next((q for q in by_test.values() if q), None)
+            entry = queue.popleft() if queue else self._last[key]
+            self._last[key] = entry
+        content = base64.b64decode(entry["body"]) if entry["base64"] else self._unmask(entry["body"]).encode()
+        self._learn_token(content)
+        return entry["status"], entry["reason"], entry["headers"], content
+
+    def load(self):
+        """Index every cassette under the directory by request key."""
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                if not name.endswith(".json"):
+                    continue
+                with open(os.path.join(root, name)) as fh:
+                    cassette = json.load(fh)
+                for entry in cassette["exchanges"]:
+                    by_test = self._index.setdefault(entry["key"], {})
+                    by_test.setdefault(cassette["test"], deque()).append(entry)
+
+    def save(self):
+        """Write one cassette file per test recorded in this run."""
+        if self.replaying:
+            return
+        with self._lock:
+            recorded, self._recorded = self._recorded, {}
+        for test_id, exchanges in recorded.items():
+            path = cassette_path(self.directory, test_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as fh:
+                json.dump({"test": test_id, "exchanges": exchanges}, fh, indent=1)
+
+
+class CassetteAdapter(TimingAdapter):
+    """requests adapter that records through the timed pool or replays from the cassette."""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        key = self.cassette.key(request.method, request.url, request.headers, request.body)
+        if not self.cassette.replaying:
+            response = super().send(request, **kwargs)
+            self.cassette.record(key, response.status_code, response.reason,
+                                 response.headers.items(), response.content)
+            return response
+
+        status, reason, headers, content = self.cassette.play(key)
+        response = Response()
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = content
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(0)
+        return response
+
+
+class CassetteTransport(httpx.AsyncBaseTransport):
+    """httpx transport twin of `CassetteAdapter` for the async clients."""
+
+    def __init__(self, cassette, transport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        key = self.cassette.key(request.method, str(request.url), request.headers, request.content)
+        if not self.cassette.replaying:
+            response = await self.transport.handle_async_request(request)
+            await response.aread()
+            self.cassette.record(key, response.status_code, response.reason_phrase,
+                                 response.headers.multi_items(), response.content)
+            return response
+
+        status, _, headers, content = self.cassette.play(key)
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
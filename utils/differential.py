@@ -0,0 +1,334 @@
+"""Differential runs: mirror every request to other targets and diff the answers.
+
+With `--diff-targets` (any of live, local and replay besides the run's own
+target) each request the suite makes is also sent, at the same time, to
+every listed target; the test only ever sees its own target's response. Once
+all answers are in, each mirror's is compared with it on status, media type
+and body, so the suite's own cases - quirks, xfails and all - are the corpus
+that checks the stand-in against the live API or a recording of it.
+
+Values that differ between targets by nature are paired or masked first:
+
+- booking ids: the id a mirror answers a POST /booking with is paired with
+  the run's own, later /booking/{id} paths are sent with the mirror's id and
+  ids in bodies compare as the run's own id. Listings only compare the
+  bookings created in this run, in id order; other clients' bookings on the
+  live API are not ours to compare;
+- tokens: the token a mirror's /auth returns is paired with the run's own
+  and swapped into the mirror's cookie; token values compare as `{token}`;
+- headers other than the Content-Type media type (Date, Server, Via, ...).
+
+`Differ` holds the mirrors and the divergences; `DiffAdapter` and
+`DiffTransport` hook it into the sync and async clients, and `DiffPlugin`
+reports what it found.
+"""
+import asyncio
+import contextvars
+import json
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from utils.metrics import current_test, endpoint_template
+
+TARGETS = ("live", "local", "replay")
+TOKEN_PLACEHOLDER = "{token}"
+OTHER_BOOKING = None
+MIRROR_THREADS = 8
+BODY_LIMIT = 500  # characters of each body kept per divergence
+EXCERPT = 60  # characters of each value in a difference
+EXAMPLES = 3
+
+# Per-connection headers the mirror's own client sets
+_SKIPPED_HEADERS = {"host", "content-length", "connection", "accept-encoding", "transfer-encoding"}
+_ID_SEGMENT = re.compile(r"^(/booking/)(\d+)")
+_TOKEN_COOKIE = re.compile(r"\b(token=)([^;\s]*)")
+
+
+def _decode(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return body.decode("utf-8", "replace")
+
+
+def _media_type(content_type):
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def normalize(value, ids):
+    """`value` with tokens masked and booking ids mapped through `ids` (others: `OTHER_BOOKING`)."""
+    if isinstance(value, dict):
+        normalized = {}
+        for key, item in value.items():
+            if key == "token":
+                normalized[key] = TOKEN_PLACEHOLDER
+            elif key == "bookingid":
+                normalized[key] = ids.get(item, OTHER_BOOKING)
+            else:
+                normalized[key] = normalize(item, ids)
+        return normalized
+    if isinstance(value, list):
+        items = [normalize(item, ids) for item in value]
+        if value and all(isinstance(item, dict) and list(item) == ["bookingid"] for item in value):
+            # A GET /booking listing
+            return sorted((item for item in items if item["bookingid"] is not OTHER_BOOKING),
+                          key=lambda item: item["bookingid"])
+        return items
+    return value
+
+
+def first_difference(ours, theirs, path="$"):
+    """Where two decoded bodies first differ, e.g. `$.bookingdates.checkin: "2024-01-01" != "2024-01-02"`."""
+    if isinstance(ours, dict) and isinstance(theirs, dict):
+        for key in sorted(set(ours) | set(theirs)):
+            if key not in ours or key not in theirs:
+                return f"{path}.{key}: only in {'ours' if key in ours else 'theirs'}"
+            if ours[key] != theirs[key]:
+                return first_difference(ours[key], theirs[key], f"{path}.{key}")
+    if isinstance(ours, list) and isinstance(theirs, list) and len(ours) == len(theirs):
+        for index, (item, other) in enumerate(zip(ours, theirs)):
+            if item != other:
+                return first_difference(item, other, f"{path}[{index}]")
+    if isinstance(ours, list) and isinstance(theirs, list):
+        return f"{path}: {len(ours)} != {len(theirs)} items"
+    return f"{path}: {_excerpt(ours, EXCERPT)} != {_excerpt(theirs, EXCERPT)}"
+
+
+class Mirror:
+    """One target requests are mirrored to, with its pairing of booking ids and tokens."""
+
+    def __init__(self, name, client):
+        self.name = name
+        self.client = client
+        self._lock = threading.Lock()
+        self.ids = {}  # run's booking id -> this target's
+        self.tokens = {}  # run's token -> this target's
+        self._mirror_keys = {}  # this target's booking id -> the run's
+
+    def translate(self, path, headers):
+        """The mirror's path and headers for a request: its booking ids and tokens swapped in."""
+        path = _ID_SEGMENT.sub(lambda m: f"{m.group(1)}{self.ids.get(int(m.group(2)), m.group(2))}", path)
+        translated = {}
+        for name, value in headers.items():
+            if name.lower() in _SKIPPED_HEADERS:
+                continue
+            if name.lower() == "cookie":
+                value = _TOKEN_COOKIE.sub(lambda m: m.group(1) + self.tokens.get(m.group(2), m.group(2)), value)
+            translated[name] = value
+        return path, translated
+
+    def send(self, method, path, headers, body):
+        path, headers = self.translate(path, headers)
+        return self.client.request(method, path, headers=headers, data=body, allow_redirects=False)
+
+    def pair(self, method, path, own, mirrored):
+        """Learn the booking id or token a POST /booking or /auth answered on both sides."""
+        if method != "POST" or not (isinstance(own, dict) and isinstance(mirrored, dict)):
+            return
+        path = path.split("?", 1)[0]
+        with self._lock:
+            if path == "/booking":
+                own_id, mirror_id = own.get("bookingid"), mirrored.get("bookingid")
+                if isinstance(own_id, int) and isinstance(mirror_id, int):
+                    self.ids[own_id] = mirror_id
+                    self._mirror_keys[mirror_id] = own_id
+            elif path == "/auth" and own.get("token") and mirrored.get("token"):
+                self.tokens[own["token"]] = mirrored["token"]
+
+    def keys(self):
+        """`normalize` maps of (the run's, this target's) booking ids: both compare as the run's id."""
+        with self._lock:
+            return {own_id: own_id for own_id in self.ids}, dict(self._mirror_keys)
+
+
+class Differ:
+    """Send each request to every `Mirror` and record where their answers diverge."""
+
+    def __init__(self, mirrors, threads=MIRROR_THREADS):
+        self.mirrors = mirrors
+        self._pool = ThreadPoolExecutor(threads * len(mirrors), thread_name_prefix="mirror")
+        self._lock = threading.Lock()
+        self.compared = Counter()
+        self.divergences = []
+
+    def submit(self, method, path, headers, body):
+        """Start a request on every mirror; hand the result to `compare`."""
+        return [
+            # The copied context keeps the test id, so replayed answers come from its own cassette
+            (mirror, self._pool.submit(contextvars.copy_context().run, self._answer, mirror,
+                                       method, path, dict(headers), body))
+            for mirror in self.mirrors
+        ]
+
+    @staticmethod
+    def _answer(mirror, method, path, headers, body):
+        try:
+            response = mirror.send(method, path, headers, body)
+        except requests.RequestException as e:
+            return None, f"{type(e).__name__}: {e}"
+        return (response.status_code, response.headers.get("Content-Type", ""), response.content), None
+
+    def compare(self, method, path, answer, pending):
+        """Wait for the mirrors of one request and diff each answer with the run's own."""
+        for mirror, future in pending:
+            self._diff(mirror, method, path, answer, *future.result())
+
+    async def acompare(self, method, path, answer, pending):
+        for mirror, future in pending:
+            self._diff(mirror, method, path, answer, *await asyncio.wrap_future(future))
+
+    def _diff(self, mirror, method, path, answer, mirrored, error):
+        status, content_type, body = answer
+        own = _decode(body)
+        entry = {"test": current_test(), "target": mirror.name, "method": method,
+                 "endpoint": endpoint_template(path), "path": path}
+        if mirrored is None:
+            fields = ["error"]
+            entry["mirror"] = {"error": error}
+            entry["difference"] = error
+        else:
+            mirror_status, mirror_type, mirror_body = mirrored
+            other = _decode(mirror_body)
+            mirror.pair(method, path, own, other)
+            own_keys, mirror_keys = mirror.keys()
+            own, other = normalize(own, own_keys), normalize(other, mirror_keys)
+            differences = [(name, ours, theirs) for name, ours, theirs in (
+                ("status", status, mirror_status),
+                ("content type", _media_type(content_type), _media_type(mirror_type)),
+                ("body", own, other),
+            ) if ours != theirs]
+            fields = [name for name, _, _ in differences]
+            if differences:
+                name, ours, theirs = differences[0]
+                entry["difference"] = (first_difference(ours, theirs) if name == "body"
+                                       else f"{name}: {ours} != {theirs}")
+            entry["mirror"] = {"status": mirror_status, "content_type": mirror_type, "body": _excerpt(other)}
+        entry["fields"] = fields
+        entry["own"] = {"status": status, "content_type": content_type, "body": _excerpt(own)}
+        with self._lock:
+            self.compared[mirror.name] += 1
+            if fields:
+                self.divergences.append(entry)
+
+    def close(self):
+        self._pool.shutdown()
+        for mirror in self.mirrors:
+            mirror.client.close()
+
+
+def _excerpt(body, limit=BODY_LIMIT):
+    text = json.dumps(body, sort_keys=True)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class DiffAdapter(BaseAdapter):
+    """requests adapter sending through `adapter` while `differ` mirrors the request."""
+
+    def __init__(self, adapter, differ):
+        super().__init__()
+        self.adapter = adapter
+        self.differ = differ
+
+    def send(self, request, **kwargs):
+        pending = self.differ.submit(request.method, request.path_url, request.headers, request.body)
+        response = self.adapter.send(request, **kwargs)
+        # Read here, so a streamed response is compared too; iter_content then replays it
+        answer = (response.status_code, response.headers.get("Content-Type", ""), response.content)
+        self.differ.compare(request.method, request.path_url, answer, pending)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class DiffTransport(httpx.AsyncBaseTransport):
+    """httpx transport twin of `DiffAdapter` for the async clients."""
+
+    def __init__(self, differ, transport):
+        self.differ = differ
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        path = request.url.raw_path.decode("ascii")
+        pending = self.differ.submit(request.method, path, request.headers, request.content)
+        response = await self.transport.handle_async_request(request)
+        await response.aread()
+        answer = (response.status_code, response.headers.get("Content-Type", ""), response.content)
+        await self.differ.acompare(request.method, path, answer, pending)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+# ---------------------- PYTEST PLUGIN ----------------------
+
+class DiffPlugin:
+    """Summarise the session's divergences; xdist workers ship theirs to the controller."""
+
+    def __init__(self, config, targets):
+        self.config = config
+        self.targets = targets
+        self.differ = None
+        self._workers = []
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        result = getattr(node, "workeroutput", {}).get("differential")
+        if result:
+            self._workers.append(result)
+
+    def results(self):
+        """(responses compared per target, divergences) of the whole run."""
+        results = list(self._workers)
+        if self.differ is not None:
+            results.append({"compared": dict(self.differ.compared), "divergences": self.differ.divergences})
+        compared = Counter()
+        divergences = []
+        for result in results:
+            compared.update(result["compared"])
+            divergences.extend(result["divergences"])
+        return compared, divergences
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput"):
+            if self.differ is not None:
+                self.config.workeroutput["differential"] = {
+                    "compared": dict(self.differ.compared), "divergences": self.differ.divergences}
+            return
+        path = self.config.getoption("--diff-report")
+        if path:
+            compared, divergences = self.results()
+            with open(path, "w") as fh:
+                json.dump({"compared": compared, "divergences": divergences}, fh, indent=1)
+
+    def summary_lines(self):
+        compared, divergences = self.results()
+        if not compared:
+            return []
+        lines = [f"{target}: {count} responses compared, "
+                 f"{sum(d['target'] == target for d in divergences)} diverged"
+                 for target, count in sorted(compared.items())]
+        groups = {}
+        for divergence in divergences:
+            key = (divergence["target"], divergence["method"], divergence["endpoint"], ", ".join(divergence["fields"]))
+            groups.setdefault(key, []).append(divergence)
+        for (target, method, endpoint, fields), group in sorted(groups.items()):
+            lines.append(f"  {target} {method} {endpoint}: {fields} differ ({len(group)}x)")
+            for divergence in group[:EXAMPLES]:
+                lines.append(f"    {divergence['test'] or '<session>'}: {divergence['difference']}")
+        return lines
+
+    def pytest_terminal_summary(self, terminalreporter):
+        lines = self.summary_lines()
+        if lines:
+            terminalreporter.write_sep("-", "differential")
+            for line in lines:
+                terminalreporter.write_line(line)
@@ -0,0 +1,317 @@
+"""Structured per-exchange log, written alongside the free-text logs/test.log.
+
+Two sinks, picked by file extension, both fed by `MetricsRecorder` listeners:
+
+- `.jsonl`: one JSON object per HTTP exchange, flushed as it happens;
+- `.colz`: a compressed columnar archive for long soak runs. Columns are kept
+  in memory as `array`s (strings dictionary-encoded to small int codes) for
+  `row_group` exchanges at a time, then appended to the file as one
+  length-prefixed, deflated row group with its own dictionaries. Memory stays
+  bounded however long the run, and a crash loses at most the group being
+  built; a torn final group is skipped when the archive is read.
+
+The query side loads either format into columns and answers the usual
+after-run questions without touching the text log:
+
+    python -m utils.exchange_log logs/exchanges.colz --slowest 20
+    python -m utils.exchange_log logs/exchanges.jsonl --status-by-endpoint
+"""
+import argparse
+import heapq
+import json
+import os
+import struct
+import sys
+import threading
+import zipfile
+import zlib
+from array import array
+from collections import Counter
+
+# Column name -> array typecode; "s" marks a dictionary-encoded string column
+COLUMNS = {
+    "test": "s",
+    "method": "s",
+    "endpoint": "s",
+    "params": "s",
+    "status": "H",
+    "latency_ms": "d",
+    "ttfb_ms": "d",
+    "bytes": "Q",
+    "body_hash": "s",
+}
+ROW_GROUP = 10000
+MAGIC = b"COLZ2\n"
+# Compressed length, then that many bytes: a header length, the JSON header, the column bytes
+_FRAME = struct.Struct("<I")
+
+
+def exchange(record):
+    """The structured fields of one `RequestRecord`."""
+    return {
+        "test": record.test,
+        "method": record.method,
+        "endpoint": record.endpoint,
+        "params": record.params,
+        "status": record.status,
+        "latency_ms": round(record.total * 1000, 3),
+        "ttfb_ms": round(record.ttfb * 1000, 3),
+        "bytes": record.bytes,
+        "body_hash": record.body_hash,
+    }
+
+
+def _ensure_dir(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+class JsonLinesSink:
+    """Append one JSON object per exchange to `path`."""
+
+    def __init__(self, path):
+        _ensure_dir(path)
+        self._lock = threading.Lock()
+        self._fh = open(path, "w", buffering=1)
+
+    def __call__(self, record):
+        line = json.dumps(exchange(record), separators=(",", ":"))
+        with self._lock:
+            self._fh.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+
+
+class ColumnBuilder:
+    """Typed column arrays, with string values replaced by dictionary codes."""
+
+    def __init__(self):
+        self.columns = {name: array("I" if kind == "s" else kind) for name, kind in COLUMNS.items()}
+        self.codes = {name: {} for name, kind in COLUMNS.items() if kind == "s"}
+
+    def append(self, row):
+        for name, value in row.items():
+            codes = self.codes.get(name)
+            if codes is not None:
+                value = codes.setdefault(value, len(codes))
+            self.columns[name].append(value)
+
+    def exchanges(self):
+        return Exchanges(self.columns, {name: list(codes) for name, codes in self.codes.items()})
+
+
+def encode_row_group(builder):
+    """One deflated row group: JSON header (row count, byte sizes, dictionaries), then the columns."""
+    columns = builder.columns
+    header = json.dumps({
+        "rows": len(columns["status"]),
+        "byteorder": sys.byteorder,
+        "columns": COLUMNS,
+        "sizes": {name: len(column) * column.itemsize for name, column in columns.items()},
+        "dictionaries": {name: list(codes) for name, codes in builder.codes.items()},
+    }).encode()
+    payload = b"".join([_FRAME.pack(len(header)), header] + [column.tobytes() for column in columns.values()])
+    data = zlib.compress(payload)
+    return _FRAME.pack(len(data)) + data
+
+
+class ColumnarSink:
+    """Accumulate exchanges column-wise and append them to a `.colz` archive every `row_group` rows."""
+
+    def __init__(self, path, row_group=ROW_GROUP):
+        _ensure_dir(path)
+        self.path = path
+        self.row_group = row_group
+        self._lock = threading.Lock()
+        self._builder = ColumnBuilder()
+        self._fh = open(path, "wb")
+        self._fh.write(MAGIC)
+        self._fh.flush()
+
+    def __call__(self, record):
+        row = exchange(record)
+        with self._lock:
+            if self._fh.closed:
+                return
+            self._builder.append(row)
+            if len(self._builder.columns["status"]) >= self.row_group:
+                self._flush()
+
+    def _flush(self):
+        if len(self._builder.columns["status"]):
+            self._fh.write(encode_row_group(self._builder))
+            self._fh.flush()
+            self._builder = ColumnBuilder()
+
+    def close(self):
+        with self._lock:
+            if self._fh.closed:
+                return
+            self._flush()
+            self._fh.close()
+
+
+def open_sink(path):
+    """JSON lines for `.jsonl`, the columnar archive for `.colz`."""
+    if path.endswith(".colz"):
+        return ColumnarSink(path)
+    if path.endswith(".jsonl"):
+        return JsonLinesSink(path)
+    raise ValueError(f"Exchange log must end in .jsonl or .colz: {path!r}")
+
+
+# ---------------------- QUERYING ----------------------
+
+class Exchanges:
+    """Column-oriented view of a saved exchange log.
+
+    Numeric columns are `array`s; string columns are a code array plus its
+    dictionary, decoded only for the rows a query actually returns.
+    """
+
+    def __init__(self, columns, dictionaries):
+        self.columns = columns
+        self.dictionaries = dictionaries
+
+    def __len__(self):
+        return len(self.columns["status"])
+
+    def value(self, name, row):
+        value = self.columns[name][row]
+        dictionary = self.dictionaries.get(name)
+        return dictionary[value] if dictionary is not None else value
+
+    def row(self, index):
+        return {name: self.value(name, index) for name in self.columns}
+
+    def slowest(self, n=20):
+        latency = self.columns["latency_ms"]
+        rows = heapq.nlargest(n, range(len(self)), key=latency.__getitem__)
+        return [self.row(index) for index in rows]
+
+    def status_by_endpoint(self):
+        """{'GET /booking/{id}': {200: 12, 404: 3}, ...}"""
+        counts = Counter(zip(self.columns["method"], self.columns["endpoint"], self.columns["status"]))
+        report = {}
+        for (method, endpoint, status), count in sorted(counts.items()):
+            key = f"{self.dictionaries['method'][method]} {self.dictionaries['endpoint'][endpoint]}"
+            report.setdefault(key, {})[status] = count
+        return dict(sorted(report.items()))
+
+
+def _row_groups(path):
+    """Decoded (header, payload, offset) per complete row group; a torn tail ends the archive."""
+    with open(path, "rb") as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a columnar exchange log: {path!r}")
+        while len(size := fh.read(_FRAME.size)) == _FRAME.size:
+            data = fh.read(_FRAME.unpack(size)[0])
+            try:
+                payload = zlib.decompress(data)
+            except zlib.error:
+                return  # cut short by a crash mid-write
+            header_size = _FRAME.unpack_from(payload)[0]
+            header = json.loads(payload[_FRAME.size:_FRAME.size + header_size])
+            yield header, payload, _FRAME.size + header_size
+
+
+def _load_columnar(path):
+    if zipfile.is_zipfile(path):
+        return _load_zip(path)
+    columns = {name: array("I" if kind == "s" else kind) for name, kind in COLUMNS.items()}
+    codes = {name: {} for name, kind in COLUMNS.items() if kind == "s"}
+    for header, payload, offset in _row_groups(path):
+        for name, kind in header["columns"].items():
+            column = array("I" if kind == "s" else kind)
+            column.frombytes(payload[offset:offset + header["sizes"][name]])
+            offset += header["sizes"][name]
+            if header["byteorder"] != sys.byteorder:
+                column.byteswap()
+            if kind == "s":
+                # Each group has its own dictionary; map its codes onto the merged one
+                merged = codes[name]
+                remap = [merged.setdefault(value, len(merged)) for value in header["dictionaries"][name]]
+                column = array("I", map(remap.__getitem__, column))
+            columns[name].extend(column)
+    return Exchanges(columns, {name: list(merged) for name, merged in codes.items()})
+
+
+def _load_zip(path):
+    """Archives written before row groups: one zip member per column."""
+    with zipfile.ZipFile(path) as archive:
+        schema = json.loads(archive.read("schema.json"))
+        columns, dictionaries = {}, {}
+        for name, kind in schema["columns"].items():
+            column = array("I" if kind == "s" else kind)
+            column.frombytes(archive.read(f"{name}.bin"))
+            if schema["byteorder"] != sys.byteorder:
+                column.byteswap()
+            columns[name] = column
+            if kind == "s":
+                dictionaries[name] = json.loads(archive.read(f"{name}.dict.json"))
+    return Exchanges(columns, dictionaries)
+
+
+def _load_jsonl(path):
+    builder = ColumnBuilder()
+    with open(path) as fh:
+        for line in fh:
+            builder.append(json.loads(line))
+    return builder.exchanges()
+
+
+def load(path):
+    """Load a `.jsonl` or `.colz` exchange log into an `Exchanges` view."""
+    return _load_columnar(path) if path.endswith(".colz") else _load_jsonl(path)
+
+
+def format_slowest(rows):
+    lines = [f"{'latency ms':>11}  {'status':>6}  call"]
+    for row in rows:
+        query = f"?{row['params']}" if row["params"] else ""
+        lines.append(f"{row['latency_ms']:>11.2f}  {row['status']:>6}  "
+                     f"{row['method']} {row['endpoint']}{query}  [{row['test'] or '-'}]")
+    return "\n".join(lines)
+
+
+def format_status(report):
+    lines = []
+    for endpoint, statuses in report.items():
+        total = sum(statuses.values())
+        parts = "  ".join(f"{status}: {count} ({count / total:.0%})" for status, count in statuses.items())
+        lines.append(f"{endpoint:<24}{total:>7}  {parts}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query a structured exchange log (.jsonl or .colz)")
+    parser.add_argument("path")
+    parser.add_argument("--slowest", type=int, metavar="N", help="Show the N slowest calls")
+    parser.add_argument("--status-by-endpoint", action="store_true", help="Status code counts per endpoint")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    exchanges = load(args.path)
+    results = {}
+    if args.slowest:
+        results["slowest"] = exchanges.slowest(args.slowest)
+    if args.status_by_endpoint or not args.slowest:
+        results["status_by_endpoint"] = exchanges.status_by_endpoint()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{len(exchanges)} exchanges in {args.path}")
+        if "slowest" in results:
+            print(format_slowest(results["slowest"]))
+        if "status_by_endpoint" in results:
+            print(format_status(results["status_by_endpoint"]))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Randomized fuzzing of the booking endpoints, with shrinking and a failure DB.
+
+Payloads are drawn from `BOOKING_SCHEMA`: each field gets a value of its own
+type most of the time and an "interesting" one (wrong type, empty, huge,
+impossible date, ...) otherwise, and fields are sometimes left out. Three
+targets are fuzzed:
+
+- booking: POST /booking with a generated booking;
+- patch: PATCH /booking/{id} with a random subset of fields;
+- query: GET /booking with random firstname/lastname/checkin/checkout params.
+
+A response breaks the contract when the server errors (5xx, transport error)
+or a 2xx body does not have the documented shape. Each new failure signature
+is shrunk to a minimal payload (drop keys, shorten strings, zero numbers) and
+stored in the failure DB; later runs replay the stored cases first, report
+which ones are fixed and drop those from the DB. Every PATCH case, including
+each shrink attempt and replay, gets a freshly created booking of its own, so
+whether it fails never depends on what earlier cases left behind.
+
+Cases go out in batches over one pooled async client, paced to `--rate`
+requests per second (0 = as fast as `--concurrency` allows). By default an
+in-process stand-in server is started, as for `utils.load`.
+
+    python -m utils.fuzz --cases 20000
+    python -m utils.fuzz --target query --rate 200 --seed 7 --base-url http://127.0.0.1:3001
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import string
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from utils.async_client import DEFAULT_CONCURRENCY, AsyncApiClient, gather_bounded
+from utils.booking_server import BookingServer
+from utils.mutations import BOOKING_SCHEMA, set_path, valid_booking
+from utils.schemas import validator
+
+DEFAULT_DB = os.path.join(".fuzz", "failures.json")
+TARGETS = ("booking", "patch", "query")
+INTERESTING = (
+    None, True, False, 0, -1, 2 ** 53, 1.5, "", " ", "null", "0NaN", "☃", "a" * 2048,
+    [], {}, "2024-02-30", "2024-13-01", "01/02/2024", "not-a-date",
+)
+SHRINK_STEPS = 200
+
+
+def random_value(rng, field_type):
+    if rng.random() < 0.3:
+        return rng.choice(INTERESTING)
+    if field_type == "integer":
+        return rng.randint(0, 10000)
+    if field_type == "boolean":
+        return rng.random() < 0.5
+    if field_type == "date":
+        return (date(2000, 1, 1) + timedelta(days=rng.randint(0, 15000))).isoformat()
+    return "".join(rng.choices(string.ascii_letters, k=rng.randint(1, 12)))
+
+
+def random_fields(rng, fields, keep=0.9):
+    payload = {}
+    for field in fields:
+        if rng.random() < keep:
+            set_path(payload, field, random_value(rng, BOOKING_SCHEMA[field][0]))
+    return payload
+
+
+# ---------------------- TARGETS ----------------------
+
+def _json_or_none(response):
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+async def outcome(client, target, payload):
+    """Failure signature of sending `payload` to `target`, or None when it passes."""
+    try:
+        return target.check(await target.send(client, payload))
+    except FuzzSetupError:
+        raise
+    except Exception as e:
+        return f"transport error: {type(e).__name__}"
+
+
+def _violation(response, schema):
+    """Failure signature of a response, or None when it honours the contract."""
+    if response.status_code >= 500:
+        return f"{response.status_code} {response.reason_phrase}"
+    if response.status_code < 300 and validator(schema)(_json_or_none(response)):
+        return f"{response.status_code} with a body not matching '{schema}'"
+    return None
+
+
+class BookingTarget:
+    name = "booking"
+
+    def generate(self, rng):
+        return random_fields(rng, BOOKING_SCHEMA)
+
+    async def send(self, client, payload):
+        return await client.create_booking(payload)
+
+    def check(self, response):
+        return _violation(response, "create_response")
+
+
+class FuzzSetupError(RuntimeError):
+    """A target could not prepare a case (e.g. create the booking to patch); aborts the run."""
+
+
+class PatchTarget:
+    name = "patch"
+
+    def __init__(self, headers):
+        self.headers = headers
+
+    def generate(self, rng):
+        fields = rng.sample(list(BOOKING_SCHEMA), rng.randint(1, 3))
+        return random_fields(rng, fields, keep=1.0)
+
+    async def send(self, client, payload):
+        """PATCH a booking created for this case alone, deleting it afterwards."""
+        created = await client.create_booking(valid_booking())
+        if created.status_code != 200:
+            raise FuzzSetupError(f"Creating a booking to patch failed ({created.status_code})")
+        booking_id = created.json()["bookingid"]
+        try:
+            return await client.patch_booking(booking_id, payload, headers=self.headers)
+        finally:
+            await client.delete_booking(booking_id, headers=self.headers)
+
+    def check(self, response):
+        return _violation(response, "booking")
+
+
+class QueryTarget:
+    name = "query"
+    FIELDS = ("firstname", "lastname", "bookingdates.checkin", "bookingdates.checkout")
+
+    def generate(self, rng):
+        params = {}
+        for field in self.FIELDS:
+            if rng.random() < 0.5:
+                value = random_value(rng, BOOKING_SCHEMA[field][0])
+                params[field.rsplit(".", 1)[-1]] = "" if value is None else str(value)
+        return params
+
+    async def send(self, client, payload):
+        return await client.get_bookings(payload)
+
+    def check(self, response):
+        return _violation(response, "booking_list")
+
+
+# ---------------------- SHRINKING ----------------------
+
+def _simpler(value):
+    """Candidate replacements for one value, simplest first."""
+    if isinstance(value, dict):
+        return [{}]
+    if isinstance(value, list):
+        return [[]] if value else []
+    if isinstance(value, str) and len(value) > 1:
+        return ["", value[:len(value) // 2]]
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value not in (0, 1):
+        return [0, 1]
+    return []
+
+
+def shrink_candidates(payload):
+    """Every payload one simplification step away from `payload`."""
+    for key in list(payload):
+        yield {k: v for k, v in payload.items() if k != key}
+    for key, value in payload.items():
+        for simpler in _simpler(value):
+            yield {**payload, key: simpler}
+        if isinstance(value, dict):
+            for nested in shrink_candidates(value):
+                yield {**payload, key: nested}
+
+
+async def shrink(client, target, payload, signature):
+    """Greedily simplify `payload` while it still fails with `signature`."""
+    steps = 0
+    improved = True
+    while improved and steps < SHRINK_STEPS:
+        improved = False
+        for candidate in shrink_candidates(payload):
+            steps += 1
+            if await outcome(client, target, candidate) == signature:
+                payload, improved = candidate, True
+                break
+            if steps >= SHRINK_STEPS:
+                break
+    return payload
+
+
+# ---------------------- FAILURE DB ----------------------
+
+class FailureDB:
+    """Minimal failing payloads per target, persisted as JSON."""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        try:
+            with open(path) as fh:
+                self.entries = json.load(fh)
+        except (OSError, ValueError):
+            self.entries = []
+
+    def cases(self, target):
+        return [entry for entry in self.entries if entry["target"] == target]
+
+    def add(self, target, signature, payload):
+        key = json.dumps(payload, sort_keys=True)
+        if any(e["target"] == target and json.dumps(e["payload"], sort_keys=True) == key for e in self.entries):
+            return False
+        self.entries.append({"target": target, "signature": signature, "payload": payload})
+        return True
+
+    def remove(self, entries):
+        self.entries = [entry for entry in self.entries if not any(entry is e for e in entries)]
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "w") as fh:
+            json.dump(self.entries, fh, indent=2)
+
+
+# ---------------------- RUNNER ----------------------
+
+async def fire(client, target, payloads, concurrency, rate=0.0):
+    """Send `payloads` concurrently, paced to `rate`/s; return failure signatures (None = ok)."""
+    start = time.perf_counter()
+
+    async def one(i, payload):
+        if rate:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return await outcome(client, target, payload)
+
+    results = await gather_bounded([one(i, p) for i, p in enumerate(payloads)], concurrency)
+    for result in results:
+        if isinstance(result, FuzzSetupError):
+            raise result
+    return results
+
+
+async def fuzz_target(client, target, db, rng, cases, batch, concurrency, rate):
+    """Replay stored failures (dropping fixed ones), then fuzz; return a report dict for the target."""
+    stored = db.cases(target.name)
+    replayed = await fire(client, target, [entry["payload"] for entry in stored], concurrency)
+    fixed = [entry for entry, result in zip(stored, replayed) if not result]
+    db.remove(fixed)
+    report = {
+        "replayed": len(stored),
+        "still_failing": len(stored) - len(fixed),
+        "fixed": fixed,
+        "sent": 0,
+        "failures": Counter(),
+        "new_minimal_cases": [],
+    }
+
+    shrunk = {entry["signature"] for entry, result in zip(stored, replayed) if result}
+    for offset in range(0, cases, batch):
+        payloads = [target.generate(rng) for _ in range(min(batch, cases - offset))]
+        results = await fire(client, target, payloads, concurrency, rate)
+        report["sent"] += len(payloads)
+        for payload, signature in zip(payloads, results):
+            if not signature:
+                continue
+            report["failures"][signature] += 1
+            if signature not in shrunk:
+                shrunk.add(signature)
+                minimal = await shrink(client, target, payload, signature)
+                if db.add(target.name, signature, minimal):
+                    report["new_minimal_cases"].append({"signature": signature, "payload": minimal})
+    return report
+
+
+async def run(base_url, targets, cases, batch, concurrency, rate, seed, db):
+    rng = random.Random(seed)
+    async with AsyncApiClient(base_url, pool_size=concurrency) as client:
+        token = (await client.auth({"username": "admin", "password": "password123"})).json()["token"]
+        available = {
+            "booking": BookingTarget(),
+            "patch": PatchTarget({"Cookie": f"token={token}"}),
+            "query": QueryTarget(),
+        }
+        reports = {}
+        for name in targets:
+            started = time.perf_counter()
+            reports[name] = await fuzz_target(client, available[name], db, rng, cases, batch, concurrency, rate)
+            reports[name]["cases_per_minute"] = reports[name]["sent"] / (time.perf_counter() - started) * 60
+    return reports
+
+
+def format_report(reports):
+    lines = []
+    for name, report in reports.items():
+        lines.append(f"[{name}] {report['sent']} cases at {report['cases_per_minute']:.0f}/min; "
+                     f"stored cases replayed: {report['replayed']}, still failing: {report['still_failing']}, "
+                     f"fixed and removed: {len(report['fixed'])}")
+        for entry in report["fixed"]:
+            lines.append(f"    fixed ({entry['signature']}): {json.dumps(entry['payload'])}")
+        for signature, count in report["failures"].most_common():
+            lines.append(f"    {count:>7}  {signature}")
+        for case in report["new_minimal_cases"]:
+            lines.append(f"    new minimal case ({case['signature']}): {json.dumps(case['payload'])}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuzz the booking endpoints")
+    parser.add_argument("--base-url", help="Target URL (default: start an in-process stand-in)")
+    parser.add_argument("--target", choices=TARGETS + ("all",), default="all")
+    parser.add_argument("--cases", type=int, default=2000, help="Generated cases per target")
+    parser.add_argument("--batch", type=int, default=500, help="Cases generated and sent per batch")
+    # The in-process stand-in shares the GIL with the client; more in-flight requests only add contention
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Max in-flight requests")
+    parser.add_argument("--rate", type=float, default=0.0, help="Max requests per second (0 = unpaced)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed, for reproducible runs")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Failure database (default {DEFAULT_DB})")
+    args = parser.parse_args(argv)
+
+    targets = TARGETS if args.target == "all" else (args.target,)
+    db = FailureDB(args.db)
+    server = None if args.base_url else BookingServer().start()
+    try:
+        reports = asyncio.run(run(args.base_url or server.url, targets, args.cases, args.batch,
+                                  args.concurrency, args.rate, args.seed, db))
+    finally:
+        if server is not None:
+            server.stop()
+    db.save()
+    print(format_report(reports))
+    return reports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Change-aware test selection from recorded request traffic.
+
+Every run folds its `RequestRecord`s into an impact index kept in the pytest
+cache: the "METHOD /endpoint" pairs each test calls itself, and the ones each
+network fixture calls while it is set up or torn down (a pooled booking's
+POST, the factory's DELETEs, the token's /auth), which every test using that
+fixture inherits. Entries only ever grow, so a session fixture's traffic
+counts for all its users whichever test happened to set it up. A test that
+made no call-phase requests gets no entry, and housekeeping requests (the
+cached token's validity probe) are never recorded.
+
+`--changed-endpoints "PATCH /booking/{id},* /auth"` (fnmatch patterns) or
+`--changed-since <git rev>` then keeps only the tests whose own or fixture
+endpoints match. A diff is mapped to endpoints through the stand-in's handler
+methods and the client's helper methods; changed test modules are selected
+whole, and a change to anything else (conftest.py, shared helpers, a
+module-level constant) selects everything. Tests missing from the index are
+always kept.
+"""
+import ast
+import os
+import re
+import subprocess
+from fnmatch import fnmatchcase
+
+import pytest
+
+CACHE_KEY = "booking-qa/impact-index"
+SERVER_MODULE = "utils/booking_server.py"
+CLIENT_MODULES = ("utils/api_client.py", "utils/async_client.py")
+
+# Functions whose change affects exactly these endpoints
+FUNCTION_ENDPOINTS = {
+    SERVER_MODULE: {
+        "_create_token": ["POST /auth"],
+        "list_filters": ["GET /booking"],
+        "render_listing": ["GET /booking"],
+        "_list_bookings": ["GET /booking"],
+        "_get_booking": ["GET /booking/{id}"],
+        "_create_booking": ["POST /booking"],
+        "_update_booking": ["PUT /booking/{id}"],
+        "_patch_booking": ["PATCH /booking/{id}"],
+        "_delete_booking": ["DELETE /booking/{id}"],
+        "_server_stats": [],  # no test calls GET /__stats
+        "do_GET": ["GET *"],
+        "do_POST": ["POST *"],
+        "do_PUT": ["PUT *"],
+        "do_PATCH": ["PATCH *"],
+        "do_DELETE": ["DELETE *"],
+    },
+    "client": {
+        "auth": ["POST /auth"],
+        "create_booking": ["POST /booking"],
+        "get_bookings": ["GET /booking"],
+        "get_booking": ["GET /booking/{id}"],
+        "update_booking": ["PUT /booking/{id}"],
+        "patch_booking": ["PATCH /booking/{id}"],
+        "delete_booking": ["DELETE /booking/{id}"],
+        "get": ["GET *"],
+        "post": ["POST *"],
+        "put": ["PUT *"],
+        "patch": ["PATCH *"],
+        "delete": ["DELETE *"],
+    },
+}
+EVERYTHING = ["*"]
+# Fixtures that make requests while a test is set up or torn down
+NETWORK_FIXTURES = ("auth_token", "token_provider", "headers_with_token", "booking_factory",
+                    "created_booking")
+
+_HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@", re.MULTILINE)
+
+
+# ---------------------- INDEX ----------------------
+
+def build_index(records, fixtures_by_test, fixture_endpoints):
+    """Index one run.
+
+    `records` contributes each test's call-phase traffic, `fixtures_by_test`
+    maps node id -> the network fixtures it uses, and `fixture_endpoints` maps
+    fixture name -> the endpoints seen while it was set up or torn down.
+    """
+    # Tests without call-phase traffic stay out, so they are always selected
+    tests = {}
+    for record in records:
+        if record.test and record.phase == "call":
+            tests.setdefault(record.test, set()).add(f"{record.method} {record.endpoint}")
+    return {
+        "tests": {nodeid: sorted(endpoints) for nodeid, endpoints in tests.items()},
+        "fixtures": {name: sorted(endpoints) for name, endpoints in fixture_endpoints.items()},
+        "uses": {nodeid: sorted(names) for nodeid, names in fixtures_by_test.items()},
+    }
+
+
+def merge_index(old, new):
+    """Union of two indexes (and of any number of worker partials)."""
+    merged = {}
+    for section in ("tests", "fixtures", "uses"):
+        combined = {key: set(values) for key, values in old.get(section, {}).items()}
+        for key, values in new.get(section, {}).items():
+            combined.setdefault(key, set()).update(values)
+        # Also drops the empty test entries older indexes stored
+        merged[section] = {key: sorted(values) for key, values in combined.items() if values}
+    return merged
+
+
+def affected(index, nodeid, patterns):
+    """True when `nodeid` or one of its fixtures calls an endpoint matching `patterns`."""
+    if nodeid not in index.get("tests", {}):
+        return True
+    endpoints = list(index["tests"][nodeid])
+    for name in index.get("uses", {}).get(nodeid, ()):
+        endpoints.extend(index.get("fixtures", {}).get(name, ()))
+    return any(fnmatchcase(endpoint, pattern) for endpoint in endpoints for pattern in patterns)
+
+
+# ---------------------- DIFF -> ENDPOINTS ----------------------
+
+def _changed_lines(rev, path, cwd):
+    diff = subprocess.run(["git", "diff", "-U0", rev, "--", path], capture_output=True, text=True,
+                          check=True, cwd=cwd).stdout
+    lines = set()
+    for start, count in _HUNK.findall(diff):
+        start, count = int(start), int(count or 1)
+        # A pure deletion (count 0) still touches the line it sat before
+        lines.update(range(start, start + max(count, 1)))
+    return lines
+
+
+def _functions_at(source, lines):
+    """Innermost function names covering `lines`; None for lines outside any function."""
+    spans = [(node.lineno, node.end_lineno, node.name) for node in ast.walk(ast.parse(source))
+             if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+    names = set()
+    for line in lines:
+        covering = [span for span in spans if span[0] <= line <= span[1]]
+        names.add(min(covering, key=lambda span: span[1] - span[0])[2] if covering else None)
+    return names
+
+
+def endpoints_for_diff(rev, cwd="."):
+    """(endpoint patterns, changed test files) for the working tree against `rev`."""
+    files = subprocess.run(["git", "diff", "--name-only", rev], capture_output=True, text=True,
+                           check=True, cwd=cwd).stdout.split()
+    patterns, test_files = set(), set()
+    for path in files:
+        if path.startswith("tests/") and path.endswith(".py") and not path.endswith("conftest.py"):
+            test_files.add(path)
+            continue
+        table = FUNCTION_ENDPOINTS[SERVER_MODULE] if path == SERVER_MODULE else (
+            FUNCTION_ENDPOINTS["client"] if path in CLIENT_MODULES else None)
+        if table is None:
+            if path.endswith(".py") or path in ("requirements.txt", "pytest.ini"):
+                return set(EVERYTHING), test_files
+            continue
+        if not os.path.exists(os.path.join(cwd, path)):
+            # Deleted in the diff: no functions left to map
+            return set(EVERYTHING), test_files
+        with open(os.path.join(cwd, path)) as fh:
+            source = fh.read()
+        for name in _functions_at(source, _changed_lines(rev, path, cwd)):
+            patterns.update(table.get(name, EVERYTHING))
+    return patterns, test_files
+
+
+# ---------------------- PLUGIN ----------------------
+
+class ImpactSelector:
+    def __init__(self, config, recorder, patterns=None, test_files=()):
+        self.config = config
+        self.recorder = recorder
+        self.patterns = patterns
+        self.test_files = set(test_files)
+        self.index = config.cache.get(CACHE_KEY, {})
+        self._partials = []
+        self._fixtures = {}
+        self._claimed = set()
+        self._teardown_start = 0
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        if self.patterns is None:
+            return
+        selected, deselected = [], []
+        for item in items:
+            keep = item.nodeid.split("::", 1)[0] in self.test_files or affected(self.index, item.nodeid,
+                                                                                 self.patterns)
+            (selected if keep else deselected).append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_report_header(self, config):
+        if self.patterns is not None:
+            changed = ", ".join(sorted(self.patterns | self.test_files)) or "nothing"
+            return f"impact selection: changed {changed}"
+
+    # ---------------------- RECORDING ----------------------
+
+    def _claim(self, name, start):
+        """Attribute the not yet claimed records from `start` on to fixture `name`."""
+        records = self.recorder.records
+        for position in range(start, len(records)):
+            if position not in self._claimed:
+                self._claimed.add(position)
+                record = records[position]
+                self._fixtures.setdefault(name, set()).add(f"{record.method} {record.endpoint}")
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef, request):
+        start = len(self.recorder.records)
+        # Dependencies are set up inside this call and claim their own traffic first
+        yield
+        if fixturedef.argname in NETWORK_FIXTURES:
+            self._claim(fixturedef.argname, start)
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item, nextitem):
+        self._teardown_start = len(self.recorder.records)
+        yield
+
+    def pytest_fixture_post_finalizer(self, fixturedef, request):
+        # Dependents finalize before their dependencies, so everything since the
+        # previous finalizer belongs to this fixture
+        if fixturedef.argname in NETWORK_FIXTURES:
+            self._claim(fixturedef.argname, self._teardown_start)
+        self._teardown_start = len(self.recorder.records)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        partial = getattr(node, "workeroutput", {}).get("impact_index")
+        if partial:
+            self._partials.append(partial)
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput"):
+            # xdist worker: only it knows its items' fixtures; the controller merges
+            self.config.workeroutput["impact_index"] = self._run_index(session)
+            return
+        partials = self._partials or [self._run_index(session)]
+        if not any(partial["tests"] for partial in partials):
+            return
+        index = self.index
+        for partial in partials:
+            index = merge_index(index, partial)
+        self.config.cache.set(CACHE_KEY, index)
+
+    def _run_index(self, session):
+        fixtures_by_test = {item.nodeid: [name for name in getattr(item, "fixturenames", ())
+                                          if name in NETWORK_FIXTURES]
+                            for item in session.items}
+        return build_index(self.recorder.records, fixtures_by_test,
+                           {name: sorted(endpoints) for name, endpoints in self._fixtures.items()})
@@ -0,0 +1,317 @@
+"""Load and soak generator built on the suite's booking CRUD flows.
+
+Reuses the booking templates and request shapes of test_create_booking.py,
+test_get_bookings.py, test_update_booking.py and test_delete_booking.py, and
+drives them as a weighted mix of virtual users:
+
+- closed loop: `--users` threads each send their next request as soon as the
+  previous one returns (plus optional `--think-time`);
+- open loop: requests are started at a fixed `--rate` per second regardless of
+  how fast the server answers. Latency is measured from each request's
+  scheduled start, so a backed-up server is not hidden (coordinated omission).
+
+By default an in-process stand-in server is started (`--server-mode`
+threaded, asyncio or prefork); pass `--base-url` to aim at one started
+separately with `python -m utils.booking_server`. Either way the stand-in's
+own saturation counters (`GET /__stats`) are printed after the run, with a
+warning if the server rather than the flows set the pace.
+
+    python -m utils.load --users 20 --duration 30
+    python -m utils.load --users 64 --server-mode prefork --server-workers 4
+    python -m utils.load --loop open --rate 300 --duration 600 --interval 10 \
+        --exchange-log logs/soak.colz
+"""
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from utils.api_client import ApiClient
+from utils.async_booking_server import SERVER_MODES, make_server
+from utils.exchange_log import open_sink
+from utils.metrics import MetricsRecorder, percentile
+from utils.payloads import BOOKING_TEMPLATES, with_namespace
+from utils.token_provider import TokenBucket
+
+DEFAULT_MIX = "create=3,list=2,get=3,update=1,delete=1"
+# A worker this busy, or an event loop this late, means the server set the pace
+SATURATED_BUSY = 0.8
+SATURATED_LAG_MS = 10.0
+UPDATE_FIELDS = {"firstname": "James"}
+LIST_FILTERS = (
+    {},
+    {"firstname": "Jim"},
+    {"checkin": "2024-01-01", "checkout": "2024-01-05"},
+)
+
+
+def parse_mix(spec):
+    """'create=3,get=1' -> {'create': 3, 'get': 1}."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in BookingFlows.OPERATIONS:
+            raise ValueError(f"Unknown operation in mix: {name!r}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadStats:
+    """Thread-safe per-endpoint latency samples and error counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.started = time.perf_counter()
+
+    def record(self, endpoint, latency, ok):
+        with self._lock:
+            self.latencies.setdefault(endpoint, array("d")).append(latency)
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + (not ok)
+
+    def total(self):
+        with self._lock:
+            return sum(len(v) for v in self.latencies.values()), sum(self.errors.values())
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        report = {}
+        with self._lock:
+            items = [(endpoint, sorted(samples), self.errors[endpoint])
+                     for endpoint, samples in self.latencies.items()]
+        for endpoint, samples, errors in sorted(items):
+            report[endpoint] = {
+                "requests": len(samples),
+                "rps": len(samples) / elapsed,
+                "error_rate": errors / len(samples),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+            }
+        return report
+
+
+class BookingFlows:
+    """The suite's CRUD flows as single-request operations.
+
+    Each operation returns (endpoint template, ok). Bookings created here feed
+    the id pool that get/update/delete draw from; writes are authorized with
+    tokens drawn from a pre-minted `TokenBucket`.
+    """
+
+    OPERATIONS = ("create", "list", "get", "update", "delete")
+
+    def __init__(self, client, tokens, namespace):
+        self.client = client
+        self.tokens = tokens
+        self.namespace = namespace
+        self.templates = list(BOOKING_TEMPLATES.values())
+        self._ids = []
+        self._lock = threading.Lock()
+
+    def _pick_id(self, remove=False):
+        with self._lock:
+            if not self._ids:
+                return None
+            index = random.randrange(len(self._ids))
+            if not remove:
+                return self._ids[index]
+            self._ids[index], self._ids[-1] = self._ids[-1], self._ids[index]
+            return self._ids.pop()
+
+    def _headers(self):
+        return {"Content-Type": "application/json", "Cookie": f"token={self.tokens.take()}"}
+
+    def create(self):
+        payload = with_namespace(random.choice(self.templates), self.namespace)
+        response = self.client.create_booking(payload)
+        if response.status_code == 200:
+            with self._lock:
+                self._ids.append(response.json()["bookingid"])
+        return "POST /booking", response.status_code == 200
+
+    def list(self):
+        params = with_namespace(random.choice(LIST_FILTERS), self.namespace)
+        response = self.client.get_bookings(params)
+        return "GET /booking", response.status_code == 200
+
+    def get(self):
+        booking_id = self._pick_id()
+        if booking_id is None:
+            return self.create()
+        response = self.client.get_booking(booking_id, headers={"Accept": "application/json"})
+        # A concurrent delete may win the race; 404 is then the right answer
+        return "GET /booking/{id}", response.status_code in (200, 404)
+
+    def update(self):
+        booking_id = self._pick_id()
+        if booking_id is None:
+            return self.create()
+        payload = with_namespace({**random.choice(self.templates), **UPDATE_FIELDS}, self.namespace)
+        response = self.client.update_booking(booking_id, payload, headers=self._headers())
+        return "PUT /booking/{id}", response.status_code in (200, 405)
+
+    def delete(self):
+        booking_id = self._pick_id(remove=True)
+        if booking_id is None:
+            return self.create()
+        response = self.client.delete_booking(booking_id, headers=self._headers())
+        return "DELETE /booking/{id}", response.status_code == 201
+
+
+class LoadRunner:
+    def __init__(self, flows, mix, stats=None):
+        self.flows = flows
+        self.operations = [getattr(flows, name) for name in mix]
+        self.weights = list(mix.values())
+        self.stats = stats or LoadStats()
+
+    def _run_one(self, scheduled=None):
+        operation = random.choices(self.operations, self.weights)[0]
+        start = time.perf_counter() if scheduled is None else scheduled
+        try:
+            endpoint, ok = operation()
+        except Exception:
+            endpoint, ok = "transport error", False
+        self.stats.record(endpoint, time.perf_counter() - start, ok)
+
+    def closed_loop(self, users, duration, think_time=0.0):
+        deadline = time.perf_counter() + duration
+
+        def user():
+            while time.perf_counter() < deadline:
+                self._run_one()
+                if think_time:
+                    time.sleep(think_time)
+
+        threads = [threading.Thread(target=user, daemon=True) for _ in range(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def open_loop(self, rate, duration, max_workers):
+        interval = 1.0 / rate
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers) as pool:
+            for i in range(int(rate * duration)):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._run_one, scheduled)
+
+
+def format_report(report):
+    lines = [f"{'endpoint':<22}{'reqs':>8}{'rps':>9}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+    for endpoint, row in report.items():
+        lines.append(
+            f"{endpoint:<22}{row['requests']:>8}{row['rps']:>9.1f}{row['error_rate'] * 100:>7.2f}"
+            f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def server_stats(client, reset=False):
+    """The stand-in's GET /__stats report, or None if the target has none (the live API)."""
+    try:
+        response = client.session.get(client.url("/__stats"), params={"reset": "1"} if reset else None)
+    except requests.RequestException:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+def format_server_stats(stats):
+    totals = stats["totals"]
+    lag = totals["lag_p99_ms_max"]
+    line = (f"server: {stats['mode']}, {len(stats['workers'])} worker(s), {totals['rps']:.1f} req/s, "
+            f"busiest worker {totals['busy_max'] * 100:.0f}% busy")
+    if lag is not None:
+        line += f", loop lag p99 {lag:.2f} ms"
+    lines = [line]
+    if totals["busy_max"] >= SATURATED_BUSY or (lag or 0.0) >= SATURATED_LAG_MS:
+        lines.append("WARNING: the server was saturated; these numbers measure it, not the flows "
+                     "(try --server-mode prefork)")
+    return "\n".join(lines)
+
+
+def _progress(stats, interval, stop):
+    last_total, last_errors = 0, 0
+    while not stop.wait(interval):
+        total, errors = stats.total()
+        print(f"[load] {(total - last_total) / interval:8.1f} req/s  "
+              f"{errors - last_errors} errors in last {interval:g}s")
+        last_total, last_errors = total, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load/soak the booking CRUD flows")
+    parser.add_argument("--base-url", help="Target URL (default: start an in-process stand-in)")
+    parser.add_argument("--server-mode", choices=SERVER_MODES, default="threaded",
+                        help="How the in-process stand-in serves (prefork: one process per --server-workers)")
+    parser.add_argument("--server-workers", type=int, default=0,
+                        help="Processes for --server-mode prefork (default: one per CPU)")
+    parser.add_argument("--loop", choices=("closed", "open"), default="closed")
+    parser.add_argument("--users", type=int, default=10, help="Virtual users / max in-flight requests")
+    parser.add_argument("--rate", type=float, default=100.0, help="Open loop: requests started per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Closed loop: pause between requests")
+    parser.add_argument("--tokens", type=int, default=4, help="Pre-minted auth tokens shared by all users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted operations (default {DEFAULT_MIX})")
+    parser.add_argument("--interval", type=float, default=0.0, help="Print progress every N seconds")
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this file")
+    parser.add_argument("--exchange-log", help="Log every exchange here (.jsonl or .colz)")
+    args = parser.parse_args(argv)
+
+    recorder = sink = None
+    if args.exchange_log:
+        # Stream records straight to the sink; a soak run would not fit in a list
+        sink = open_sink(args.exchange_log)
+        recorder = MetricsRecorder(keep_records=False)
+        recorder.add_listener(sink)
+
+    # Started before any client thread: the pre-fork mode forks this process
+    server = None if args.base_url else make_server(args.server_mode, args.server_workers).start()
+    client = ApiClient(args.base_url or server.url, pool_size=args.users, recorder=recorder)
+    stats = None
+    try:
+        tokens = TokenBucket(client, args.tokens).fill()
+        flows = BookingFlows(client, tokens, namespace=f"load{secrets.token_hex(3)}")
+        runner = LoadRunner(flows, parse_mix(args.mix))
+
+        server_stats(client, reset=True)
+        stop = threading.Event()
+        if args.interval:
+            threading.Thread(target=_progress, args=(runner.stats, args.interval, stop), daemon=True).start()
+        if args.loop == "closed":
+            runner.closed_loop(args.users, args.duration, args.think_time)
+        else:
+            runner.open_loop(args.rate, args.duration, args.users)
+        stop.set()
+        stats = server_stats(client)
+    finally:
+        client.close()
+        if server is not None:
+            server.stop()
+        if sink is not None:
+            sink.close()
+
+    report = runner.stats.summary()
+    print(format_report(report))
+    if stats is not None:
+        print(format_server_stats(stats))
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump(report, fh, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
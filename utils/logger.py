@@ -1,26 +1,131 @@
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import random
 
-def get_logger(name=None):
+LOG_FORMAT = '[%(asctime)s] [%(levelname)s] %(name)s: %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Every knob can be overridden per run through the environment
+QUEUE_ENABLED = os.environ.get("QA_LOG_QUEUE", "0") == "1"
+CONSOLE_LEVEL = os.environ.get("QA_LOG_CONSOLE_LEVEL", "DEBUG")
+FILE_LEVEL = os.environ.get("QA_LOG_FILE_LEVEL", "DEBUG")
+MAX_MESSAGE_LENGTH = int(os.environ.get("QA_LOG_MAX_BODY", "2000"))
+DEBUG_SAMPLE_RATE = float(os.environ.get("QA_LOG_DEBUG_SAMPLE", "1.0"))
+MAX_FILE_BYTES = int(os.environ.get("QA_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+BACKUP_COUNT = int(os.environ.get("QA_LOG_BACKUPS", "5"))
+
+_listeners = []
+
+
+class LazyBody:
+    """Defer `response.text` until a handler actually formats the record."""
+
+    __slots__ = ("response",)
+
+    def __init__(self, response):
+        self.response = response
+
+    def __str__(self):
+        return self.response.text
+
+
+def body(response):
+    """Log argument for a response body: `logger.debug("Body: %s", body(response))`."""
+    return LazyBody(response)
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Clip long messages (usually response bodies) to `max_length` characters."""
+
+    def __init__(self, fmt=LOG_FORMAT, datefmt=DATE_FORMAT, max_length=MAX_MESSAGE_LENGTH):
+        super().__init__(fmt, datefmt)
+        self.max_length = max_length
+
+    def formatMessage(self, record):
+        if self.max_length and len(record.message) > self.max_length:
+            clipped = len(record.message) - self.max_length
+            record.message = f"{record.message[:self.max_length]}... [{clipped} chars truncated]"
+        return super().formatMessage(record)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every record above DEBUG but only a `rate` fraction of DEBUG ones."""
+
+    def __init__(self, rate=DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.rate >= 1.0 or random.random() < self.rate
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records untouched so message formatting happens on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def _level(level):
+    return level if isinstance(level, int) else logging.getLevelName(level.upper())
+
+
+def _build_handlers(console_level, file_level):
+    formatter = TruncatingFormatter()
+
+    ch = logging.StreamHandler()
+    ch.setLevel(console_level)
+    ch.setFormatter(formatter)
+
+    log_dir = "logs"
+    os.makedirs(log_dir, exist_ok=True)
+    fh = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, "test.log"), maxBytes=MAX_FILE_BYTES, backupCount=BACKUP_COUNT)
+    fh.setLevel(file_level)
+    fh.setFormatter(formatter)
+    return [ch, fh]
+
+
+def get_logger(name=None, queued=None, console_level=None, file_level=None):
+    """
+    Return a configured logger. With `queued` (default: QA_LOG_QUEUE=1) callers
+    only pay for an enqueue; a background QueueListener formats and writes.
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
 
     if not logger.handlers:
-        formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] %(name)s: %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-
-        ch = logging.StreamHandler()
-        ch.setLevel(logging.DEBUG)
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
-
-        log_dir = "logs"
-        os.makedirs(log_dir, exist_ok=True)
-        fh = logging.FileHandler(os.path.join(log_dir, "test.log"))
-        fh.setLevel(logging.DEBUG)
-        fh.setFormatter(formatter)
-        logger.addHandler(fh)
+        queued = QUEUE_ENABLED if queued is None else queued
+        console_level = _level(console_level or CONSOLE_LEVEL)
+        file_level = _level(file_level or FILE_LEVEL)
+        # Records below every handler's level are dropped before any work is done
+        logger.setLevel(min(console_level, file_level))
+        handlers = _build_handlers(console_level, file_level)
+
+        if queued:
+            log_queue = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            _listeners.append(listener)
+            handler = LazyQueueHandler(log_queue)
+            handler.addFilter(SamplingFilter())
+            logger.addHandler(handler)
+            # Root handlers (pytest's log capture among them) would format every record on the caller's thread
+            logger.propagate = False
+        else:
+            for handler in handlers:
+                handler.addFilter(SamplingFilter())
+                logger.addHandler(handler)
 
     return logger
+
+
+def stop_logging():
+    """Flush and stop every background listener (safe to call more than once)."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+atexit.register(stop_logging)
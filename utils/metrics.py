@@ -0,0 +1,310 @@
+"""Per-request latency instrumentation for the API clients.
+
+`TimingAdapter` swaps urllib3's connection classes for timed subclasses that
+note DNS, TCP connect and TLS handshake durations of every *new* connection
+into a thread-local scratchpad; a request served on a pooled keep-alive
+connection reports zero for all three. Given a `Throttle`, the timed pools
+also take a slot for every attempt urllib3 makes, retries included, and note
+the wait so it stays out of the latency. `ApiClient.request` reads that
+scratchpad plus `response.elapsed` (time to first byte) and its own wall clock
+into one `RequestRecord` per call.
+"""
+import contextvars
+import csv
+import hashlib
+import json
+import os
+import re
+import socket
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from contextlib import nullcontext
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+RequestRecord = namedtuple(
+    "RequestRecord",
+    "test phase method endpoint params status bytes body_hash dns connect tls ttfb total retries",
+)
+
+# Upper bounds (ms) of the latency histogram buckets; the last one is open
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+_ID_SEGMENT = re.compile(r"^(/booking/)[^/?]+")
+_phases = threading.local()
+
+# Set per task when one test's cases run concurrently (the async matrix)
+TEST_ID = contextvars.ContextVar("test_id", default=None)
+# Set around housekeeping requests (the token probe) that belong to no test's traffic
+UNRECORDED = contextvars.ContextVar("unrecorded", default=False)
+
+
+def endpoint_template(path):
+    """'/booking/123?x=1' -> '/booking/{id}', '/booking?firstname=Jim' -> '/booking'."""
+    path = path.split("?", 1)[0]
+    return _ID_SEGMENT.sub(r"\1{id}", path) or "/"
+
+
+def current_test():
+    """Node id of the running test, or '' outside of one."""
+    return TEST_ID.get() or os.environ.get("PYTEST_CURRENT_TEST", "").rsplit(" ", 1)[0]
+
+
+def current_phase():
+    """'setup', 'call' or 'teardown' of the running test, or '' outside of one."""
+    if TEST_ID.get():
+        return "call"
+    current = os.environ.get("PYTEST_CURRENT_TEST", "")
+    return current.rsplit(" ", 1)[-1].strip("()") if current else ""
+
+
+def reset_phases():
+    """Start a fresh phase scratchpad for the calling thread and return it."""
+    _phases.timings = {"dns": 0.0, "connect": 0.0, "tls": 0.0, "wait": 0.0}
+    return _phases.timings
+
+
+def _note(phase, seconds):
+    timings = getattr(_phases, "timings", None)
+    if timings is not None:
+        timings[phase] += seconds
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        # Resolve here so DNS is timed apart from the TCP connect, then connect
+        # to the resolved address with the original hostname restored for TLS/SNI.
+        start = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        self._dns_seconds = resolved - start
+        _note("dns", self._dns_seconds)
+
+        # Each address in turn, as urllib3's create_connection does; the connect
+        # phase is the one that answered, earlier failures only show in the total
+        dns_host, error = self._dns_host, None
+        try:
+            for info in infos:
+                self._dns_host = info[4][0]
+                attempt = time.perf_counter()
+                try:
+                    sock = super()._new_conn()
+                except ConnectTimeoutError as e:  # NewConnectionError included
+                    error = e
+                    continue
+                self._tcp_seconds = time.perf_counter() - attempt
+                _note("connect", self._tcp_seconds)
+                return sock
+        finally:
+            self._dns_host = dns_host
+            self._setup_seconds = time.perf_counter() - start
+        raise error or NewConnectionError(self, "getaddrinfo returned no addresses")
+
+    def connect(self):
+        self._dns_seconds = self._tcp_seconds = self._setup_seconds = 0.0
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        if isinstance(self, HTTPSConnection):
+            _note("tls", max(0.0, elapsed - self._setup_seconds))
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    pass
+
+
+class _ThrottledPool:
+    throttle = None  # set by TimingAdapter for every request it sends
+
+    def _make_request(self, *args, **kwargs):
+        # urllib3 calls this once per attempt; its Retry backoff sleeps outside any slot
+        start = time.perf_counter()
+        with self.throttle.slot() if self.throttle else nullcontext():
+            _note("wait", time.perf_counter() - start)
+            return super()._make_request(*args, **kwargs)
+
+
+class TimedHTTPConnectionPool(_ThrottledPool, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(_ThrottledPool, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report their setup phases and wait for `throttle`."""
+
+    def __init__(self, *args, throttle=None, **kwargs):
+        self.throttle = throttle
+        super().__init__(*args, **kwargs)
+
+    def get_connection_with_tls_context(self, *args, **kwargs):
+        pool = super().get_connection_with_tls_context(*args, **kwargs)
+        pool.throttle = self.throttle
+        return pool
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def retry_count(response):
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def response_size(response, stream=False):
+    """Body size in bytes without consuming a streamed body."""
+    if stream:
+        return int(response.headers.get("Content-Length") or 0)
+    return len(response.content)
+
+
+def body_hash(response, stream=False):
+    """Short content digest, so identical bodies can be spotted without storing them."""
+    if stream:
+        return ""
+    return hashlib.blake2b(response.content, digest_size=8).hexdigest()
+
+
+class MetricsRecorder:
+    """Collects `RequestRecord`s and renders them per endpoint."""
+
+    def __init__(self, keep_records=True):
+        self._lock = threading.Lock()
+        self.keep_records = keep_records
+        self.records = []
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Call `callback(record)` for every record as it is added."""
+        self.listeners.append(callback)
+
+    def add(self, record):
+        if self.keep_records:
+            with self._lock:
+                self.records.append(record)
+        for callback in self.listeners:
+            callback(record)
+
+    def record(self, method, path, response, phases, total, stream=False, ttfb=None, retries=None):
+        """Build and add the record for one finished exchange; `response` may be None.
+
+        Nothing is recorded (and None returned) while `UNRECORDED` is set.
+        """
+        if UNRECORDED.get():
+            return None
+        if retries is None:
+            retries = retry_count(response) if response is not None else 0
+        if ttfb is None:
+            ttfb = response.elapsed.total_seconds() if response is not None else 0.0
+        record = RequestRecord(
+            test=current_test(),
+            phase=current_phase(),
+            method=method,
+            endpoint=endpoint_template(path),
+            params=urlsplit(str(response.url)).query if response is not None else "",
+            status=response.status_code if response is not None else 0,
+            bytes=response_size(response, stream) if response is not None else 0,
+            body_hash=body_hash(response, stream) if response is not None else "",
+            dns=phases["dns"],
+            connect=phases["connect"],
+            tls=phases["tls"],
+            ttfb=ttfb,
+            total=total,
+            retries=retries,
+        )
+        self.add(record)
+        return record
+
+    def extend(self, rows):
+        """Merge plain-dict records (e.g. shipped back from xdist workers)."""
+        for row in rows:
+            self.add(RequestRecord(**row))
+
+    def by_endpoint(self):
+        groups = {}
+        for record in self.records:
+            groups.setdefault(f"{record.method} {record.endpoint}", []).append(record)
+        return dict(sorted(groups.items()))
+
+    def summary(self):
+        """Per-endpoint count, total-latency percentiles (ms) and histogram."""
+        rows = {}
+        for key, records in self.by_endpoint().items():
+            totals = sorted(r.total * 1000 for r in records)
+            histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+            for value in totals:
+                histogram[bisect_right(HISTOGRAM_BUCKETS_MS, value)] += 1
+            rows[key] = {
+                "count": len(records),
+                "p50_ms": percentile(totals, 50),
+                "p95_ms": percentile(totals, 95),
+                "p99_ms": percentile(totals, 99),
+                "max_ms": totals[-1],
+                "new_connections": sum(1 for r in records if r.connect),
+                "retries": sum(r.retries for r in records),
+                "histogram": histogram,
+            }
+        return rows
+
+    def write(self, path):
+        """Dump raw records as JSON or CSV, chosen by the file extension."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", newline="") as fh:
+            if path.endswith(".csv"):
+                writer = csv.writer(fh)
+                writer.writerow(RequestRecord._fields)
+                writer.writerows(self.records)
+            else:
+                json.dump({
+                    "summary": self.summary(),
+                    "records": [record._asdict() for record in self.records],
+                }, fh, indent=2)
+
+    def html_summary(self):
+        """HTML table for the pytest-html summary section."""
+        labels = [f"&lt;{bound}" for bound in HISTOGRAM_BUCKETS_MS] + [f"&ge;{HISTOGRAM_BUCKETS_MS[-1]}"]
+        head = "".join(f"<th>{label} ms</th>" for label in labels)
+        rows = []
+        for key, row in self.summary().items():
+            peak = max(row["histogram"]) or 1
+            cells = "".join(
+                f'<td title="{count}"><div style="background:#4a90d9;height:10px;'
+                f'width:{round(40 * count / peak)}px"></div>{count}</td>'
+                for count in row["histogram"]
+            )
+            rows.append(
+                f"<tr><td>{key}</td><td>{row['count']}</td><td>{row['p50_ms']:.1f}</td>"
+                f"<td>{row['p95_ms']:.1f}</td><td>{row['p99_ms']:.1f}</td><td>{row['max_ms']:.1f}</td>"
+                f"<td>{row['new_connections']}</td><td>{row['retries']}</td>{cells}</tr>"
+            )
+        return (
+            "<h2>Request latency by endpoint</h2><table class=\"timings\"><tr><th>Endpoint</th>"
+            "<th>Calls</th><th>p50 ms</th><th>p95 ms</th><th>p99 ms</th><th>max ms</th>"
+            f"<th>New conns</th><th>Retries</th>{head}</tr>{''.join(rows)}</table>"
+        )
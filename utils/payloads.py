@@ -0,0 +1,42 @@
+import copy
+
+NAMESPACED_FIELDS = ("firstname", "lastname")
+
+
+def with_namespace(payload, namespace):
+    """
+    Return a deep copy of `payload` with `namespace` appended to its name fields.
+    Non-string names (the invalid-type cases) are left untouched.
+    """
+    payload = copy.deepcopy(payload)
+    for field in NAMESPACED_FIELDS:
+        if isinstance(payload.get(field), str):
+            payload[field] = f"{payload[field]}-{namespace}"
+    return payload
+
+
+def _booking(firstname, lastname, totalprice, depositpaid, checkin, checkout, additionalneeds):
+    return {
+        "firstname": firstname,
+        "lastname": lastname,
+        "totalprice": totalprice,
+        "depositpaid": depositpaid,
+        "bookingdates": {
+            "checkin": checkin,
+            "checkout": checkout
+        },
+        "additionalneeds": additionalneeds
+    }
+
+
+# Named setup bookings handed out by the booking factory
+BOOKING_TEMPLATES = {
+    "jim_brown": _booking("Jim", "Brown", 111, True, "2018-01-01", "2019-01-01", "Breakfast"),
+    "sally_brown": _booking("Sally", "Brown", 111, True, "2013-02-23", "2014-10-23", "Breakfast"),
+    "john_doe": _booking("John", "Doe", 123, False, "2022-01-01", "2022-01-05", "None"),
+    "anna_smith": _booking("Anna", "Smith", 222, True, "2023-05-01", "2023-05-07", "Dinner"),
+    "eva_white": _booking("Eva", "White", 400, False, "2023-01-01", "2023-01-10", "WiFi"),
+    "unauth_user": _booking("Unauth", "User", 100, False, "2024-01-01", "2024-01-05", "None"),
+    "invalid_token": _booking("Invalid", "Token", 222, True, "2024-02-01", "2024-02-07", "WiFi"),
+    "valid_payload": _booking("Valid", "Payload", 123, True, "2023-01-01", "2023-01-10", "Lunch"),
+}
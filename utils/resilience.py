@@ -0,0 +1,202 @@
+"""Retry, backoff and circuit breaking for a flaky upstream.
+
+`make_retry` builds the urllib3 `Retry` that `ApiClient` mounts on its
+adapter: idempotent methods are retried on 429/502/503/504 with exponential
+backoff plus jitter, `Retry-After` is honoured (capped), and connection
+failures - the request never reached the server - are retried for every
+method. `AsyncApiClient` applies the same policy with `next_delay`.
+
+`CircuitBreaker` watches the outcome of every request after its retries. Once
+the failure rate over the recent window crosses the threshold it opens, and
+every request fails fast with `CircuitOpenError` instead of waiting out its
+timeouts and retries; after `cooldown` seconds one probe request is let
+through and its outcome closes or re-opens it. `BreakerPlugin` turns an open
+circuit into skipped tests and reports retries and trips in the run summary.
+"""
+import threading
+import time
+from collections import deque
+
+import pytest
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import RequestHistory, Retry
+
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = (429, 502, 503, 504)
+MAX_RETRY_AFTER = 30
+DEFAULT_TIMEOUT = 30.0
+
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_WINDOW = 20
+MIN_CALLS = 10
+DEFAULT_COOLDOWN = 30.0
+
+SKIP_REASON = "circuit open"
+
+
+def make_retry(retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, methods=Retry.DEFAULT_ALLOWED_METHODS,
+               wait=True):
+    """urllib3 `Retry` for the client adapter; `wait=False` keeps the retries but not the sleeps."""
+    return Retry(
+        total=retries,
+        allowed_methods=frozenset(method.upper() for method in methods),
+        status_forcelist=RETRY_STATUSES,
+        backoff_factor=backoff if wait else 0,
+        backoff_jitter=backoff if wait else 0.0,
+        respect_retry_after_header=wait,
+        retry_after_max=MAX_RETRY_AFTER,
+        # Hand the last 503 to the test instead of raising RetryError
+        raise_on_status=False,
+    )
+
+
+def next_delay(retry, attempt, retry_after=None):
+    """Seconds urllib3 would sleep before retry number `attempt` (1-based)."""
+    if retry_after is not None and retry.respect_retry_after_header:
+        try:
+            return retry.parse_retry_after(retry_after)
+        except InvalidHeader:
+            pass
+    history = (RequestHistory(None, None, None, None, None),) * attempt
+    return retry.new(history=history).get_backoff_time()
+
+
+def is_failure(response=None, error=None):
+    """Whether an exchange counts against the breaker: no response, or a retryable status.
+
+    A plain 500 is how the live API answers many malformed payloads, not an outage.
+    """
+    if error is not None:
+        return True
+    return response is not None and response.status_code in RETRY_STATUSES
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, window=DEFAULT_WINDOW, min_calls=MIN_CALLS,
+                 cooldown=DEFAULT_COOLDOWN):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._opened_at = None
+        self._probing = False
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        return "half-open" if self._probing else "open"
+
+    def is_open(self):
+        """True while requests would be refused (open, and not yet due for a probe)."""
+        if self._opened_at is None:
+            return False
+        return self._probing or time.monotonic() - self._opened_at < self.cooldown
+
+    def reason(self):
+        return f"{SKIP_REASON}: {sum(self._outcomes)}/{len(self._outcomes)} recent requests failed"
+
+    def check(self):
+        """Raise `CircuitOpenError` unless a request may be sent now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if not self.is_open():
+                # Let exactly one request probe the upstream
+                self._probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.reason())
+
+    def record(self, failed):
+        with self._lock:
+            if self._probing:
+                self._probing = False
+                if failed:
+                    self._opened_at = time.monotonic()
+                else:
+                    self._opened_at = None
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(bool(failed))
+            if (self._opened_at is None and len(self._outcomes) >= self.min_calls
+                    and sum(self._outcomes) / len(self._outcomes) >= self.threshold):
+                self._opened_at = time.monotonic()
+                self.trips += 1
+
+    def stats(self):
+        return {"state": self.state, "trips": self.trips, "rejected": self.rejected}
+
+
+# ---------------------- PYTEST PLUGIN ----------------------
+
+class BreakerPlugin:
+    """Skip tests while the breaker is open and summarise retries and trips."""
+
+    def __init__(self, config, breaker, recorder):
+        self.config = config
+        self.breaker = breaker
+        self.recorder = recorder
+        self.skipped = 0
+        self._workers = []
+
+    def pytest_runtest_setup(self, item):
+        if self.breaker.is_open():
+            pytest.skip(self.breaker.reason())
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        outcome = yield
+        report = outcome.get_result()
+        if call.when != "teardown" and call.excinfo is not None and call.excinfo.errisinstance(CircuitOpenError):
+            report.outcome = "skipped"
+            report.longrepr = (str(item.path), item.location[1] + 1, f"Skipped: {call.excinfo.value}")
+            if hasattr(report, "wasxfail"):
+                del report.wasxfail
+
+    def pytest_runtest_logreport(self, report):
+        if report.skipped and SKIP_REASON in str(report.longrepr):
+            self.skipped += 1
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        stats = getattr(node, "workeroutput", {}).get("breaker")
+        if stats:
+            self._workers.append(stats)
+
+    def pytest_sessionfinish(self, session):
+        if hasattr(self.config, "workerinput"):
+            self.config.workeroutput["breaker"] = self.breaker.stats()
+
+    def summary_lines(self):
+        stats = self._workers or [self.breaker.stats()]
+        trips = sum(s["trips"] for s in stats)
+        rejected = sum(s["rejected"] for s in stats)
+        retried = [r for r in self.recorder.records if r.retries]
+        if not (trips or rejected or retried or self.skipped):
+            return []
+        lines = [
+            f"retries: {sum(r.retries for r in retried)} across {len(retried)} requests",
+            f"circuit breaker: {trips} trips, {rejected} requests failed fast, {self.skipped} tests skipped",
+        ]
+        by_endpoint = {}
+        for record in retried:
+            key = f"{record.method} {record.endpoint}"
+            by_endpoint[key] = by_endpoint.get(key, 0) + record.retries
+        lines.extend(f"  {key}: {count} retries" for key, count in sorted(by_endpoint.items()))
+        return lines
+
+    def pytest_terminal_summary(self, terminalreporter):
+        lines = self.summary_lines()
+        if lines:
+            terminalreporter.write_sep("-", "upstream resilience")
+            for line in lines:
+                terminalreporter.write_line(line)
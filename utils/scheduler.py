@@ -0,0 +1,126 @@
+"""Cost-aware test ordering from recorded history.
+
+`CostScheduler` keeps, per test node id in the pytest cache, a moving average
+of its call duration and of its failure rate, plus whether its last run
+failed. Only tests that ran count: a skip leaves the history as it was, and
+setup and teardown (a session fixture's first user pays for it) are left out
+of the duration. Histories are recorded on every run; with `--schedule cost`
+the collected tests are reordered module by module, so module-scoped fixtures
+are still set up once:
+
+1. modules holding a test that failed last time come first, then modules
+   with tests that have no history yet, then the rest; heaviest first within
+   each, so xdist workers pick up the long modules before short ones fill
+   the gaps (longest-processing-time first);
+2. inside a module, tests that failed last time (most failure-prone first),
+   then tests with no history - both the likeliest to fail, so failures
+   surface early - then everything else, longest first.
+
+Inside each tier of a module, tests that use the same expensive fixtures (a
+token, a pooled booking, a concurrently sent matrix) are kept together and
+groups are ordered by their total cost, so a fixture's setup is paid close to
+its users.
+"""
+import statistics
+
+CACHE_KEY = "booking-qa/test-costs"
+# EWMA weights of the newest run
+DURATION_ALPHA = 0.5
+FAILURE_ALPHA = 0.3
+EXPENSIVE_FIXTURES = ("auth_token", "booking_factory", "created_booking", "matrix_response")
+
+
+def fixture_group(item):
+    """The expensive fixtures `item` uses, as a stable sort key."""
+    names = getattr(item, "fixturenames", ())
+    return tuple(name for name in EXPENSIVE_FIXTURES if name in names)
+
+
+class CostScheduler:
+    def __init__(self, config, reorder=False, record=True):
+        self.config = config
+        self.reorder = reorder
+        self.record = record
+        self.history = config.cache.get(CACHE_KEY, {})
+        self._durations = {}
+        self._failed = {}
+
+    # ---------------------- ORDERING ----------------------
+
+    def order(self, items):
+        """Return `items` in scheduling order (see the module docstring)."""
+        known = [self.history[item.nodeid]["duration"] for item in items if item.nodeid in self.history]
+        default = statistics.median(known) if known else 0.0
+
+        def tier(item):
+            entry = self.history.get(item.nodeid)
+            if entry is None:
+                return 1
+            return 0 if entry["last_failed"] else 2
+
+        def cost(item):
+            entry = self.history.get(item.nodeid)
+            return entry["duration"] if entry else default
+
+        def failure_rate(item):
+            entry = self.history.get(item.nodeid)
+            return entry["failure_rate"] if entry else 0.0
+
+        def module(item):
+            return item.nodeid.split("::", 1)[0]
+
+        module_tier, module_cost, group_cost = {}, {}, {}
+        for item in items:
+            name = module(item)
+            module_tier[name] = min(module_tier.get(name, 2), tier(item))
+            module_cost[name] = module_cost.get(name, 0.0) + cost(item)
+            key = (name, tier(item), fixture_group(item))
+            group_cost[key] = group_cost.get(key, 0.0) + cost(item)
+
+        def sort_key(item):
+            name, rank, group = key = (module(item), tier(item), fixture_group(item))
+            return (module_tier[name], -module_cost[name], name,
+                    rank, -group_cost[key], group, -failure_rate(item), -cost(item))
+
+        return sorted(items, key=sort_key)
+
+    def pytest_collection_modifyitems(self, session, config, items):
+        if self.reorder:
+            items[:] = self.order(items)
+
+    def pytest_report_header(self, config):
+        if self.reorder:
+            return f"schedule: cost-ordered using history of {len(self.history)} tests"
+
+    # ---------------------- RECORDING ----------------------
+
+    def pytest_runtest_logreport(self, report):
+        if not self.record:
+            return
+        # An xfail is the expected outcome, not a failure
+        xfailed = hasattr(report, "wasxfail")
+        failed = report.failed and not xfailed
+        self._failed[report.nodeid] = self._failed.get(report.nodeid, False) or failed
+        if report.when == "call" and (report.passed or report.failed or xfailed):
+            self._durations[report.nodeid] = report.duration
+
+    def pytest_sessionfinish(self, session):
+        if not self.record or not self._failed:
+            return
+        for nodeid, failed in self._failed.items():
+            duration = self._durations.get(nodeid)
+            entry = self.history.get(nodeid)
+            if entry is None:
+                if duration is None:
+                    continue  # skipped, or failed before its call: stays "no history"
+                entry = {"duration": duration, "failure_rate": float(failed), "runs": 0}
+            elif duration is None and not failed:
+                continue  # skipped: nothing to learn
+            else:
+                if duration is not None:
+                    entry["duration"] += DURATION_ALPHA * (duration - entry["duration"])
+                entry["failure_rate"] += FAILURE_ALPHA * (failed - entry["failure_rate"])
+            entry["last_failed"] = failed
+            entry["runs"] += 1
+            self.history[nodeid] = entry
+        self.config.cache.set(CACHE_KEY, self.history)
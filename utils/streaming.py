@@ -0,0 +1,115 @@
+"""Incremental parsing of JSON array responses such as the GET /booking listing.
+
+`ArrayStream` decodes one element at a time from `response.iter_content()`,
+holding only the current chunk plus the element being decoded, so memory stays
+flat however long the listing grows. `validate_stream` checks each element
+against a compiled schema as it arrives and stops at the first bad one.
+
+    response = api_client.get_bookings(stream=True)
+    stats = validate_stream(response, "booking_id")
+"""
+import codecs
+import json
+import time
+from collections import namedtuple
+
+from utils.schemas import validator
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+StreamStats = namedtuple("StreamStats", "count bytes seconds")
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+
+
+class StreamFormatError(ValueError):
+    """The body is not a well-formed JSON array."""
+
+
+class ArrayStream:
+    """Iterate the elements of a top-level JSON array body as they arrive."""
+
+    def __init__(self, response, chunk_size=DEFAULT_CHUNK_SIZE):
+        self._chunks = response.iter_content(chunk_size)
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self.eof = False
+        self.bytes = 0
+
+    def _fill(self):
+        """Append the next chunk to the unconsumed part of the buffer."""
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+        else:
+            self.bytes += len(chunk)
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk or b"", final=self.eof)
+        self._pos = 0
+
+    def _peek(self):
+        """Next non-whitespace character, or '' at the end of the body."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self.eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._fill()
+
+    def _value(self):
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+                # A value running up to the buffer's end may continue (e.g. a number)
+                if end < len(self._buffer) or self.eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise StreamFormatError(f"Malformed element near {self._buffer[self._pos:self._pos + 40]!r}")
+            self._fill()
+
+    def _end(self):
+        """After the closing ']' only whitespace may follow."""
+        self._pos += 1
+        if self._peek():
+            raise StreamFormatError(f"Unexpected data after the array: {self._buffer[self._pos:self._pos + 40]!r}")
+
+    def __iter__(self):
+        if self._peek() != "[":
+            raise StreamFormatError(f"Expected a JSON array, got {self._peek()!r}")
+        self._pos += 1
+        if self._peek() == "]":
+            self._end()
+            return
+        while True:
+            self._peek()
+            yield self._value()
+            separator = self._peek()
+            if separator == "]":
+                self._end()
+                return
+            self._pos += 1
+            if separator != ",":
+                raise StreamFormatError(f"Expected ',' or ']' between elements, got {separator!r}")
+
+
+def validate_stream(response, schema, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate every element of a streamed array against `schema` as it arrives.
+
+    Returns `StreamStats` on success; raises AssertionError at the first bad
+    element, without reading the rest of the body.
+    """
+    validate = validator(schema)
+    stream = ArrayStream(response, chunk_size)
+    start = time.perf_counter()
+    count = 0
+    try:
+        for element in stream:
+            error = validate(element)
+            assert error is None, f"Element {count} does not match the '{schema}' schema: {error}"
+            count += 1
+    finally:
+        response.close()
+    return StreamStats(count, stream.bytes, time.perf_counter() - start)
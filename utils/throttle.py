@@ -0,0 +1,185 @@
+"""Client-side rate limit and in-flight cap shared by every client of a host.
+
+`Throttle` combines two limits, both optional:
+
+- a token bucket of `rate` requests per second with bursts of `burst`. A
+  request reserves its token up front, driving the bucket negative if need
+  be, and sleeps until that token would have been refilled, so waiting
+  callers are paced exactly instead of polling;
+- at most `max_in_flight` requests outstanding at once.
+
+Without a `path` both live in process memory. With one, they are shared by
+every process using the same path (xdist workers, concurrent sessions): the
+bucket is two doubles in `<path>.bucket`, updated under an exclusive `fcntl`
+lock, and the in-flight cap is `max_in_flight` slot files `<path>.slotN`, each
+held by a non-blocking `flock` while a request is outstanding. The kernel
+drops those locks when a process dies, so a crashed worker never leaks its
+slots.
+"""
+import asyncio
+import os
+import struct
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks on Windows
+    fcntl = None
+
+_BUCKET = struct.Struct("dd")  # tokens, wall-clock time of the last refill (it outlives reboots)
+# Poll interval bounds while every in-flight slot is taken
+_POLL_MIN = 0.001
+_POLL_MAX = 0.02
+
+
+class _MemoryBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._state = (burst, time.monotonic())
+
+    def reserve(self):
+        """Take one token; return the seconds to wait until it is really there."""
+        with self._lock:
+            self._state, delay = _take(self._state, self.rate, self.burst, time.monotonic())
+        return delay
+
+
+class _FileBucket:
+    def __init__(self, rate, burst, path):
+        self.rate = rate
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._fd = os.open(f"{path}.bucket", os.O_RDWR | os.O_CREAT, 0o644)
+
+    def reserve(self):
+        # flock does not exclude threads sharing this descriptor; the thread lock does
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                raw = os.pread(self._fd, _BUCKET.size, 0)
+                state = _BUCKET.unpack(raw) if len(raw) == _BUCKET.size else (self.burst, now)
+                state, delay = _take(state, self.rate, self.burst, now)
+                os.pwrite(self._fd, _BUCKET.pack(*state), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return delay
+
+    def close(self):
+        os.close(self._fd)
+
+
+def _take(state, rate, burst, now):
+    tokens, stamp = state
+    if stamp > now:
+        # The clock went back (or a stale file from another machine): start over full
+        tokens, stamp = burst, now
+    tokens = min(burst, tokens + (now - stamp) * rate) - 1
+    return (tokens, now), max(0.0, -tokens / rate)
+
+
+class _MemorySlots:
+    def __init__(self, limit):
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def try_acquire(self):
+        return True if self._semaphore.acquire(blocking=False) else None
+
+    def release(self, slot):
+        self._semaphore.release()
+
+
+class _FileSlots:
+    def __init__(self, limit, path):
+        self.paths = [f"{path}.slot{i}" for i in range(limit)]
+        self._next = 0
+
+    def try_acquire(self):
+        # Start from a rotating offset so waiters do not all hammer slot 0
+        start, self._next = self._next, (self._next + 1) % len(self.paths)
+        for i in range(len(self.paths)):
+            fd = os.open(self.paths[(start + i) % len(self.paths)], os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    def release(self, fd):
+        # Closing the descriptor drops its lock
+        os.close(fd)
+
+
+class Throttle:
+    def __init__(self, rate=0.0, burst=None, max_in_flight=0, path=None):
+        shared = path is not None and fcntl is not None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.rate = rate
+        self.max_in_flight = max_in_flight
+        burst = burst or max(1.0, rate)
+        self.bucket = None
+        if rate > 0:
+            self.bucket = _FileBucket(rate, burst, path) if shared else _MemoryBucket(rate, burst)
+        self.slots = None
+        if max_in_flight > 0:
+            self.slots = _FileSlots(max_in_flight, path) if shared else _MemorySlots(max_in_flight)
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.waited = 0.0
+
+    def __bool__(self):
+        return self.bucket is not None or self.slots is not None
+
+    def _note(self, waited):
+        with self._stats_lock:
+            self.requests += 1
+            self.waited += waited
+
+    @contextmanager
+    def slot(self):
+        """Block until a request may go out; hold an in-flight slot while it does."""
+        start = time.perf_counter()
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+        held, poll = None, _POLL_MIN
+        if self.slots is not None:
+            while (held := self.slots.try_acquire()) is None:
+                time.sleep(poll)
+                poll = min(poll * 2, _POLL_MAX)
+        self._note(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            if held is not None:
+                self.slots.release(held)
+
+    @asynccontextmanager
+    async def aslot(self):
+        """`slot` for coroutines: waits without blocking the event loop."""
+        start = time.perf_counter()
+        if self.bucket is not None:
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        held, poll = None, _POLL_MIN
+        if self.slots is not None:
+            while (held := self.slots.try_acquire()) is None:
+                await asyncio.sleep(poll)
+                poll = min(poll * 2, _POLL_MAX)
+        self._note(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            if held is not None:
+                self.slots.release(held)
+
+    def stats(self):
+        return {"requests": self.requests, "waited": self.waited}
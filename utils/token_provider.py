@@ -0,0 +1,151 @@
+"""Auth tokens without an /auth round-trip per session, worker or request.
+
+`TokenProvider` keeps the current token in memory and, when given a cache
+file, on disk with its expiry time, so later sessions and parallel xdist
+workers reuse it. Reads and refreshes of the file happen under an exclusive
+`fcntl` lock, so exactly one process mints a new token when it goes stale.
+A token loaded from disk is checked once with a request that needs auth but
+changes nothing; tokens are refreshed `refresh_margin` seconds before expiry.
+
+`TokenBucket` holds several pre-minted tokens for load runs and hands them
+out round-robin, re-minting each one shortly before it expires.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from utils.metrics import UNRECORDED
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no advisory locks on Windows
+    fcntl = None
+
+# restful-booker's documented admin account
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "password123"
+# restful-booker does not document a token lifetime; stay well inside any sane one
+DEFAULT_TTL = 600.0
+DEFAULT_REFRESH_MARGIN = 60.0
+# A non-numeric id never exists, so PATCH answers 403 for a bad token and 405 otherwise
+VALIDATION_PATH = "/booking/token-check"
+
+
+def mint_token(client, username=ADMIN_USERNAME, password=ADMIN_PASSWORD):
+    response = client.auth({"username": username, "password": password})
+    token = response.json().get("token") if response.status_code == 200 else None
+    if not token:
+        raise RuntimeError(f"Auth failed ({response.status_code}): {response.text}")
+    return token
+
+
+def is_valid(client, token):
+    # Not test traffic: recorded, the probe would tie every token user to PATCH /booking/{id}
+    reset = UNRECORDED.set(True)
+    try:
+        response = client.patch(VALIDATION_PATH, json={}, headers={"Cookie": f"token={token}"})
+    finally:
+        UNRECORDED.reset(reset)
+    return response.status_code != 403
+
+
+@contextmanager
+def _locked(path):
+    """Exclusive advisory lock on `path`.lock for the duration of the block."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class TokenProvider:
+    """Cached admin token for one base URL, optionally shared through `cache_path`."""
+
+    def __init__(self, client, cache_path=None, ttl=DEFAULT_TTL, refresh_margin=DEFAULT_REFRESH_MARGIN,
+                 username=ADMIN_USERNAME, password=ADMIN_PASSWORD):
+        self.client = client
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.username = username
+        self.password = password
+        self.key = f"{client.base_url} {username}"
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+    def _fresh(self, expires_at):
+        return expires_at - self.refresh_margin > time.time()
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_cache(self, entries):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(entries, fh)
+        os.replace(tmp_path, self.cache_path)
+
+    def _mint(self):
+        return mint_token(self.client, self.username, self.password), time.time() + self.ttl
+
+    def _from_disk(self):
+        """Reuse the shared token if still fresh and accepted, else mint and publish one."""
+        with _locked(self.cache_path):
+            entries = self._read_cache()
+            entry = entries.get(self.key)
+            if entry and self._fresh(entry["expires_at"]) and is_valid(self.client, entry["token"]):
+                return entry["token"], entry["expires_at"]
+            token, expires_at = self._mint()
+            entries = {key: value for key, value in entries.items() if self._fresh(value["expires_at"])}
+            entries[self.key] = {"token": token, "expires_at": expires_at}
+            self._write_cache(entries)
+            return token, expires_at
+
+    def get(self):
+        """A token valid for at least `refresh_margin` more seconds."""
+        with self._lock:
+            if self._token is None or not self._fresh(self._expires_at):
+                self._token, self._expires_at = self._from_disk() if self.cache_path else self._mint()
+            return self._token
+
+    def invalidate(self):
+        """Forget the in-memory token, e.g. after the server answered 403 to it."""
+        with self._lock:
+            self._token = None
+
+
+class TokenBucket:
+    """`size` independently minted tokens, handed out round-robin."""
+
+    def __init__(self, client, size, ttl=DEFAULT_TTL, refresh_margin=DEFAULT_REFRESH_MARGIN):
+        self.providers = [TokenProvider(client, ttl=ttl, refresh_margin=refresh_margin) for _ in range(size)]
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def fill(self, workers=None):
+        """Mint every token up front, concurrently."""
+        with ThreadPoolExecutor(workers or len(self.providers)) as pool:
+            list(pool.map(TokenProvider.get, self.providers))
+        return self
+
+    def take(self):
+        with self._lock:
+            provider = self.providers[self._next]
+            self._next = (self._next + 1) % len(self.providers)
+        return provider.get()